@@ -1,12 +1,14 @@
 import networkx as nx
-from graphviz import Source
 import json
 import shutil
 import os
+import sys
 import pickle
 import pandas
 import random
 import utils
+sys.path.append('../')
+import dot_utils
 
 def clean_label(label, forbidden={'/', '&'}):
 
@@ -86,45 +88,47 @@ id_2parents = dict()
 # create dot and svg files
 num_parents = []
 
-for id_, nodes_edges in id_2nodes_and_edges.items():
-    gv_path = f'{svg_folder}/{id_}.gv'
+name_to_dot_source = dict()
 
+for id_, nodes_edges in id_2nodes_and_edges.items():
     id_2parents[id_] = nodes_edges['parents']
 
     num_parents.append(len(nodes_edges['parents']))
-    with open(gv_path, 'w') as outfile:
-        outfile.write('digraph G {\n\n')
+    lines = ['digraph G {\n\n']
 
-        for eventtype_wdtid in nodes_edges['nodes']:
-            uri = f'https://www.wikidata.org/wiki/{eventtype_wdtid[3:]}'
+    for eventtype_wdtid in nodes_edges['nodes']:
+        uri = f'https://www.wikidata.org/wiki/{eventtype_wdtid[3:]}'
 
-            info = g.nodes[eventtype_wdtid]
+        info = g.nodes[eventtype_wdtid]
 
-            incidents = node2occurrences[eventtype_wdtid]
-            example_incidents = get_sample(incidents, 3)
+        incidents = node2occurrences[eventtype_wdtid]
+        example_incidents = get_sample(incidents, 3)
 
-            label = info['label']
-            label = clean_label(label)
+        label = info['label']
+        label = clean_label(label)
 
-            a_node_string = create_node_string(
-                       identifier=eventtype_wdtid[3:],
-                       event_type=label,
-                       event_type_uri=uri,
-                       example_incidents=example_incidents)
+        a_node_string = create_node_string(
+                   identifier=eventtype_wdtid[3:],
+                   event_type=label,
+                   event_type_uri=uri,
+                   example_incidents=example_incidents)
 
-            outfile.write(a_node_string)
+        lines.append(a_node_string)
 
-        edges = nodes_edges['edges']
-        for source, target in edges:
-            outfile.write(f'{source[3:]} -> {target[3:]}\n')
-        outfile.write('\n}')
+    edges = nodes_edges['edges']
+    for source, target in edges:
+        lines.append(f'{source[3:]} -> {target[3:]}\n')
+    lines.append('\n}')
 
-    src = Source(open(gv_path).read())
+    # rendered to {svg_folder}/{id_}.gv.svg
+    name_to_dot_source[f'{id_}.gv'] = ''.join(lines)
 
-    try:
-        src.render(filename=gv_path, format='svg')
-    except Exception as e:
-        print(id_, e)
+summary = dot_utils.render_dot_sources(name_to_dot_source,
+                                       output_folder=svg_folder,
+                                       format='svg',
+                                       verbose=1)
+for name, error in summary['failed'].items():
+    print(name, error)
 
 
 # create files for annotators
@@ -139,10 +143,16 @@ prefix = 'http://kyoto.let.vu.nl/~postma/ble/svg/'
 items = list(id_2nodes_and_edges)
 annotators = ['Andras', 'Klaudia', 'Simos', 'Lauren', 'Sophie', 'Jonathan', 'Lisa']
 
+# the number of nodes of the tree to annotate is used as the estimated cost of an item
+item_to_cost = {id_ : len(nodes_edges['nodes'])
+                for id_, nodes_edges in id_2nodes_and_edges.items()}
+
 annotator_to_items = utils.divide_work(items,
                                        annotators,
                                        num_annotations_per_item=3,
                                        ignore=set(id_2answer),
+                                       item_to_cost=item_to_cost,
+                                       seed=0,
                                        verbose=1)
 
 for annotator, their_items in annotator_to_items.items():
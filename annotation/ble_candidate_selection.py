@@ -21,7 +21,7 @@ num_leaf_nodes = len(bl_coll_obj.leaf_nodes)
 
 print(f'number of leaf nodes', num_leaf_nodes)
 
-all_paths, edge2freq, edge2children = utils.get_paths(bl_coll_obj, g, verbose=2)
+num_paths, edge2freq, edge2children = utils.get_edge_path_statistics(bl_coll_obj, g, verbose=2)
 
 verbose = 2
 forbidden_in_path = {'wd:Q327197'}
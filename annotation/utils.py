@@ -2,48 +2,147 @@ from collections import defaultdict
 import operator
 import networkx as nx
 import itertools
+import heapq
+import random
+import numpy as np
 import pandas
 
+import sys
+sys.path.append('../')
+from graph_utils import get_node_to_num_descendants
+
 
 def divide_work(items,
                 annotators,
                 num_annotations_per_item,
                 ignore=set(),
+                item_to_cost=None,
+                seed=0,
                 verbose=0):
+    """
+    assign each item to num_annotations_per_item distinct annotators
+    while balancing the total (estimated) cost per annotator.
+
+    Items are processed in decreasing order of cost (in a shuffled order if no costs are provided)
+    and each item is given to the annotators with the lowest total cost so far,
+    which are obtained from a heap, i.e., O(n * num_annotations_per_item * log(number of annotators)).
+
+    :param iterable items: the items to annotate
+    :param iterable annotators: the annotators
+    :param int num_annotations_per_item: the number of annotators per item
+    :param set ignore: items that are not assigned
+    :param dict item_to_cost: mapping from item -> estimated cost, e.g., the size of the tree to annotate
+    (cost 1 for items that are not in the mapping or if None is provided)
+    :param int seed: random seed used to order the items and to break ties between annotators
+
+    :rtype: dict
+    :return: mapping from annotator -> set of items
+    """
     items = [item
              for item in items
              if item not in ignore]
 
     workers = list(annotators)
-    num_annotations = 3
-    queue = sorted([item
-                    for item in items
-                    for _ in range(num_annotations)
-                    ])
+    assert len(set(workers)) == len(workers), f'annotators should be unique: {workers}'
+    assert 1 <= num_annotations_per_item <= len(workers), \
+        f'{num_annotations_per_item} annotation(s) per item requires at least as many annotators, found {len(workers)}'
+
+    if item_to_cost is None:
+        item_to_cost = {}
+
+    rng = random.Random(seed)
+    rng.shuffle(items)
+    if item_to_cost:
+        items.sort(key=lambda item: item_to_cost.get(item, 1), reverse=True) # stable, ties stay shuffled
+
+    tie_breakers = list(range(len(workers)))
+    rng.shuffle(tie_breakers)
+
+    # (total cost, number of items, tie breaker, annotator)
+    heap = [(0, 0, tie_breaker, worker)
+            for tie_breaker, worker in zip(tie_breakers, workers)]
+    heapq.heapify(heap)
 
-    qid2freq = defaultdict(int)
     annotator_to_items = defaultdict(set)
+    annotator_to_cost = defaultdict(int)
+
+    for item in items:
+        cost = item_to_cost.get(item, 1)
+        chosen = [heapq.heappop(heap)
+                  for _ in range(num_annotations_per_item)] # distinct annotators
 
-    for worker, task in zip(itertools.cycle(workers), queue):
-        annotator_to_items[worker].add(task)
-        qid2freq[task] += 1
+        for total_cost, num_items, tie_breaker, worker in chosen:
+            annotator_to_items[worker].add(item)
+            annotator_to_cost[worker] += cost
+            heapq.heappush(heap, (total_cost + cost, num_items + 1, tie_breaker, worker))
 
-    for q_id, freq in qid2freq.items():
-        assert freq == num_annotations_per_item, f'{q_id} has freq {freq}'
+    assert sum(len(their_items) for their_items in annotator_to_items.values()) == \
+           len(items) * num_annotations_per_item
 
     if verbose:
         print()
         print(f'number of items: {len(items)}')
         print(f'annotators: {annotators}')
         print(f'number of annotations per item: {num_annotations_per_item}')
-        for annotator, items in annotator_to_items.items():
-            print(annotator, len(items))
+        for annotator, their_items in annotator_to_items.items():
+            print(annotator, len(their_items), f'(cost: {annotator_to_cost[annotator]})')
 
     return annotator_to_items
 
 
+def get_nodes_with_forbidden_in_path(g, top_node, forbidden_in_path):
+    """
+    determine the nodes for which a path from top_node to the node
+    contains a node from forbidden_in_path (including top_node and the node itself),
+    i.e., the nodes reachable from a forbidden node that is reachable from top_node.
+
+    In a graph with cycles, this is an upper bound of the nodes for which
+    a simple path from top_node contains a forbidden node
+    (target_df hence only uses it for acyclic graphs).
+
+    :rtype: set
+    :return: set of nodes
+    """
+    reachable_from_top = nx.descendants(g, top_node)
+    reachable_from_top.add(top_node)
+
+    sources = [node
+               for node in forbidden_in_path
+               if node in reachable_from_top]
+
+    tainted = set(sources)
+    stack = list(sources)
+    while stack:
+        node = stack.pop()
+        for successor in g.successors(node):
+            if successor not in tainted:
+                tainted.add(successor)
+                stack.append(successor)
+
+    return tainted
+
+
 def target_df(g, min_freq, min_descendants, min_num_children,
-              forbidden_in_path):
+              forbidden_in_path,
+              top_node='wd:Q1656682',
+              max_num_paths=None):
+    """
+    select the nodes to annotate.
+
+    The filters are applied using precomputed information (see get_node_to_num_descendants and
+    get_nodes_with_forbidden_in_path). The paths from top_node are only computed for the selected nodes.
+    If g has cycles, the forbidden nodes are checked on all simple paths from top_node to the node instead.
+
+    :param networkx.classes.digraph.DiGraph g: the event type graph
+    :param int min_freq: minimum occurrence_frequency of a node
+    :param int min_descendants: minimum number of descendants of a node
+    :param int min_num_children: minimum number of children of a node
+    :param set forbidden_in_path: nodes are not selected if a path from top_node to them contains one of these nodes
+    :param str top_node: the top node of the graph
+    :param int max_num_paths: if provided, at most this number of paths to top_node are stored per node
+
+    :rtype: pandas.DataFrame
+    """
     list_of_lists = []
     headers = ['ID',
                'paths_to_event_node',
@@ -54,14 +153,20 @@ def target_df(g, min_freq, min_descendants, min_num_children,
                'chosen_children',
                'num_descendants', ]
 
+    node_to_num_descendants = get_node_to_num_descendants(g)
+
+    reachable_from_top = nx.descendants(g, top_node) if g.has_node(top_node) else set()
+    is_dag = nx.is_directed_acyclic_graph(g)
+    with_forbidden_in_path = get_nodes_with_forbidden_in_path(g, top_node, forbidden_in_path) \
+        if g.has_node(top_node) and is_dag else set()
+
     for node_id in g.nodes():
 
         instance_freq = g.nodes[node_id]['occurrence_frequency']
         if instance_freq < min_freq:
             continue
 
-        descendants = nx.descendants(g, node_id)
-        num_descendants = len(descendants)
+        num_descendants = node_to_num_descendants[node_id]
 
         if num_descendants < min_descendants:
             continue
@@ -72,22 +177,27 @@ def target_df(g, min_freq, min_descendants, min_num_children,
         if num_children < min_num_children:
             continue
 
-        parents = list(g.predecessors(node_id))
-
-        paths_to_top = list(nx.all_simple_paths(g,
-                                            'wd:Q1656682',
-                                            node_id))
+        if all([node_id not in reachable_from_top,
+                node_id != top_node]): # no path to the top node
+            continue
 
-        if not paths_to_top:
+        if node_id in with_forbidden_in_path:
             continue
 
-        to_add = True
-        for path in paths_to_top:
-            for node in path:
-                if node in forbidden_in_path:
-                    to_add = False
+        parents = list(g.predecessors(node_id))
+
+        if is_dag:
+            paths_to_top = list(itertools.islice(nx.all_simple_paths(g, top_node, node_id),
+                                                 max_num_paths))
+        else:
+            paths_to_top = list(nx.all_simple_paths(g, top_node, node_id))
+            if any(node in forbidden_in_path
+                   for path in paths_to_top
+                   for node in path):
+                continue
+            paths_to_top = paths_to_top[:max_num_paths]
 
-        if not to_add:
+        if not paths_to_top:
             continue
 
         child2freq = {child: g.nodes[child]['occurrence_frequency']
@@ -162,6 +272,139 @@ def get_paths(bl_coll_obj,
     return all_paths, edge2freq, edge2children
 
 
+def shift_path_counts(path_counts, is_high, max_length):
+    """
+    extend all paths counted in path_counts with one node
+
+    :param numpy.ndarray path_counts: (max_length + 1, 2) number of paths per (number of nodes, contains a high node),
+    lengths of max_length or more are counted in the last row
+    :param bool is_high: whether the added node is a high node
+    """
+    shifted = np.zeros_like(path_counts)
+    shifted[2:] = path_counts[1:-1]
+    shifted[max_length] += path_counts[max_length]
+    if is_high:
+        shifted[:, 1] += shifted[:, 0]
+        shifted[:, 0] = 0
+    return shifted
+
+
+def get_edge_path_statistics(bl_coll_obj,
+                             g,
+                             min_length=0,
+                             min_freq=0,
+                             at_least=0,
+                             verbose=0):
+    """
+    compute the same statistics as get_paths without enumerating the paths.
+    For each edge (child, parent), the number of paths from a node in bl_coll_obj.node_id2node_obj to
+    the root node that use the edge is the product of
+    a) the number of paths from a node to the child (forward)
+    b) the number of paths from the parent to the root node (backward),
+    which are both computed with dynamic programming on the graph of the BLCollection.
+    The filters are applied in the dynamic programming:
+    -min_freq: nodes with a lower occurrence_frequency are removed
+    -min_length: the paths are counted per number of nodes (up to min_length)
+    -at_least: the paths are counted per whether they contain a node (except the root node)
+    with an occurrence_frequency of at least at_least
+
+    :param bl_classes.BLCollection bl_coll_obj: a BLCollection
+    :param networkx.classes.digraph.DiGraph g: the graph with the occurrence_frequency of each node
+    :param int min_length: minimum number of nodes of a path
+    :param int min_freq: minimum occurrence_frequency of all nodes in a path
+    :param int at_least: at least one node in a path (except the root node) should have
+    an occurrence_frequency of at least this value
+
+    :rtype: tuple
+    :return: (number of paths, edge2freq, edge2children), see get_paths
+    """
+    sub_g = bl_coll_obj.g
+    top_node = bl_coll_obj.root_node
+
+    if not nx.is_directed_acyclic_graph(sub_g):
+        if verbose:
+            print()
+            print('the graph contains cycles: the stored paths are used')
+        all_paths, edge2freq, edge2children = get_paths(bl_coll_obj, g, min_length, min_freq, at_least, verbose=verbose)
+        return len(all_paths), edge2freq, edge2children
+
+    max_length = max(min_length, 1)
+    allowed = {node
+               for node in sub_g.nodes()
+               if g.nodes[node]['occurrence_frequency'] >= min_freq}
+    is_high = {node : all([node != top_node,
+                           g.nodes[node]['occurrence_frequency'] >= at_least])
+               for node in allowed}
+
+    # valid[l1, h1, l2, h2]: a path of which the first part has l1 nodes and the second part l2 nodes is counted
+    valid = np.zeros((max_length + 1, 2, max_length + 1, 2), dtype=object)
+    for l1, h1, l2, h2 in itertools.product(range(1, max_length + 1), range(2), range(1, max_length + 1), range(2)):
+        valid[l1, h1, l2, h2] = int(all([l1 + l2 >= min_length,
+                                         h1 or h2]))
+    valid = valid.reshape((max_length + 1) * 2, (max_length + 1) * 2)
+
+    order = [node
+             for node in nx.topological_sort(sub_g)
+             if node in allowed] # from the root node to the leaf nodes
+
+    # backward: paths from a node to the root node
+    backward = {}
+    if top_node in allowed:
+        backward[top_node] = np.zeros((max_length + 1, 2), dtype=object)
+        backward[top_node][1, 0] = 1
+
+    for node in order:
+        if node not in backward:
+            continue
+        for child in sub_g.successors(node):
+            if child not in allowed:
+                continue
+            if child not in backward:
+                backward[child] = np.zeros((max_length + 1, 2), dtype=object)
+            backward[child] += shift_path_counts(backward[node], is_high[child], max_length)
+
+    # forward: paths from a start node to a node
+    forward = {}
+    for node_id in bl_coll_obj.node_id2node_obj:
+        if node_id in backward: # only start nodes with a path to the root node
+            forward[node_id] = np.zeros((max_length + 1, 2), dtype=object)
+            forward[node_id][1, int(is_high[node_id])] += 1
+
+    edge2freq = defaultdict(int)
+    edge2children = defaultdict(set)
+
+    for node in reversed(order):
+        if node not in forward:
+            continue
+        flat_forward = forward[node].reshape(-1)
+        for parent in sub_g.predecessors(node):
+            if parent not in backward:
+                continue
+
+            freq = flat_forward @ valid @ backward[parent].reshape(-1)
+            if freq:
+                edge2freq[(node, parent)] += int(freq)
+                edge2children[parent].add(node)
+
+            if parent not in forward:
+                forward[parent] = np.zeros((max_length + 1, 2), dtype=object)
+            forward[parent] += shift_path_counts(forward[node], is_high[parent], max_length)
+
+    num_paths = 0
+    if top_node in forward:
+        for l1, h1 in itertools.product(range(1, max_length + 1), range(2)):
+            if all([l1 >= min_length, h1]):
+                num_paths += int(forward[top_node][l1, h1])
+
+    if verbose:
+        print()
+        print(f'min length: {min_length}')
+        print(f'min freq: {min_freq}')
+        print(num_paths, len(edge2freq))
+
+    return num_paths, edge2freq, edge2children
+
+
 def most_frequent_keys(a_dict, top_n):
     items = sorted(a_dict.items(),
                    key=operator.itemgetter(1),
@@ -0,0 +1,293 @@
+"""
+Benchmark the throughput of the code that reads NAF files on a synthetic corpus (see synthetic.py)
+
+Per-document consumers, measured serially and with a pool of worker processes:
+* gold_silver_bronze: wd_classes.gold_silver_bronze
+* get_sent_df: wd_classes.get_sent_df
+* get_ref_text_df: wd_classes.get_ref_text_df
+* get_content: wd_classes.ReferenceText.get_content
+
+Consumers of a whole EventTypeCollection, measured serially:
+* serialize: EventTypeCollection.serialize
+* write_all_to_one_json: EventTypeCollection.write_all_to_one_json
+
+For each consumer, the number of documents per second and MB per second are reported.
+The results are written to OUTPUT_FOLDER/naf_COMMIT_TIMESTAMP.json.
+
+Usage:
+  benchmark_naf_consumers.py --output_folder=<output_folder> [--num_documents=<num_documents>]\
+ [--min_sentences=<min_sentences>] [--max_sentences=<max_sentences>] [--min_tokens=<min_tokens>] [--max_tokens=<max_tokens>]\
+ [--predicate_rate=<predicate_rate>] [--gold_rate=<gold_rate>] [--silver_rate=<silver_rate>]\
+ [--num_workers=<num_workers>] [--seed=<seed>] [--compare=<compare>] [--verbose=<verbose>]
+
+Options:
+    --output_folder=<output_folder>  folder in which the benchmark results are stored
+    --num_documents=<num_documents>  number of NAF files [default: 3000]
+    --min_sentences=<min_sentences>  minimum number of sentences per document [default: 5]
+    --max_sentences=<max_sentences>  maximum number of sentences per document [default: 40]
+    --min_tokens=<min_tokens>  minimum number of tokens per sentence [default: 8]
+    --max_tokens=<max_tokens>  maximum number of tokens per sentence [default: 30]
+    --predicate_rate=<predicate_rate>  probability that a term is a predicate [default: 0.1]
+    --gold_rate=<gold_rate>  proportion of sentences with only manual predicates [default: 0.1]
+    --silver_rate=<silver_rate>  proportion of sentences with manual and system predicates [default: 0.2]
+    --num_workers=<num_workers>  number of worker processes, the number of CPUs if 0 [default: 0]
+    --seed=<seed>  random seed [default: 0]
+    --compare=<compare>  path to the results of a previous run, e.g., of another commit
+    --verbose=<verbose>  0 nothing, 1 results [default: 1]
+
+Example:
+    python benchmark_naf_consumers.py --output_folder="results" --num_documents="10000" --num_workers="4"
+"""
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import tempfile
+import platform
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from docopt import docopt
+
+sys.path.append('../')
+import wd_classes
+import synthetic
+from benchmark_pipeline import get_git_commit
+
+
+def run_gold_silver_bronze(ref_text_objs, unstructured_folder):
+    for ref_text_obj in ref_text_objs:
+        wd_classes.gold_silver_bronze(ref_text_obj.get_naf_path_of_reference_text(unstructured_folder))
+
+
+def run_get_sent_df(ref_text_objs, unstructured_folder):
+    wd_classes.get_sent_df(ref_text_objs=ref_text_objs, unstructured_folder=unstructured_folder)
+
+
+def run_get_ref_text_df(ref_text_objs, unstructured_folder):
+    wd_classes.get_ref_text_df(ref_text_objs=ref_text_objs, unstructured_folder=unstructured_folder)
+
+
+def run_get_content(ref_text_objs, unstructured_folder):
+    for ref_text_obj in ref_text_objs:
+        ref_text_obj.get_content(unstructured_folder)
+
+
+DOCUMENT_CONSUMERS = {
+    'gold_silver_bronze' : run_gold_silver_bronze,
+    'get_sent_df' : run_get_sent_df,
+    'get_ref_text_df' : run_get_ref_text_df,
+    'get_content' : run_get_content,
+}
+
+
+def run_consumer(consumer_and_arguments):
+    """
+    worker function: run one per-document consumer on a chunk of ReferenceTexts
+
+    :param tuple consumer_and_arguments: (name in DOCUMENT_CONSUMERS, list of ReferenceTexts, unstructured folder)
+
+    :rtype: int
+    :return: the number of ReferenceTexts
+    """
+    consumer, ref_text_objs, unstructured_folder = consumer_and_arguments
+    DOCUMENT_CONSUMERS[consumer](ref_text_objs, unstructured_folder)
+    return len(ref_text_objs)
+
+
+def get_throughput(seconds, num_documents, num_bytes):
+    return {'seconds' : round(seconds, 4),
+            'documents_per_second' : round(num_documents / seconds, 1) if seconds else None,
+            'mb_per_second' : round(num_bytes / 1024 ** 2 / seconds, 2) if seconds else None}
+
+
+def run_benchmark(output_folder,
+                  num_documents,
+                  num_workers,
+                  seed,
+                  languages=('en', 'nl', 'it'),
+                  verbose=0,
+                  **naf_settings):
+    """
+    generate a synthetic EventTypeCollection with one ReferenceText per language for each incident,
+    measure the throughput of each NAF consumer and write the results to OUTPUT_FOLDER/naf_COMMIT_TIMESTAMP.json
+
+    :param int num_workers: number of worker processes for the parallel runs, the number of CPUs if 0
+    :param naf_settings: see synthetic.NAF_SETTINGS
+
+    :rtype: tuple
+    :return: (path to the results, the results)
+    """
+    num_workers = num_workers or os.cpu_count()
+    settings = {
+        'num_documents' : num_documents,
+        'num_workers' : num_workers,
+        'seed' : seed,
+        'languages' : list(languages),
+        'naf_settings' : naf_settings,
+    }
+
+    consumer_to_result = {}
+    tmp_folder = tempfile.mkdtemp(prefix='ble_naf_benchmark_')
+
+    try:
+        paths = synthetic.generate_wd_cache(os.path.join(tmp_folder, 'wd_cache'),
+                                            num_event_types=50,
+                                            num_incidents=math.ceil(num_documents / len(languages)),
+                                            languages=languages,
+                                            seed=seed)
+        ev_coll_obj = wd_classes.EventTypeCollection(root_node=f'{synthetic.WD_PREFIX}{synthetic.ROOT_TITLE_ID}',
+                                                     **paths)
+
+        unstructured_folder = os.path.join(tmp_folder, 'unstructured')
+        synthetic.add_reference_texts(ev_coll_obj,
+                                      unstructured_folder,
+                                      languages=languages,
+                                      ref_text_rate=1.0,
+                                      max_num_documents=num_documents,
+                                      seed=seed,
+                                      **naf_settings)
+
+        ref_text_objs = [ref_text_obj
+                         for inc_obj in ev_coll_obj.inc_id_to_inc_obj.values()
+                         for ref_text_obj in inc_obj.reference_texts.values()]
+        assert len(ref_text_objs) == num_documents, \
+            f'requested {num_documents} NAF files, generated {len(ref_text_objs)}'
+        num_bytes = sum(os.path.getsize(ref_text_obj.get_naf_path_of_reference_text(unstructured_folder))
+                        for ref_text_obj in ref_text_objs)
+
+        chunk_size = max(1, math.ceil(len(ref_text_objs) / (num_workers * 4)))
+        chunks = [ref_text_objs[index:index + chunk_size]
+                  for index in range(0, len(ref_text_objs), chunk_size)]
+
+        for consumer in DOCUMENT_CONSUMERS:
+            start = time.perf_counter()
+            run_consumer((consumer, ref_text_objs, unstructured_folder))
+            serial = get_throughput(time.perf_counter() - start, len(ref_text_objs), num_bytes)
+
+            start = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                num_done = sum(executor.map(run_consumer,
+                                            [(consumer, chunk, unstructured_folder)
+                                             for chunk in chunks]))
+            assert num_done == len(ref_text_objs)
+            parallel = get_throughput(time.perf_counter() - start, len(ref_text_objs), num_bytes)
+
+            consumer_to_result[consumer] = {'serial' : serial,
+                                            'parallel' : parallel}
+
+        # every event type is its own main event type, i.e., all ReferenceTexts are used
+        event_types = {ev_obj.title_id
+                       for ev_obj in ev_coll_obj.event_type_id_to_event_type_obj.values()
+                       if ev_obj.incidents}
+        served_ref_text_objs = [ref_text_obj
+                                for ev_obj in ev_coll_obj.event_type_id_to_event_type_obj.values()
+                                if ev_obj.title_id in event_types
+                                for inc_obj in ev_obj.incidents
+                                for ref_text_obj in inc_obj.reference_texts.values()]
+        served_num_bytes = sum(os.path.getsize(ref_text_obj.get_naf_path_of_reference_text(unstructured_folder))
+                               for ref_text_obj in served_ref_text_objs)
+
+        start = time.perf_counter()
+        ev_coll_obj.serialize(event_types=event_types,
+                              unstructured_folder=unstructured_folder,
+                              filename=os.path.join(tmp_folder, 'sem.ttl'))
+        consumer_to_result['serialize'] = {'serial' : get_throughput(time.perf_counter() - start,
+                                                                     len(served_ref_text_objs),
+                                                                     served_num_bytes)}
+
+        start = time.perf_counter()
+        ev_coll_obj.write_all_to_one_json(event_types=event_types,
+                                          json_folder=tmp_folder,
+                                          unstructured_folder=unstructured_folder)
+        consumer_to_result['write_all_to_one_json'] = {'serial' : get_throughput(time.perf_counter() - start,
+                                                                                 len(served_ref_text_objs),
+                                                                                 served_num_bytes)}
+    finally:
+        shutil.rmtree(tmp_folder)
+
+    results = {
+        'git_commit' : get_git_commit(),
+        'timestamp' : datetime.now().isoformat(),
+        'python' : platform.python_version(),
+        'settings' : settings,
+        'counts' : {'documents' : len(ref_text_objs),
+                    'mb' : round(num_bytes / 1024 ** 2, 2)},
+        'consumers' : consumer_to_result,
+    }
+
+    if not os.path.isdir(output_folder):
+        os.makedirs(output_folder)
+
+    commit = (results['git_commit'] or 'unknown')[:10]
+    output_path = os.path.join(output_folder,
+                               f'naf_{commit}_{datetime.now().strftime("%Y%m%d-%H%M%S")}.json')
+    with open(output_path, 'w') as outfile:
+        json.dump(results, outfile, indent=2)
+
+    if verbose >= 1:
+        print()
+        print(f'wrote benchmark results to {output_path}')
+        print(f'counts: {results["counts"]}')
+        for consumer, mode_to_result in consumer_to_result.items():
+            for mode, result in mode_to_result.items():
+                print(f'{consumer} ({mode}): {result}')
+
+    return output_path, results
+
+
+def compare_results(previous, current):
+    """
+    print the differences in documents per second between two benchmark results
+
+    :param dict previous: results of run_benchmark, e.g., of another commit
+    :param dict current: results of run_benchmark
+    """
+    if previous['settings'] != current['settings']:
+        print()
+        print('WARNING: the settings differ, the comparison might not be meaningful')
+
+    print()
+    print(f'comparing {previous["git_commit"]} (previous) with {current["git_commit"]} (current)')
+    for consumer, mode_to_result in current['consumers'].items():
+        for mode, result in mode_to_result.items():
+            previous_result = previous['consumers'].get(consumer, {}).get(mode)
+            if previous_result is None or not previous_result['documents_per_second']:
+                print(f'{consumer} ({mode}): not part of the previous results')
+                continue
+            ratio = result['documents_per_second'] / previous_result['documents_per_second']
+            print(f'{consumer} ({mode}) documents per second: '
+                  f'{previous_result["documents_per_second"]} -> {result["documents_per_second"]} ({ratio:.2f}x)')
+
+
+if __name__ == '__main__':
+    arguments = docopt(__doc__)
+    print()
+    print('PROVIDED ARGUMENTS')
+    print(arguments)
+    print()
+
+    gold_rate = float(arguments['--gold_rate'])
+    silver_rate = float(arguments['--silver_rate'])
+    assert gold_rate + silver_rate <= 1, 'the sum of --gold_rate and --silver_rate should be at most 1'
+
+    output_path, results = run_benchmark(output_folder=arguments['--output_folder'],
+                                         num_documents=int(arguments['--num_documents']),
+                                         num_workers=int(arguments['--num_workers']),
+                                         seed=int(arguments['--seed']),
+                                         verbose=int(arguments['--verbose']),
+                                         min_sentences=int(arguments['--min_sentences']),
+                                         max_sentences=int(arguments['--max_sentences']),
+                                         min_tokens=int(arguments['--min_tokens']),
+                                         max_tokens=int(arguments['--max_tokens']),
+                                         predicate_rate=float(arguments['--predicate_rate']),
+                                         sentence_status_mix={'gold' : gold_rate,
+                                                              'silver' : silver_rate,
+                                                              'bronze' : 1 - gold_rate - silver_rate})
+
+    if arguments['--compare']:
+        with open(arguments['--compare']) as infile:
+            previous = json.load(infile)
+        compare_results(previous, results)
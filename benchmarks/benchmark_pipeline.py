@@ -0,0 +1,307 @@
+"""
+Benchmark the Wikidata-to-BLE pipeline on a synthetic event type hierarchy (see synthetic.py)
+
+The following phases are timed (wall time) and their peak memory usage is measured (tracemalloc):
+* EventTypeCollection: construction from the wd_cache JSON files
+* create_directed_graph: building and pruning the directed graph
+* BLCollection: end-to-end basic level detection
+* remove_overlapping_bls: the part of BLCollection spent in remove_overlapping_bls
+* serialize: EventTypeCollection.serialize
+* write_stats: EventTypeCollection.write_stats
+
+The results are written to OUTPUT_FOLDER/COMMIT_TIMESTAMP.json, which can be compared
+to the results of another commit using --compare.
+
+Usage:
+  benchmark_pipeline.py --output_folder=<output_folder> [--num_event_types=<num_event_types>] [--max_depth=<max_depth>]\
+ [--multi_inheritance_rate=<multi_inheritance_rate>] [--num_incidents=<num_incidents>] [--zipf_exponent=<zipf_exponent>]\
+ [--ref_text_rate=<ref_text_rate>] [--subsumer_threshold=<subsumer_threshold>] [--seed=<seed>]\
+ [--no_memory] [--profile_folder=<profile_folder>] [--compare=<compare>] [--verbose=<verbose>]
+
+Options:
+    --output_folder=<output_folder>  folder in which the benchmark results are stored
+    --num_event_types=<num_event_types>  number of event types [default: 1000]
+    --max_depth=<max_depth>  maximum depth of the hierarchy [default: 8]
+    --multi_inheritance_rate=<multi_inheritance_rate>  probability that an event type has a second parent [default: 0.1]
+    --num_incidents=<num_incidents>  number of incidents [default: 10000]
+    --zipf_exponent=<zipf_exponent>  exponent of the distribution of incidents over event types [default: 1.2]
+    --ref_text_rate=<ref_text_rate>  probability that an incident has reference texts [default: 0.1]
+    --subsumer_threshold=<subsumer_threshold>  the subsumer threshold of the BLCollection [default: 2]
+    --seed=<seed>  random seed [default: 0]
+    --no_memory  do not measure peak memory (tracemalloc slows down the phases)
+    --profile_folder=<profile_folder>  if provided, the phases of the constructors are profiled with cProfile
+    --compare=<compare>  path to the results of a previous run, e.g., of another commit
+    --verbose=<verbose>  0 nothing, 1 results [default: 1]
+
+Example:
+    python benchmark_pipeline.py --output_folder="results" --num_event_types="5000" --num_incidents="50000"
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import platform
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+from docopt import docopt
+
+sys.path.append('../')
+import wd_classes
+import bl_classes
+import profiling
+import synthetic
+
+
+def get_git_commit():
+    """
+    :rtype: str
+    :return: the commit hash of HEAD, None if it can not be determined
+    """
+    try:
+        output = subprocess.run(['git', 'rev-parse', 'HEAD'],
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                check=True,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL)
+    except (subprocess.CalledProcessError, OSError):
+        return None
+    return output.stdout.decode('utf-8').strip()
+
+
+def measure(phase_to_result, phase, function, measure_memory=True):
+    """
+    call function and store its wall time and peak memory usage in phase_to_result[phase]
+
+    :param dict phase_to_result: phase -> {'seconds': float, 'peak_memory_mb': float}
+    :param str phase: name of the phase
+    :param function: function without arguments
+    :param bool measure_memory: if True, the peak memory usage is measured using tracemalloc
+
+    :return: the return value of function
+    """
+    if measure_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    return_value = function()
+    seconds = time.perf_counter() - start
+
+    result = {'seconds': round(seconds, 4)}
+    if measure_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['peak_memory_mb'] = round(peak / 1024 ** 2, 2)
+
+    phase_to_result[phase] = result
+    return return_value
+
+
+def run_benchmark(output_folder,
+                  num_event_types,
+                  max_depth,
+                  multi_inheritance_rate,
+                  num_incidents,
+                  zipf_exponent,
+                  ref_text_rate,
+                  subsumer_threshold,
+                  seed,
+                  measure_memory=True,
+                  profile_folder=None,
+                  languages=('en', 'nl', 'it'),
+                  verbose=0):
+    """
+    run all phases on a synthetic hierarchy and write the results to OUTPUT_FOLDER/COMMIT_TIMESTAMP.json.
+    The phase reports of the constructors (see profiling.py) are part of the results.
+
+    :param str profile_folder: if provided, each phase of the constructors is profiled with cProfile
+    and the profiles are written to this folder
+
+    :rtype: tuple
+    :return: (path to the results, the results)
+    """
+    settings = {
+        'num_event_types': num_event_types,
+        'max_depth': max_depth,
+        'multi_inheritance_rate': multi_inheritance_rate,
+        'num_incidents': num_incidents,
+        'zipf_exponent': zipf_exponent,
+        'ref_text_rate': ref_text_rate,
+        'subsumer_threshold': subsumer_threshold,
+        'seed': seed,
+        'languages': list(languages),
+        'measure_memory': measure_memory,
+    }
+
+    phase_to_result = {}
+    phase_reports = {}
+    counts = {}
+    tmp_folder = tempfile.mkdtemp(prefix='ble_benchmark_')
+
+    def get_profiler():
+        if profile_folder is None:
+            return None
+        return profiling.PhaseProfiler(profile_phases=True, profile_folder=profile_folder)
+
+    try:
+        paths = synthetic.generate_wd_cache(os.path.join(tmp_folder, 'wd_cache'),
+                                            num_event_types=num_event_types,
+                                            max_depth=max_depth,
+                                            multi_inheritance_rate=multi_inheritance_rate,
+                                            num_incidents=num_incidents,
+                                            zipf_exponent=zipf_exponent,
+                                            languages=languages,
+                                            seed=seed)
+        root_node = f'{synthetic.WD_PREFIX}{synthetic.ROOT_TITLE_ID}'
+
+        ev_coll_obj = measure(phase_to_result,
+                              'EventTypeCollection',
+                              lambda: wd_classes.EventTypeCollection(root_node=root_node,
+                                                                     needed_properties={f'{synthetic.PROP_PREFIX}P17'},
+                                                                     profiler=get_profiler(),
+                                                                     **paths),
+                              measure_memory=measure_memory)
+        counts['event_types'] = len(ev_coll_obj.event_type_id_to_event_type_obj)
+        counts['incidents'] = len(ev_coll_obj.inc_id_to_inc_obj)
+        counts['nodes'] = ev_coll_obj.g.number_of_nodes()
+        counts['edges'] = ev_coll_obj.g.number_of_edges()
+        phase_reports['EventTypeCollection'] = ev_coll_obj.phase_report
+
+        measure(phase_to_result,
+                'create_directed_graph',
+                lambda: ev_coll_obj.create_directed_graph(paths['path_subclass_of_rels'], root_node, 1),
+                measure_memory=measure_memory)
+
+        bl_coll_obj = measure(phase_to_result,
+                              'BLCollection',
+                              lambda: bl_classes.BLCollection(g=ev_coll_obj.g,
+                                                              resource='synthetic',
+                                                              output_folder=os.path.join(tmp_folder, 'output'),
+                                                              root_node=synthetic.ROOT_TITLE_ID,
+                                                              weight_property='occurrence_frequency',
+                                                              subsumer_threshold=subsumer_threshold,
+                                                              root_zero=True,
+                                                              profiler=get_profiler()),
+                              measure_memory=measure_memory)
+        for phase_info in bl_coll_obj.phase_report['phases']:
+            if phase_info['phase'] == 'remove_overlapping_bls':
+                phase_to_result['remove_overlapping_bls'] = {'seconds': phase_info['seconds']}
+        counts['bls'] = len(bl_coll_obj.bl2bl_obj)
+        phase_reports['BLCollection'] = bl_coll_obj.phase_report
+
+        unstructured_folder = os.path.join(tmp_folder, 'unstructured')
+        counts['naf_files'] = synthetic.add_reference_texts(ev_coll_obj,
+                                                            unstructured_folder,
+                                                            languages=languages,
+                                                            ref_text_rate=ref_text_rate,
+                                                            seed=seed)
+
+        # every event type is its own main event type, i.e., all incidents with reference texts are used
+        event_types = {ev_obj.title_id
+                       for ev_obj in ev_coll_obj.event_type_id_to_event_type_obj.values()
+                       if ev_obj.incidents}
+
+        measure(phase_to_result,
+                'serialize',
+                lambda: ev_coll_obj.serialize(event_types=event_types,
+                                              unstructured_folder=unstructured_folder,
+                                              filename=os.path.join(tmp_folder, 'sem.ttl')),
+                measure_memory=measure_memory)
+
+        measure(phase_to_result,
+                'write_stats',
+                lambda: ev_coll_obj.write_stats(event_types=event_types,
+                                                stats_folder=os.path.join(tmp_folder, 'stats'),
+                                                unstructured_folder=unstructured_folder,
+                                                languages=list(languages)),
+                measure_memory=measure_memory)
+    finally:
+        shutil.rmtree(tmp_folder)
+
+    results = {
+        'git_commit': get_git_commit(),
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'settings': settings,
+        'counts': counts,
+        'phases': phase_to_result,
+        'phase_reports': phase_reports,
+    }
+
+    if not os.path.isdir(output_folder):
+        os.makedirs(output_folder)
+
+    commit = (results['git_commit'] or 'unknown')[:10]
+    output_path = os.path.join(output_folder,
+                               f'{commit}_{datetime.now().strftime("%Y%m%d-%H%M%S")}.json')
+    with open(output_path, 'w') as outfile:
+        json.dump(results, outfile, indent=2)
+
+    if verbose >= 1:
+        print()
+        print(f'wrote benchmark results to {output_path}')
+        print(f'counts: {counts}')
+        for phase, result in phase_to_result.items():
+            print(f'{phase}: {result}')
+
+    return output_path, results
+
+
+def compare_results(previous, current):
+    """
+    print the differences per phase between two benchmark results
+
+    :param dict previous: results of run_benchmark, e.g., of another commit
+    :param dict current: results of run_benchmark
+    """
+    if previous['settings'] != current['settings']:
+        print()
+        print('WARNING: the settings differ, the comparison might not be meaningful')
+        print(f'previous: {previous["settings"]}')
+        print(f'current: {current["settings"]}')
+
+    print()
+    print(f'comparing {previous["git_commit"]} (previous) with {current["git_commit"]} (current)')
+    for phase, result in current['phases'].items():
+        previous_result = previous['phases'].get(phase)
+        if previous_result is None:
+            print(f'{phase}: not part of the previous results')
+            continue
+
+        for measurement, value in result.items():
+            previous_value = previous_result.get(measurement)
+            if previous_value is None:
+                continue
+            ratio = value / previous_value if previous_value else float('inf')
+            print(f'{phase} {measurement}: {previous_value} -> {value} ({ratio:.2f}x)')
+
+
+if __name__ == '__main__':
+    arguments = docopt(__doc__)
+    print()
+    print('PROVIDED ARGUMENTS')
+    print(arguments)
+    print()
+
+    verbose = int(arguments['--verbose'])
+
+    output_path, results = run_benchmark(output_folder=arguments['--output_folder'],
+                                         num_event_types=int(arguments['--num_event_types']),
+                                         max_depth=int(arguments['--max_depth']),
+                                         multi_inheritance_rate=float(arguments['--multi_inheritance_rate']),
+                                         num_incidents=int(arguments['--num_incidents']),
+                                         zipf_exponent=float(arguments['--zipf_exponent']),
+                                         ref_text_rate=float(arguments['--ref_text_rate']),
+                                         subsumer_threshold=int(arguments['--subsumer_threshold']),
+                                         seed=int(arguments['--seed']),
+                                         measure_memory=not arguments['--no_memory'],
+                                         profile_folder=arguments['--profile_folder'],
+                                         verbose=verbose)
+
+    if arguments['--compare']:
+        with open(arguments['--compare']) as infile:
+            previous = json.load(infile)
+        compare_results(previous, results)
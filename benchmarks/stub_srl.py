@@ -0,0 +1,70 @@
+"""
+Stub SRL command for testing open_sesame_driver.py without open-sesame and its models
+
+For each NAF file in the input folder, a NAF file with the same basename is written to the output folder
+with an srl layer containing one predicate per term (the first term of each sentence).
+
+Usage:
+  stub_srl.py <input_folder> <output_folder> [--seconds_per_document=<seconds_per_document>] [--fail_on=<fail_on>]
+
+Options:
+    --seconds_per_document=<seconds_per_document>  simulated processing time per document [default: 0]
+    --fail_on=<fail_on>  exit with status 1 if a basename in the input folder contains this string
+
+Example:
+    python stub_srl.py input output --seconds_per_document=0.01
+"""
+import os
+import sys
+import time
+
+from docopt import docopt
+from lxml import etree
+
+
+def add_srl_layer(doc):
+    """
+    replace the srl layer of a NAF document by one predicate for the first term of each sentence
+    """
+    naf_el = doc.getroot()
+    srl_el = naf_el.find('srl')
+    if srl_el is not None:
+        naf_el.remove(srl_el)
+    srl_el = etree.SubElement(naf_el, 'srl')
+
+    wid_to_sent = {wf_el.get('id') : wf_el.get('sent') for wf_el in naf_el.iterfind('text/wf')}
+    seen_sents = set()
+    for term_el in naf_el.iterfind('terms/term'):
+        sent = wid_to_sent.get(term_el.find('span/target').get('id'))
+        if sent in seen_sents:
+            continue
+        seen_sents.add(sent)
+
+        pred_el = etree.SubElement(srl_el, 'predicate', attrib={'id' : f'pr{len(seen_sents)}',
+                                                               'uri' : 'Stub_frame'})
+        span_el = etree.SubElement(pred_el, 'span')
+        etree.SubElement(span_el, 'target', attrib={'id' : term_el.get('id')})
+
+
+if __name__ == '__main__':
+    arguments = docopt(__doc__)
+
+    input_folder = arguments['<input_folder>']
+    output_folder = arguments['<output_folder>']
+    seconds_per_document = float(arguments['--seconds_per_document'])
+    fail_on = arguments['--fail_on']
+
+    basenames = sorted(basename for basename in os.listdir(input_folder)
+                       if basename.endswith('.naf'))
+
+    if fail_on and any(fail_on in basename for basename in basenames):
+        print(f'stub SRL failure: a basename contains {fail_on}')
+        sys.exit(1)
+
+    for basename in basenames:
+        doc = etree.parse(os.path.join(input_folder, basename))
+        add_srl_layer(doc)
+        doc.write(os.path.join(output_folder, basename), encoding='utf-8', xml_declaration=True)
+        time.sleep(seconds_per_document)
+
+    print(f'stub SRL processed {len(basenames)} NAF files')
@@ -0,0 +1,389 @@
+"""
+Generation of synthetic input for benchmarking
+
+-generate_wd_cache: a P279-like (subclass of) event type hierarchy with incidents, properties, and labels,
+written to the same JSON files as the ones in wd_cache (see wd_utils.QUERIES)
+-write_naf_corpus: synthetic NAF files (raw, text/wf, terms/term, and srl/predicate layers)
+in the unstructured folder layout (see naf_store.py)
+-add_reference_texts: ReferenceText objects for the incidents of an EventTypeCollection
+together with their synthetic NAF files
+"""
+import os
+import json
+import random
+
+from lxml import etree
+
+WD_PREFIX = 'http://www.wikidata.org/entity/'
+PROP_PREFIX = 'http://www.wikidata.org/prop/direct/'
+ROOT_TITLE_ID = 'Q1656682' # event
+
+# basenames of the wd_cache JSON files -> argument of wd_classes.EventTypeCollection
+WD_CACHE_BASENAMES = {
+    'path_subclass_of_rels' : 'subclass_of.json',
+    'path_instance_of_rels' : 'instance_of.json',
+    'path_inc_to_labels' : 'inc_to_labels.json',
+    'path_inc_to_props' : 'inc_to_props.json',
+    'path_event_type_to_labels' : 'event_type_to_labels.json',
+    'path_prop_to_labels' : 'prop_to_labels.json',
+}
+
+# the category of a sentence determines the status of its predicates (see wd_classes.gold_silver_bronze):
+# gold: all manual, silver: at least one manual and one system, bronze: all system
+SENTENCE_STATUS_MIX = {'gold' : 0.1, 'silver' : 0.2, 'bronze' : 0.7}
+
+# size of a synthetic NAF document (the numbers are drawn uniformly between min and max)
+NAF_SETTINGS = {
+    'min_sentences' : 5,
+    'max_sentences' : 40,
+    'min_tokens' : 8,
+    'max_tokens' : 30,
+    'predicate_rate' : 0.1,
+    'sentence_status_mix' : SENTENCE_STATUS_MIX,
+}
+
+WORDS = ['election', 'war', 'match', 'festival', 'storm', 'earthquake', 'protest', 'summit',
+         'the', 'a', 'of', 'in', 'was', 'held', 'took', 'place', 'country', 'city', 'people', 'year']
+
+
+def generate_hierarchy(num_event_types,
+                       max_depth,
+                       multi_inheritance_rate,
+                       rng):
+    """
+    generate a directed acyclic subclass of hierarchy below the root node
+
+    :param int num_event_types: number of event types (including the root node)
+    :param int max_depth: maximum depth of an event type (the root node has depth 0)
+    :param float multi_inheritance_rate: probability that an event type has a second parent
+    :param random.Random rng: random number generator
+
+    :rtype: tuple
+    :return: (list of title ids (the first is the root node), list of (child, parent) title id pairs)
+    """
+    title_ids = [ROOT_TITLE_ID] + [f'Q{index}' for index in range(1, num_event_types)]
+    depth_to_title_ids = {0 : [ROOT_TITLE_ID]}
+
+    subclass_of_rels = []
+    for title_id in title_ids[1:]:
+        depth = rng.randint(1, max_depth)
+        while depth - 1 not in depth_to_title_ids:
+            depth -= 1
+
+        parent = rng.choice(depth_to_title_ids[depth - 1])
+        subclass_of_rels.append((title_id, parent))
+
+        if depth >= 2 and rng.random() < multi_inheritance_rate:
+            other_depth = rng.randint(0, depth - 1)
+            other_parent = rng.choice(depth_to_title_ids[other_depth])
+            if other_parent != parent:
+                subclass_of_rels.append((title_id, other_parent))
+
+        depth_to_title_ids.setdefault(depth, []).append(title_id)
+
+    return title_ids, subclass_of_rels
+
+
+def generate_wd_cache(output_folder,
+                      num_event_types=1000,
+                      max_depth=8,
+                      multi_inheritance_rate=0.1,
+                      num_incidents=10000,
+                      zipf_exponent=1.2,
+                      num_properties=20,
+                      properties_per_incident=3,
+                      languages=('en', 'nl', 'it'),
+                      seed=0):
+    """
+    write synthetic versions of the wd_cache JSON files (see WD_CACHE_BASENAMES).
+    The number of incidents per event type follows a Zipf-like distribution, i.e., a few event types
+    have many incidents and most event types have few.
+
+    :param str output_folder: the folder in which the JSON files are written
+    :param int num_event_types: number of event types
+    :param int max_depth: maximum depth of the hierarchy
+    :param float multi_inheritance_rate: probability that an event type has a second parent
+    :param int num_incidents: number of incidents
+    :param float zipf_exponent: exponent of the distribution of incidents over event types
+    :param int num_properties: number of properties (P17 and P585 are always included)
+    :param int properties_per_incident: number of properties of each incident
+    :param tuple languages: the languages of the incident labels
+    :param int seed: random seed
+
+    :rtype: dict
+    :return: mapping from argument of wd_classes.EventTypeCollection -> path
+    """
+    rng = random.Random(seed)
+
+    if not os.path.isdir(output_folder):
+        os.makedirs(output_folder)
+
+    title_ids, subclass_of_rels = generate_hierarchy(num_event_types,
+                                                     max_depth,
+                                                     multi_inheritance_rate,
+                                                     rng)
+
+    prop_ids = ['P17', 'P585'] + [f'P{1000 + index}' for index in range(max(num_properties - 2, 0))]
+
+    weights = [1 / rank ** zipf_exponent
+               for rank in range(1, len(title_ids))]
+    ranked_title_ids = title_ids[1:]
+    rng.shuffle(ranked_title_ids)
+
+    instance_of_rels = []
+    inc_to_labels = []
+    inc_to_props = []
+    inc_title_ids = [f'Q{num_event_types + index}' for index in range(num_incidents)]
+    event_types_of_incidents = rng.choices(ranked_title_ids, weights=weights, k=num_incidents)
+
+    for inc_title_id, event_type in zip(inc_title_ids, event_types_of_incidents):
+        inc_uri = f'{WD_PREFIX}{inc_title_id}'
+        instance_of_rels.append([f'{WD_PREFIX}{event_type}', inc_uri])
+
+        for language in languages:
+            inc_to_labels.append([inc_uri, [language, f'{inc_title_id} {language} {rng.choice(WORDS)}']])
+
+        for prop_id in {'P17'} | set(rng.sample(prop_ids, min(properties_per_incident, len(prop_ids)))):
+            inc_to_props.append([inc_uri, f'{PROP_PREFIX}{prop_id}'])
+
+    files = {
+        'path_subclass_of_rels' : [[f'{WD_PREFIX}{child}', f'{WD_PREFIX}{parent}']
+                                   for child, parent in subclass_of_rels],
+        'path_instance_of_rels' : instance_of_rels,
+        'path_inc_to_labels' : inc_to_labels,
+        'path_inc_to_props' : inc_to_props,
+        'path_event_type_to_labels' : [[f'{WD_PREFIX}{title_id}', f'event type {title_id}']
+                                       for title_id in title_ids],
+        'path_prop_to_labels' : [[f'{WD_PREFIX}{prop_id}', f'property {prop_id}']
+                                 for prop_id in prop_ids]
+    }
+
+    paths = {}
+    for argument, rels in files.items():
+        path = os.path.join(output_folder, WD_CACHE_BASENAMES[argument])
+        with open(path, 'w') as outfile:
+            json.dump(rels, outfile)
+        paths[argument] = path
+
+    return paths
+
+
+def get_predicate_statuses(category, num_predicates):
+    """
+    :param str category: gold | silver | bronze
+    :param int num_predicates: number of predicates in the sentence (at least 1, at least 2 for silver)
+
+    :rtype: list
+    :return: the status (manual | system) of each predicate
+    """
+    if category == 'gold':
+        return ['manual'] * num_predicates
+    if category == 'silver':
+        return ['manual'] + ['system'] * (num_predicates - 1)
+    return ['system'] * num_predicates
+
+
+def create_naf(sentences,
+               sentence_categories,
+               predicate_rate,
+               rng,
+               title='',
+               language='en'):
+    """
+    create a NAF document with the layers used in this repository:
+    raw, text/wf, terms/term, and srl/predicate (each predicate has one role)
+
+    :param list sentences: list of sentences, each a list of tokens
+    :param list sentence_categories: the category of each sentence (see SENTENCE_STATUS_MIX)
+    :param float predicate_rate: probability that a term is a predicate.
+    Gold and silver sentences always have predicates.
+    :param random.Random rng: random number generator
+
+    :rtype: lxml.etree._ElementTree
+    """
+    naf_el = etree.Element('NAF', attrib={'version' : 'v3.1', '{http://www.w3.org/XML/1998/namespace}lang' : language})
+    header_el = etree.SubElement(naf_el, 'nafHeader')
+    etree.SubElement(header_el, 'fileDesc', attrib={'title' : title})
+    raw_el = etree.SubElement(naf_el, 'raw')
+    text_el = etree.SubElement(naf_el, 'text')
+    terms_el = etree.SubElement(naf_el, 'terms')
+    srl_el = etree.SubElement(naf_el, 'srl')
+
+    offset = 0
+    raw_parts = []
+    token_index = 0
+    predicate_index = 0
+
+    for sent_index, (tokens, category) in enumerate(zip(sentences, sentence_categories), 1):
+        tids = []
+        for token in tokens:
+            token_index += 1
+            wid = f'w{token_index}'
+            tid = f't{token_index}'
+            tids.append(tid)
+
+            wf_el = etree.SubElement(text_el, 'wf', attrib={'id' : wid,
+                                                            'sent' : str(sent_index),
+                                                            'offset' : str(offset),
+                                                            'length' : str(len(token))})
+            wf_el.text = token
+            raw_parts.append(token)
+            offset += len(token) + 1
+
+            term_el = etree.SubElement(terms_el, 'term', attrib={'id' : tid, 'lemma' : token.lower()})
+            span_el = etree.SubElement(term_el, 'span')
+            etree.SubElement(span_el, 'target', attrib={'id' : wid})
+
+        predicate_tids = [tid for tid in tids if rng.random() < predicate_rate]
+        min_predicates = {'gold' : 1, 'silver' : 2}.get(category, 0)
+        while len(predicate_tids) < min(min_predicates, len(tids)):
+            predicate_tids = sorted(set(predicate_tids) | {rng.choice(tids)}, key=tids.index)
+
+        for tid, status in zip(predicate_tids, get_predicate_statuses(category, len(predicate_tids))):
+            predicate_index += 1
+            pred_el = etree.SubElement(srl_el, 'predicate', attrib={'id' : f'pr{predicate_index}',
+                                                                   'status' : status})
+            pred_span_el = etree.SubElement(pred_el, 'span')
+            etree.SubElement(pred_span_el, 'target', attrib={'id' : tid})
+
+            role_el = etree.SubElement(pred_el, 'role', attrib={'id' : f'rl{predicate_index}',
+                                                                'semRole' : 'Agent'})
+            role_span_el = etree.SubElement(role_el, 'span')
+            etree.SubElement(role_span_el, 'target', attrib={'id' : rng.choice(tids)})
+
+    raw_el.text = ' '.join(raw_parts)
+
+    return etree.ElementTree(naf_el)
+
+
+def write_naf_document(naf_path,
+                       title,
+                       language,
+                       rng,
+                       min_sentences=NAF_SETTINGS['min_sentences'],
+                       max_sentences=NAF_SETTINGS['max_sentences'],
+                       min_tokens=NAF_SETTINGS['min_tokens'],
+                       max_tokens=NAF_SETTINGS['max_tokens'],
+                       predicate_rate=NAF_SETTINGS['predicate_rate'],
+                       sentence_status_mix=SENTENCE_STATUS_MIX):
+    """
+    write one synthetic NAF document to disk (see create_naf)
+
+    :param str naf_path: the path of the NAF file
+    :param dict sentence_status_mix: mapping from sentence category -> relative frequency
+
+    :rtype: int
+    :return: the size of the NAF file in bytes
+    """
+    num_sentences = rng.randint(min_sentences, max_sentences)
+    sentences = []
+    for _ in range(num_sentences):
+        tokens = [rng.choice(WORDS) for _ in range(rng.randint(min_tokens, max_tokens))]
+        sentences.append(tokens + ['.'])
+
+    categories = list(sentence_status_mix)
+    sentence_categories = rng.choices(categories,
+                                      weights=[sentence_status_mix[category] for category in categories],
+                                      k=num_sentences)
+
+    doc = create_naf(sentences, sentence_categories, predicate_rate, rng, title=title, language=language)
+
+    folder = os.path.dirname(naf_path)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    doc.write(naf_path,
+              encoding='utf-8',
+              xml_declaration=True,
+              pretty_print=True)
+
+    return os.path.getsize(naf_path)
+
+
+def write_naf_corpus(unstructured_folder,
+                     num_documents,
+                     languages=('en', 'nl', 'it'),
+                     seed=0,
+                     **naf_settings):
+    """
+    write a synthetic corpus to unstructured_folder/LANGUAGE/TITLE.naf
+
+    :param str unstructured_folder: the unstructured folder
+    :param int num_documents: the number of NAF files (distributed round-robin over the languages)
+    :param tuple languages: the languages
+    :param int seed: random seed
+    :param naf_settings: see NAF_SETTINGS
+
+    :rtype: dict
+    :return: mapping from (language, title) -> size of the NAF file in bytes
+    """
+    rng = random.Random(seed)
+
+    title_id_to_size = {}
+    for index in range(num_documents):
+        language = languages[index % len(languages)]
+        title = f'document {index}'
+        naf_path = os.path.join(unstructured_folder, language, f'{title}.naf')
+        title_id_to_size[(language, title)] = write_naf_document(naf_path,
+                                                                 title,
+                                                                 language,
+                                                                 rng,
+                                                                 **naf_settings)
+
+    return title_id_to_size
+
+
+def add_reference_texts(ev_coll_obj,
+                        unstructured_folder,
+                        languages=('en', 'nl', 'it'),
+                        ref_text_rate=0.5,
+                        max_num_documents=None,
+                        seed=0,
+                        **naf_settings):
+    """
+    add ReferenceText objects (and extra_info) to the incidents of an EventTypeCollection
+    and write their NAF files to unstructured_folder/LANGUAGE/TITLE.naf
+
+    :param wd_classes.EventTypeCollection ev_coll_obj: the collection to update
+    :param str unstructured_folder: the folder in which the NAF files are written
+    :param tuple languages: each incident with reference texts gets one per language
+    :param float ref_text_rate: the probability that an incident has reference texts
+    :param int max_num_documents: if provided, no NAF files are written once this number is reached
+    (the last incident can have reference texts in only some of the languages)
+    :param naf_settings: see NAF_SETTINGS
+
+    :rtype: int
+    :return: the number of NAF files written
+    """
+    import wd_classes
+
+    rng = random.Random(seed)
+    num_written = 0
+
+    for inc_obj in ev_coll_obj.inc_id_to_inc_obj.values():
+        if max_num_documents is not None and num_written >= max_num_documents:
+            break
+
+        if rng.random() >= ref_text_rate:
+            continue
+
+        inc_obj.extra_info = {
+            'sem:hasPlace' : {f'{WD_PREFIX}Q{rng.randint(1, 250)}'},
+            'sem:hasTimeStamp' : {f'{rng.randint(1900, 2020)}-01-01T00:00:00Z'},
+        }
+
+        for language in languages:
+            if max_num_documents is not None and num_written >= max_num_documents:
+                break
+
+            title = f'{inc_obj.title_id} {language}'
+            ref_text_obj = wd_classes.ReferenceText(title=title, language=language)
+            inc_obj.reference_texts[ref_text_obj.title_id] = ref_text_obj
+
+            write_naf_document(os.path.join(unstructured_folder, language, f'{title}.naf'),
+                               title,
+                               language,
+                               rng,
+                               **naf_settings)
+            num_written += 1
+
+    return num_written
@@ -1,12 +1,13 @@
 import networkx as nx
-import nltk
 from collections import defaultdict
 import itertools
 import statistics
-import pandas
 import pickle
 import os
 import utils
+import graph_utils
+import bl_store
+import profiling
 
 
 def update_one_dict_with_another(original_d, new_d, verbose=0):
@@ -34,8 +35,36 @@ def update_one_dict_with_another(original_d, new_d, verbose=0):
 
 #update_one_dict_with_another({'a': 1, 'b': 2}, {'a': 2, 'b': 2}, verbose=3)
 
-def get_parents2children(nodes, g):
+def get_parents2children(nodes, g, closure_index=None):
+    """
+    :param set nodes: set of nodes in g
+    :param g: networkx directed graph
+    :param graph_utils.ClosureIndex closure_index: if provided, cached descendants are used
+    instead of a path search for each pair of nodes
+    """
     parent2children = defaultdict(set)
+
+    if closure_index is not None:
+        nodes = list(nodes)
+        node2position = {node : position for position, node in enumerate(nodes)}
+
+        # the parents are added in the order of the pairwise path search below
+        # (remove_overlapping_bls depends on it), i.e., ordered by the first pair in which the node is a parent
+        parent2first_pair = {}
+        for node in nodes:
+            position = node2position[node]
+            children = [child for child in closure_index.descendants(node) if child in node2position]
+            if children:
+                parent2first_pair[node] = min((node2position[child], position, 1)
+                                              if node2position[child] < position
+                                              else (position, node2position[child], 0)
+                                              for child in children)
+
+        for node in sorted(parent2first_pair, key=parent2first_pair.get):
+            parent2children[node].update(child for child in nodes
+                                         if child in closure_index.descendants(node))
+        return parent2children
+
     for node_one, node_two in itertools.combinations(nodes, 2):
         if nx.has_path(g, node_one, node_two):
             parent2children[node_one].add(node_two)
@@ -70,7 +99,8 @@ def obtain_local_maxima(list_of_keys, key2freq):
     """
     local_maxima = []
     local_maximum_score = 0
-    for before, core, after in nltk.trigrams(list_of_keys):
+    # consecutive trigrams (same as nltk.trigrams, without loading nltk)
+    for before, core, after in zip(list_of_keys, list_of_keys[1:], list_of_keys[2:]):
 
         if all([key2freq.get(core, 0) > key2freq.get(before, 0),
                 key2freq.get(core, 0) > key2freq.get(after, 0)]):
@@ -92,6 +122,8 @@ key2freq = {'a' : 1, 'b' : 2, 'c': 1, 'd': 4, 'e': 1, 'f': 6}
 result = obtain_local_maxima(list_of_keys, key2freq)
 assert result == (['b', 'd'], 2)
 
+CLOSURE_CACHE_SIZE = 1024 # maximum number of cached descendant closures of a BLCollection
+
 
 
 class BLCollection:
@@ -117,6 +149,10 @@ class BLCollection:
     :param str weight_property: supported: 'occurrence_frequency' | 'features'
     :param int subsumer_threshold: how many nodes should there be below
     the BLE? How many should it minimally subsume?
+    :param str result_store_path: if provided, the results are also added to this
+    SQLite database (see bl_store.BLResultStore)
+    :param profiling.PhaseProfiler profiler: optional, e.g., to measure peak memory or to profile
+    compute_bls with cProfile. Wall times and counts per phase are always stored in self.phase_report
 
 
     """
@@ -128,6 +164,8 @@ class BLCollection:
                  subsumer_threshold,
                  output_folder,
                  root_zero=True,
+                 result_store_path=None,
+                 profiler=None,
                  verbose=0):
         self.root_node = root_node
         self.root_zero = root_zero
@@ -135,23 +173,50 @@ class BLCollection:
         self.subsumer_threshold = subsumer_threshold
         self.verbose = verbose
 
-        self.g = self.get_subgraph(g)
-        self.validate()
+        if profiler is None:
+            profiler = profiling.PhaseProfiler(verbose=verbose)
+        profiler.start('BLCollection')
 
-        self.leaf_nodes = self.get_leaf_nodes()
+        with profiler.phase('get_subgraph') as record:
+            self.g = self.get_subgraph(g)
+            record.count(nodes=self.g.number_of_nodes(),
+                         edges=self.g.number_of_edges())
 
-        self.node_id2node_obj = self.load_node_objs(self.leaf_nodes)
+        with profiler.phase('validate'):
+            self.validate()
 
-        self.node_id2bl_obj = self.compute_bls(source_node_objs=self.node_id2node_obj.values(),
-                                               candidate_bles=set(self.g.nodes()))
+        with profiler.phase('get_leaf_nodes') as record:
+            self.leaf_nodes = self.get_leaf_nodes()
+            record.count(leaf_nodes=len(self.leaf_nodes))
 
-        self.remove_overlapping_bls()
+        with profiler.phase('load_node_objs') as record:
+            self.node_id2node_obj = self.load_node_objs(self.leaf_nodes)
+            record.count(node_objs=len(self.node_id2node_obj))
 
-        self.bl2bl_obj = self.get_bl2bl_obj()
+        with profiler.phase('compute_bls') as record:
+            self.node_id2bl_obj = self.compute_bls(source_node_objs=self.node_id2node_obj.values(),
+                                                   candidate_bles=set(self.g.nodes()))
+            record.count(nodes_with_bl=sum(1 for bl_obj in self.node_id2bl_obj.values()
+                                           if bl_obj is not None))
 
-        self.stats = self.get_stats()
+        with profiler.phase('remove_overlapping_bls') as record:
+            self.remove_overlapping_bls()
+            record.count(zeroed_nodes=len(self.zeroed_node2weight))
+
+        with profiler.phase('get_bl2bl_obj') as record:
+            self.bl2bl_obj = self.get_bl2bl_obj()
+            record.count(bls=len(self.bl2bl_obj))
 
-        self.write_to_file(output_folder, resource)
+        with profiler.phase('get_stats'):
+            self.stats = self.get_stats()
+
+        # the pickled report covers all phases except writing the pickle itself
+        self.phase_report = profiler.get_report()
+
+        with profiler.phase('write_to_file'):
+            self.write_to_file(output_folder, resource, result_store_path=result_store_path)
+
+        self.phase_report = profiler.finish()
 
     def __str__(self):
         info = ['\nSETTINGS:']
@@ -168,7 +233,185 @@ class BLCollection:
 
         return '\n'.join(info)
 
-    def write_to_file(self, output_folder, resource):
+    @property
+    def closure_index(self):
+        """
+        cached descendant closures of self.g (see graph_utils.ClosureIndex).
+        Only node attributes of self.g change after it has been created, hence the cache stays valid.
+        """
+        if getattr(self, '_closure_index', None) is None:
+            self._closure_index = graph_utils.ClosureIndex(self.g, maxsize=CLOSURE_CACHE_SIZE)
+        return self._closure_index
+
+    @property
+    def node_to_depth(self):
+        """
+        mapping from node -> number of nodes on the shortest path from self.root_node to the node
+        (one breadth-first search, the structure of self.g does not change)
+        """
+        if getattr(self, '_node_to_depth', None) is None:
+            self._node_to_depth = {node : distance + 1
+                                   for node, distance in nx.single_source_shortest_path_length(self.g,
+                                                                                               self.root_node).items()}
+        return self._node_to_depth
+
+    @property
+    def node_to_num_descendants(self):
+        """
+        mapping from node -> number of descendants (see graph_utils.get_node_to_num_descendants)
+        """
+        if getattr(self, '_node_to_num_descendants', None) is None:
+            self._node_to_num_descendants = graph_utils.get_node_to_num_descendants(self.g)
+        return self._node_to_num_descendants
+
+    def get_cumulative_weight(self, node):
+        """
+        the weight of the node plus the weights of its descendants.
+        The values are cached and kept up to date by set_weight.
+        """
+        if getattr(self, '_node_to_cumulative_weight', None) is None:
+            self._node_to_cumulative_weight = {}
+
+        if node not in self._node_to_cumulative_weight:
+            descendant_cumulative_weight = sum([self.g.nodes[descendant][self.weight_property]
+                                                for descendant in self.closure_index.descendants(node)])
+            self._node_to_cumulative_weight[node] = descendant_cumulative_weight + self.g.nodes[node][self.weight_property]
+
+        return self._node_to_cumulative_weight[node]
+
+    def set_weight(self, node, value):
+        """
+        set the weight property of a node in self.g.
+        The cached cumulative weights of the node and its ancestors are updated
+        and their cached BL objects are discarded.
+        """
+        old_value = self.g.nodes[node][self.weight_property]
+        self.g.nodes[node][self.weight_property] = value
+
+        if value == old_value:
+            return
+
+        affected = set(self.closure_index.ancestors(node))
+        affected.add(node)
+
+        node_to_cumulative_weight = getattr(self, '_node_to_cumulative_weight', None) or {}
+        bl2cached_bl_obj = getattr(self, '_bl2cached_bl_obj', None) or {}
+
+        for affected_node in affected:
+            if affected_node in node_to_cumulative_weight:
+                node_to_cumulative_weight[affected_node] += value - old_value
+            bl2cached_bl_obj.pop(affected_node, None)
+
+    @property
+    def zeroed_node2weight(self):
+        """
+        mapping from node -> weight before it was set to zero by remove_overlapping_bls
+        (empty for pickles written before this was recorded)
+        """
+        if getattr(self, '_zeroed_node2weight', None) is None:
+            self._zeroed_node2weight = {}
+        return self._zeroed_node2weight
+
+    def get_affected_leaf_nodes(self, nodes):
+        """
+        the leaf nodes of which the paths to the root node contain one of the nodes,
+        i.e., the leaf nodes of which the BL can change if the weight of one of the nodes changes
+
+        :param iterable nodes: nodes in self.g
+
+        :rtype: set
+        """
+        affected = set()
+        for node in nodes:
+            if node in self.leaf_nodes:
+                affected.add(node)
+            affected.update(self.closure_index.descendants(node) & self.leaf_nodes)
+        return affected
+
+    def update_weights(self, node2weight):
+        """
+        update the weights of nodes, e.g., after new incidents were added, and
+        recompute only the BLs of the affected leaf nodes (see get_affected_leaf_nodes).
+        The weights that were set to zero by remove_overlapping_bls are restored first, after which
+        the overlapping BLs are removed again, i.e., the result is the same as when the BLCollection is
+        created again with the new weights.
+
+        :param dict node2weight: mapping from node -> new value of self.weight_property
+
+        :rtype: dict
+        :return: mapping from leaf node -> (old BL id, new BL id) for the leaf nodes of which the BL changed
+        (None if the leaf node has no BL)
+        """
+        old_node_id2bl = {node_id : None if bl_obj is None else bl_obj.id_
+                          for node_id, bl_obj in self.node_id2bl_obj.items()}
+
+        node2base_weight = dict(self.zeroed_node2weight)
+        for node, weight in node2weight.items():
+            assert self.g.has_node(node), f'node {node} not found in directed graph'
+            if all([self.root_zero,
+                    node == self.root_node]):
+                weight = 0
+            node2base_weight[node] = weight
+        self.zeroed_node2weight.clear()
+
+        changed_nodes = set()
+        for node, weight in node2base_weight.items():
+            if self.g.nodes[node][self.weight_property] != weight:
+                self.set_weight(node, weight)
+                changed_nodes.add(node)
+
+            if node in self.node_id2node_obj and self.weight_property == 'occurrence_frequency':
+                self.node_id2node_obj[node].occurrence_frequency = weight
+
+        affected_leaf_nodes = self.get_affected_leaf_nodes(changed_nodes)
+        local_nodeid2bl_obj = self.compute_bls(source_node_objs=[self.node_id2node_obj[node_id]
+                                                                 for node_id in affected_leaf_nodes],
+                                               candidate_bles=set(self.g.nodes()))
+        self.node_id2bl_obj.update(local_nodeid2bl_obj)
+
+        # BLs of the other leaf nodes of which the cumulative weight changed
+        for node_id, bl_obj in self.node_id2bl_obj.items():
+            if bl_obj is not None:
+                self.node_id2bl_obj[node_id] = self.get_bl_obj(bl_obj.id_)
+
+        self.remove_overlapping_bls()
+
+        self.bl2bl_obj = self.get_bl2bl_obj()
+        self.stats = self.get_stats()
+
+        diff = {}
+        for node_id, bl_obj in self.node_id2bl_obj.items():
+            new_bl = None if bl_obj is None else bl_obj.id_
+            if new_bl != old_node_id2bl[node_id]:
+                diff[node_id] = (old_node_id2bl[node_id], new_bl)
+
+        if self.verbose:
+            print()
+            print(f'updated the weights of {len(changed_nodes)} node(s)')
+            print(f'recomputed the BLs of {len(affected_leaf_nodes)} of {len(self.leaf_nodes)} leaf node(s)')
+            print(f'the BL changed for {len(diff)} leaf node(s)')
+
+        return diff
+
+    def get_bl_obj(self, bl):
+        """
+        the BL object of a node (memoized per BL id)
+        """
+        if getattr(self, '_bl2cached_bl_obj', None) is None:
+            self._bl2cached_bl_obj = {}
+
+        if bl not in self._bl2cached_bl_obj:
+            bl_info = self.g.nodes[bl]
+            self._bl2cached_bl_obj[bl] = BL(id_=bl,
+                                            label=bl_info['label'],
+                                            node_depth=self.node_to_depth[bl],
+                                            weight_value=bl_info[self.weight_property],
+                                            descendants=self.closure_index.descendants(bl),
+                                            cumulative_weight=self.get_cumulative_weight(bl))
+
+        return self._bl2cached_bl_obj[bl]
+
+    def write_to_file(self, output_folder, resource, result_store_path=None):
 
         if not os.path.isdir(output_folder):
             os.mkdir(output_folder)
@@ -183,6 +426,32 @@ class BLCollection:
         if self.verbose:
             print(f'written output to: {path}')
 
+        # small summary next to the pickle, used by utils.get_overview_table
+        stats_path = utils.get_stats_path(path)
+        utils.write_stats(stats_path, self.get_summary(resource))
+
+        if self.verbose:
+            print(f'written stats to: {stats_path}')
+
+        if result_store_path is not None:
+            result_store = bl_store.BLResultStore(result_store_path, verbose=self.verbose)
+            result_store.add_run(self, resource=resource, pickle_path=path)
+            result_store.close()
+
+    def get_summary(self, resource):
+        """
+        :rtype: dict
+        :return: the settings and the stats (see get_stats) of this BLCollection
+        """
+        return {
+            'resource' : resource,
+            'root_node' : self.root_node,
+            'root_zero' : self.root_zero,
+            'weight_property' : self.weight_property,
+            'subsumer_threshold' : self.subsumer_threshold,
+            'stats' : self.get_stats()
+        }
+
 
 
 
@@ -218,6 +487,7 @@ class BLCollection:
                    min_cumulative_freq=0,
                    max_cumulative_freq=None,
                    verbose=0):
+        import pandas
 
         attrs = ['weight_value',
                  'node_depth',
@@ -390,9 +660,7 @@ class BLCollection:
             bl = None
 
             for local_maximum in node_obj.chosen_local_maxima:
-                the_descendants = nx.descendants(self.g, local_maximum)
-
-                if len(the_descendants) >= self.subsumer_threshold:
+                if self.node_to_num_descendants[local_maximum] >= self.subsumer_threshold:
                     bl = local_maximum
                     break
 
@@ -407,21 +675,7 @@ class BLCollection:
                 node_id2bl_obj[node_obj.id_] = None
             else:
                 # add ble for node that was not there before
-                bl_info = self.g.nodes[bl]
-                depth = len(nx.shortest_path(self.g, self.root_node, bl))
-
-                descendant_cumulative_weight = sum([self.g.nodes[descendant][self.weight_property]
-                                                    for descendant in the_descendants])
-                cumulative_weight = descendant_cumulative_weight + bl_info[self.weight_property]
-
-                bl_obj = BL(id_=bl,
-                            label=bl_info['label'],
-                            node_depth=depth,
-                            weight_value=bl_info[self.weight_property],
-                            descendants=the_descendants,
-                            cumulative_weight=cumulative_weight)
-
-                node_id2bl_obj[node_obj.id_] = bl_obj
+                node_id2bl_obj[node_obj.id_] = self.get_bl_obj(bl)
 
 
         return node_id2bl_obj
@@ -442,7 +696,7 @@ class BLCollection:
         the_bles = {bl_obj.id_
                     for bl_obj in self.node_id2bl_obj.values()
                     if bl_obj is not None}
-        parent2children = get_parents2children(the_bles, self.g)
+        parent2children = get_parents2children(the_bles, self.g, self.closure_index)
 
         if self.verbose >= 2:
             print()
@@ -458,16 +712,17 @@ class BLCollection:
             for parent_bl, children_bls in parent2children.items():
 
                 # set freq to zero
-                self.g.nodes[parent_bl][self.weight_property] = 0
+                self.zeroed_node2weight.setdefault(parent_bl, self.g.nodes[parent_bl][self.weight_property])
+                self.set_weight(parent_bl, 0)
                 if self.verbose >= 4:
                     print(f'set {parent_bl} to zero')
 
                 # recompute BLs
-                the_candidate_bles = nx.descendants(self.g, parent_bl)
+                the_candidate_bles = self.closure_index.descendants(parent_bl)
 
                 # determine nodes and candidate bles for which you want to recompute bls
                 node_objs = []
-                parent_descendants = nx.descendants(self.g, parent_bl)
+                parent_descendants = self.closure_index.descendants(parent_bl)
                 for node_id, bl_obj in self.node_id2bl_obj.items():
                     if node_id in parent_descendants:
                         node_objs.append(self.node_id2node_obj[node_id])
@@ -482,7 +737,7 @@ class BLCollection:
                         for bl_obj in self.node_id2bl_obj.values()
                         if bl_obj is not None}
 
-            parent2children = get_parents2children(the_bles, self.g)
+            parent2children = get_parents2children(the_bles, self.g, self.closure_index)
 
 
 
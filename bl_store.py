@@ -0,0 +1,261 @@
+"""
+SQLite store of the results of BLCollection runs
+
+Each run (one combination of resource, root node, root_zero, weight property, and subsumer threshold)
+is stored as:
+-runs: the run metadata and stats
+-bls: the attributes of each BL of the run
+-assignments: node -> BL (NULL if the node has no BL)
+
+Runs can be compared without loading any pickle or graph, e.g.,
+store = BLResultStore('output/bl_results.db')
+store.get_bl_of_node('Q40231') # BL of a node across all runs (thresholds)
+store.get_changed_nodes(run_id_one, run_id_two) # nodes for which the BL differs between two runs
+"""
+import os
+import json
+import pickle
+import sqlite3
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    resource TEXT,
+    root_node TEXT NOT NULL,
+    root_zero INTEGER NOT NULL,
+    weight_property TEXT NOT NULL,
+    subsumer_threshold INTEGER NOT NULL,
+    created TEXT NOT NULL,
+    pickle_path TEXT,
+    stats TEXT,
+    UNIQUE (resource, root_node, root_zero, weight_property, subsumer_threshold)
+);
+
+CREATE TABLE IF NOT EXISTS bls (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    bl_id TEXT NOT NULL,
+    label TEXT,
+    node_depth INTEGER,
+    weight_value REAL,
+    num_descendants INTEGER,
+    cumulative_weight REAL,
+    PRIMARY KEY (run_id, bl_id)
+);
+
+CREATE TABLE IF NOT EXISTS assignments (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    node_id TEXT NOT NULL,
+    bl_id TEXT,
+    PRIMARY KEY (run_id, node_id)
+);
+
+CREATE INDEX IF NOT EXISTS assignments_node_id ON assignments (node_id);
+"""
+
+RUN_COLUMNS = ['resource', 'root_node', 'root_zero', 'weight_property', 'subsumer_threshold']
+BL_ATTRIBUTES = ['label', 'node_depth', 'weight_value', 'num_descendants', 'cumulative_weight']
+
+
+class BLResultStore:
+    """
+    :param str db_path: path to the SQLite database (created if it does not exist)
+    """
+    def __init__(self, db_path, verbose=0):
+        self.db_path = db_path
+        self.verbose = verbose
+
+        folder = os.path.dirname(db_path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(SCHEMA)
+
+    def __str__(self):
+        num_runs = self.connection.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+        return f'BLResultStore at {self.db_path} with {num_runs} run(s)'
+
+    def close(self):
+        self.connection.close()
+
+    def add_run(self, bl_coll_obj, resource=None, pickle_path=None):
+        """
+        store the results of a BLCollection (an existing run with the same settings is replaced)
+
+        :param bl_classes.BLCollection bl_coll_obj: a BLCollection
+        :param str resource: the resource, e.g., Wikidata
+        :param str pickle_path: path to the pickled BLCollection (only stored as metadata)
+
+        :rtype: int
+        :return: the run id
+        """
+        run_values = [resource,
+                      str(bl_coll_obj.root_node),
+                      int(bl_coll_obj.root_zero),
+                      bl_coll_obj.weight_property,
+                      bl_coll_obj.subsumer_threshold]
+
+        bl_rows = []
+        for bl_id, bl_obj in bl_coll_obj.bl2bl_obj.items():
+            bl_rows.append([str(bl_id)] + [getattr(bl_obj, attr) for attr in BL_ATTRIBUTES])
+
+        assignment_rows = [(str(node_id), None if bl_obj is None else str(bl_obj.id_))
+                           for node_id, bl_obj in bl_coll_obj.node_id2bl_obj.items()]
+
+        with self.connection:
+            self.connection.execute('DELETE FROM runs WHERE resource IS ? AND root_node = ? AND root_zero = ? '
+                                    'AND weight_property = ? AND subsumer_threshold = ?',
+                                    run_values)
+            cursor = self.connection.execute('INSERT INTO runs (resource, root_node, root_zero, weight_property, '
+                                             'subsumer_threshold, created, pickle_path, stats) '
+                                             'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                             run_values + [datetime.now().isoformat(),
+                                                           pickle_path,
+                                                           json.dumps(bl_coll_obj.get_stats())])
+            run_id = cursor.lastrowid
+
+            self.connection.executemany(f'INSERT INTO bls (run_id, bl_id, {", ".join(BL_ATTRIBUTES)}) '
+                                        f'VALUES (?, ?, {", ".join("?" for _ in BL_ATTRIBUTES)})',
+                                        [[run_id] + bl_row for bl_row in bl_rows])
+            self.connection.executemany('INSERT INTO assignments (run_id, node_id, bl_id) VALUES (?, ?, ?)',
+                                        [(run_id, node_id, bl_id) for node_id, bl_id in assignment_rows])
+
+        if self.verbose:
+            print(f'stored run {run_id} ({len(bl_rows)} BLs, {len(assignment_rows)} nodes) in {self.db_path}')
+
+        return run_id
+
+    def add_pickle(self, bl_coll_path, resource=None):
+        """
+        store the results of a pickled BLCollection, e.g., written before the store existed
+
+        :rtype: int
+        :return: the run id
+        """
+        with open(bl_coll_path, 'rb') as infile:
+            bl_coll_obj = pickle.load(infile)
+
+        return self.add_run(bl_coll_obj, resource=resource, pickle_path=bl_coll_path)
+
+    def query(self, sql, parameters=()):
+        """
+        :rtype: pandas.DataFrame
+        """
+        import pandas
+
+        return pandas.read_sql_query(sql, self.connection, params=parameters)
+
+    def get_runs(self):
+        """
+        :rtype: pandas.DataFrame
+        :return: one row per run (without the stats)
+        """
+        return self.query(f'SELECT run_id, {", ".join(RUN_COLUMNS)}, created, pickle_path FROM runs '
+                          'ORDER BY resource, root_node, root_zero, weight_property, subsumer_threshold')
+
+    def get_run_id(self,
+                   subsumer_threshold,
+                   resource=None,
+                   root_node=None,
+                   root_zero=None,
+                   weight_property=None):
+        """
+        :rtype: int
+        :return: the run id of the only run with these settings (settings that are None are not used)
+        """
+        conditions, parameters = self._get_run_conditions(resource=resource,
+                                                          root_node=root_node,
+                                                          root_zero=root_zero,
+                                                          weight_property=weight_property,
+                                                          subsumer_threshold=subsumer_threshold)
+        rows = self.connection.execute(f'SELECT run_id FROM runs WHERE {conditions}', parameters).fetchall()
+        assert len(rows) == 1, f'expected one run, found {len(rows)}, please provide more settings'
+        return rows[0][0]
+
+    def get_stats(self, run_id):
+        """
+        :rtype: dict
+        :return: see bl_classes.BLCollection.get_stats
+        """
+        row = self.connection.execute('SELECT stats FROM runs WHERE run_id = ?', (run_id,)).fetchone()
+        assert row is not None, f'run {run_id} not found'
+        return json.loads(row[0])
+
+    def get_bls(self, run_id):
+        """
+        :rtype: pandas.DataFrame
+        :return: the BLs of a run and their attributes
+        """
+        return self.query(f'SELECT bl_id, {", ".join(BL_ATTRIBUTES)} FROM bls WHERE run_id = ? '
+                          'ORDER BY cumulative_weight DESC',
+                          (run_id,))
+
+    def get_assignments(self, run_id):
+        """
+        :rtype: dict
+        :return: mapping from node id -> BL id (None if the node has no BL)
+        """
+        rows = self.connection.execute('SELECT node_id, bl_id FROM assignments WHERE run_id = ?', (run_id,))
+        return dict(rows)
+
+    def get_bl_of_node(self,
+                       node_id,
+                       resource=None,
+                       root_node=None,
+                       root_zero=None,
+                       weight_property=None):
+        """
+        the BL of one node across runs, e.g., across all thresholds
+
+        :rtype: pandas.DataFrame
+        :return: one row per run in which the node occurs
+        """
+        conditions, parameters = self._get_run_conditions(resource=resource,
+                                                          root_node=root_node,
+                                                          root_zero=root_zero,
+                                                          weight_property=weight_property)
+        run_columns = ', '.join(f'runs.{column}' for column in RUN_COLUMNS)
+        bl_columns = ', '.join(f'bls.{attr}' for attr in BL_ATTRIBUTES)
+        return self.query(f'SELECT runs.run_id, {run_columns}, assignments.bl_id, {bl_columns} '
+                          'FROM assignments '
+                          'JOIN runs ON runs.run_id = assignments.run_id '
+                          'LEFT JOIN bls ON bls.run_id = assignments.run_id AND bls.bl_id = assignments.bl_id '
+                          f'WHERE assignments.node_id = ? AND {conditions} '
+                          'ORDER BY runs.subsumer_threshold',
+                          [str(node_id)] + parameters)
+
+    def get_changed_nodes(self, run_id_one, run_id_two):
+        """
+        the nodes for which the BL differs between two runs
+        (including nodes that only occur in one of the runs)
+
+        :rtype: pandas.DataFrame
+        :return: columns node_id, bl_id_one, bl_id_two
+        """
+        return self.query('SELECT one.node_id, one.bl_id AS bl_id_one, two.bl_id AS bl_id_two '
+                          'FROM assignments AS one '
+                          'LEFT JOIN assignments AS two ON two.run_id = ? AND two.node_id = one.node_id '
+                          'WHERE one.run_id = ? AND (two.node_id IS NULL OR one.bl_id IS NOT two.bl_id) '
+                          'UNION ALL '
+                          'SELECT two.node_id, NULL, two.bl_id '
+                          'FROM assignments AS two '
+                          'LEFT JOIN assignments AS one ON one.run_id = ? AND one.node_id = two.node_id '
+                          'WHERE two.run_id = ? AND one.node_id IS NULL '
+                          'ORDER BY 1',
+                          (run_id_two, run_id_one, run_id_one, run_id_two))
+
+    def _get_run_conditions(self, **settings):
+        conditions = ['1']
+        parameters = []
+        for column, value in settings.items():
+            if value is None:
+                continue
+            if column == 'root_node':
+                value = str(value)
+            elif column == 'root_zero':
+                value = int(value)
+            conditions.append(f'runs.{column} = ?')
+            parameters.append(value)
+        return ' AND '.join(conditions), parameters
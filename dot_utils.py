@@ -0,0 +1,121 @@
+"""
+Batched rendering of DOT sources using the graphviz dot binary
+
+Following the naming of graphviz.Source.render, the source with name NAME is written to
+OUTPUT_FOLDER/NAME and the image to OUTPUT_FOLDER/NAME.FORMAT
+"""
+import os
+import json
+import shutil
+import hashlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_BASENAME = '.render_manifest.json' # name -> hash of the rendered DOT source (None if rendering failed)
+
+
+def get_source_hash(dot_source, format):
+    return hashlib.sha256(f'{format}\n{dot_source}'.encode('utf-8')).hexdigest()
+
+
+def run_dot(dot_binary, source_path, image_path, format):
+    """
+    :rtype: str
+    :return: None if rendering succeeded, else the error message
+    """
+    try:
+        subprocess.run([dot_binary, f'-T{format}', source_path, '-o', image_path],
+                       check=True,
+                       stdout=subprocess.DEVNULL,
+                       stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError as e:
+        return e.stderr.decode('utf-8', errors='replace').strip()
+    except OSError as e:
+        return str(e)
+    return None
+
+
+def render_dot_sources(name_to_dot_source,
+                       output_folder,
+                       format='svg',
+                       num_workers=None,
+                       remove_stale=True,
+                       dot_binary='dot',
+                       verbose=0):
+    """
+    write all DOT sources to disk and render them with dot in a pool of workers.
+    Images for which the DOT source did not change since the previous call are not rendered again.
+
+    :param dict name_to_dot_source: mapping from name -> DOT source (str)
+    :param str output_folder: folder in which the sources and images are stored
+    :param str format: the output format, e.g., svg or png
+    :param int num_workers: number of dot processes that run concurrently, the number of CPUs if None
+    :param bool remove_stale: if True, sources and images rendered by a previous call that
+    are not part of name_to_dot_source are removed
+    :param str dot_binary: path to the dot binary
+
+    :rtype: dict
+    :return: summary {'rendered': [names], 'skipped': [names], 'failed': {name: error message}}
+    """
+    assert shutil.which(dot_binary) is not None, f'{dot_binary} not found, please install graphviz'
+
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    manifest_path = os.path.join(output_folder, MANIFEST_BASENAME)
+    previous_manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as infile:
+            previous_manifest = json.load(infile)
+
+    summary = {'rendered': [], 'skipped': [], 'failed': {}}
+    manifest = {}
+    to_render = []
+
+    for name, dot_source in name_to_dot_source.items():
+        source_hash = get_source_hash(dot_source, format)
+        source_path = os.path.join(output_folder, name)
+        image_path = f'{source_path}.{format}'
+
+        if all([previous_manifest.get(name) == source_hash,
+                os.path.exists(image_path)]):
+            summary['skipped'].append(name)
+            manifest[name] = source_hash
+            continue
+
+        with open(source_path, 'w') as outfile:
+            outfile.write(dot_source)
+        to_render.append((name, source_hash, source_path, image_path))
+
+    if remove_stale:
+        for name in set(previous_manifest) - set(name_to_dot_source):
+            source_path = os.path.join(output_folder, name)
+            for path in [source_path, f'{source_path}.{format}']:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    with ThreadPoolExecutor(max_workers=num_workers or os.cpu_count()) as executor:
+        errors = executor.map(lambda item: run_dot(dot_binary, item[2], item[3], format),
+                              to_render)
+
+        for (name, source_hash, source_path, image_path), error in zip(to_render, errors):
+            if error is None:
+                summary['rendered'].append(name)
+                manifest[name] = source_hash
+            else:
+                summary['failed'][name] = error
+                manifest[name] = None # rendered again by the next call
+
+    with open(manifest_path, 'w') as outfile:
+        json.dump(manifest, outfile)
+
+    if verbose >= 1:
+        print()
+        print(f'rendered {len(summary["rendered"])} DOT source(s) to {output_folder}')
+        print(f'skipped {len(summary["skipped"])} unchanged DOT source(s)')
+        print(f'{len(summary["failed"])} DOT source(s) failed to render')
+        if verbose >= 2:
+            for name, error in summary['failed'].items():
+                print(f'FAILED {name}: {error}')
+
+    return summary
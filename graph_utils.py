@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 import networkx as nx
 
 
@@ -16,6 +18,114 @@ def get_leaf_nodes(g,
     return leaf_nodes
 
 
+def get_node_to_num_descendants(g):
+    """
+    compute len(nx.descendants(g, node)) for all nodes with one pass in reverse topological order
+    over the strongly connected components of g (descendants are stored as bitsets, i.e., Python integers)
+
+    :param g: a networkx directed graph (cycles are allowed)
+
+    :rtype: dict
+    :return: mapping from node -> number of descendants
+    """
+    node_to_index = {node : index
+                     for index, node in enumerate(g.nodes())}
+
+    condensed_g = nx.condensation(g)
+    component_to_reachable = dict()
+    node_to_num_descendants = dict()
+
+    for component in reversed(list(nx.topological_sort(condensed_g))):
+        members = condensed_g.nodes[component]['members']
+
+        reachable = 0
+        for member in members:
+            reachable |= 1 << node_to_index[member]
+        for successor in condensed_g.successors(component):
+            reachable |= component_to_reachable[successor]
+        component_to_reachable[component] = reachable
+
+        num_descendants = bin(reachable).count('1') - 1 # nx.descendants does not include the node itself
+        for member in members:
+            node_to_num_descendants[member] = num_descendants
+
+    return node_to_num_descendants
+
+
+class ClosureIndex:
+    """
+    cached descendant and ancestor closures of the nodes of a directed graph,
+    together with zero-copy subgraph views (see networkx Graph.subgraph) based on them.
+    The least recently used entries are evicted when there are more than maxsize entries.
+
+    The structure of the graph is assumed not to change (node attributes may change).
+    Please call clear() if nodes or edges are added or removed.
+
+    :param g: a networkx directed graph
+    :param int maxsize: the maximum number of cached closures and views
+    """
+    def __init__(self, g, maxsize=128):
+        self.g = g
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def __str__(self):
+        return f'ClosureIndex with {len(self._cache)} cached items ({self.hits} hits, {self.misses} misses)'
+
+    def __getstate__(self):
+        # the cache is not pickled, it is cheap to rebuild
+        state = self.__dict__.copy()
+        state['_cache'] = OrderedDict()
+        return state
+
+    def clear(self):
+        self._cache.clear()
+
+    def get_or_compute(self, key, compute):
+        """
+        :param tuple key: hashable key of the cached item
+        :param compute: function without arguments that computes the item if it is not cached
+        """
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        self.misses += 1
+        value = compute()
+        self._cache[key] = value
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+        return value
+
+    def descendants(self, node):
+        """
+        :rtype: frozenset
+        :return: all nodes reachable from node (node itself excluded)
+        """
+        return self.get_or_compute(('descendants', node),
+                                   lambda: frozenset(nx.descendants(self.g, node)))
+
+    def ancestors(self, node):
+        """
+        :rtype: frozenset
+        :return: all nodes from which node is reachable (node itself excluded)
+        """
+        return self.get_or_compute(('ancestors', node),
+                                   lambda: frozenset(nx.ancestors(self.g, node)))
+
+    def subgraph(self, root):
+        """
+        :return: read-only view of the graph with root and its descendants
+        (use .copy() if you want to modify it)
+        """
+        return self.get_or_compute(('subgraph', root),
+                                   lambda: self.g.subgraph(self.descendants(root) | {root}))
+
+
 
 
 
@@ -36,3 +146,14 @@ if __name__ == '__main__':
 
     leaf_nodes = get_leaf_nodes(g, verbose=1)
     print(leaf_nodes)
+
+    closure_index = ClosureIndex(g, maxsize=2)
+    assert closure_index.descendants(3) == {0, 1, 2, 6, 7}
+    assert closure_index.ancestors(3) == {4, 5}
+    assert set(closure_index.subgraph(6).edges()) == {(6, 7)}
+    closure_index.descendants(3)
+    print(closure_index)
+
+    node_to_num_descendants = get_node_to_num_descendants(g)
+    assert node_to_num_descendants == {node : len(nx.descendants(g, node))
+                                       for node in g.nodes()}
@@ -0,0 +1,354 @@
+"""
+Central store of the multilingual labels of Incidents, EventTypes, and Properties
+
+Instead of one title_labels dict per object, the labels are stored in columnar form:
+one row per (entity, language) with the index of the entity, the language, and the label,
+each in a compact array. Labels are deduplicated, e.g., a name that is the same in English, Dutch,
+and Italian is stored once.
+
+The objects of wd_classes that are created with a label_store serve title_labels and label_to_show
+from the store. title_labels is then read-only (please assign a new dict to change the labels).
+The per-language statistics are computed with vectorized lookups (see get_language_counts).
+
+Example:
+    store = LabelStore()
+    store.set_labels('http://www.wikidata.org/entity/Q51336711', {'nl' : 'verkiezing', 'en' : 'election'})
+    store.get_label_to_show('http://www.wikidata.org/entity/Q51336711') # 'election'
+    store.get_language_counts() # {'nl' : 1, 'en' : 1}
+"""
+from array import array
+from types import MappingProxyType
+from collections import OrderedDict
+# numpy is imported by the methods using it, i.e., importing this module (and wd_classes) does not load it
+
+PREFERRED_LANGUAGE = 'en'
+INDEX_TYPECODE = 'i' # signed int, 4 bytes on all common platforms
+LABELS_CACHE_SIZE = 4096 # number of entities of which the labels are cached (see get_labels)
+
+
+class StoredLabels:
+    """
+    title_labels and label_to_show of the objects of wd_classes (Incident, EventType, Property),
+    served from self.label_store if the object has one, else from the object itself.
+    The classes set self.label_store and self.full_uri before self.title_labels and
+    implement set_label_to_show (the label to show for a title_labels dict).
+
+    With a store, title_labels is a read-only mapping, e.g., obj.title_labels['en'] = 'election' raises
+    a TypeError, please assign a new dict instead: obj.title_labels = {**obj.title_labels, 'en' : 'election'}
+    """
+    @property
+    def title_labels(self):
+        if getattr(self, 'label_store', None) is not None:
+            return self.label_store.get_labels(self.full_uri)
+        # objects without a LabelStore (including pickles from before the LabelStore)
+        return self.__dict__.get('_title_labels', self.__dict__.get('title_labels'))
+
+    @title_labels.setter
+    def title_labels(self, title_labels):
+        if getattr(self, 'label_store', None) is not None:
+            self.label_store.set_labels(self.full_uri, title_labels)
+        else:
+            self._title_labels = title_labels
+
+    @property
+    def label_to_show(self):
+        if getattr(self, 'label_store', None) is not None:
+            return self.label_store.get_label_to_show(self.full_uri)
+        return self.set_label_to_show()
+
+
+class LabelStore:
+    """
+    :param str preferred_language: the language of label_to_show (if the entity has a label in it)
+    """
+    def __init__(self, preferred_language=PREFERRED_LANGUAGE):
+        self.preferred_language = preferred_language
+
+        self.strings = []
+        self.string_to_index = {}
+        self.languages = []
+        self.language_to_index = {}
+        self.entities = []
+        self.entity_to_index = {}
+
+        # one row per (entity, language), the rows of one entity are contiguous
+        self.row_entities = array(INDEX_TYPECODE)
+        self.row_languages = array(INDEX_TYPECODE)
+        self.row_strings = array(INDEX_TYPECODE)
+
+        # the rows of entity i are entity_starts[i]:entity_ends[i]
+        self.entity_starts = array(INDEX_TYPECODE)
+        self.entity_ends = array(INDEX_TYPECODE)
+
+        # rows of replaced labels that no longer belong to an entity, see compact
+        self.num_orphan_rows = 0
+
+        self.version = 0 # is incremented by set_labels, invalidates the cached rank matrix
+        self._rank_matrix = None
+        self._rank_matrix_version = None
+        self._labels_cache = OrderedDict() # entity index -> read-only labels (least recently used are evicted)
+
+    def __getstate__(self):
+        # the caches are not pickled, they are cheap to rebuild (see get_language_rank_matrix and get_labels)
+        state = self.__dict__.copy()
+        state['_rank_matrix'] = None
+        state['_rank_matrix_version'] = None
+        state['_labels_cache'] = OrderedDict()
+        return state
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __contains__(self, entity_id):
+        return entity_id in self.entity_to_index
+
+    def __str__(self):
+        return (f'LabelStore with {len(self.entities)} entities, {len(self.languages)} languages, '
+                f'{self.num_labels} labels ({len(self.strings)} unique strings)')
+
+    @property
+    def num_labels(self):
+        return sum(end - start for start, end in zip(self.entity_starts, self.entity_ends))
+
+    def get_index(self, value, value_to_index, values):
+        index = value_to_index.get(value)
+        if index is None:
+            index = len(values)
+            value_to_index[value] = index
+            values.append(value)
+        return index
+
+    def set_labels(self, entity_id, lang_to_label):
+        """
+        set (or replace) the labels of an entity.
+        The rows of the previous labels are reused if the new labels fit in them,
+        else the new labels are appended and the previous rows become orphans,
+        which are removed by compact when they are more than half of the rows.
+
+        :param str entity_id: e.g., http://www.wikidata.org/entity/Q51336711
+        :param dict lang_to_label: language -> label, e.g., {'en' : '2014 Acre gubernatorial election'}
+        """
+        rows = [(self.get_index(lang, self.language_to_index, self.languages),
+                 self.get_index(label, self.string_to_index, self.strings))
+                for lang, label in (lang_to_label or {}).items()]
+
+        entity_index = self.entity_to_index.get(entity_id)
+        if entity_index is None:
+            entity_index = self.get_index(entity_id, self.entity_to_index, self.entities)
+            self.entity_starts.append(0)
+            self.entity_ends.append(0)
+            previous_start = previous_end = len(self.row_entities)
+        else:
+            previous_start = self.entity_starts[entity_index]
+            previous_end = self.entity_ends[entity_index]
+            self.labels_cache.pop(entity_index, None)
+
+        if len(rows) <= previous_end - previous_start:
+            start = previous_start
+            for row, (language_index, string_index) in enumerate(rows, start):
+                self.row_languages[row] = language_index
+                self.row_strings[row] = string_index
+            orphans = range(start + len(rows), previous_end)
+        else:
+            start = len(self.row_entities)
+            for language_index, string_index in rows:
+                self.row_entities.append(entity_index)
+                self.row_languages.append(language_index)
+                self.row_strings.append(string_index)
+            orphans = range(previous_start, previous_end)
+
+        for row in orphans:
+            self.row_entities[row] = -1
+        self.num_orphan_rows = getattr(self, 'num_orphan_rows', 0) + len(orphans)
+
+        self.entity_starts[entity_index] = start
+        self.entity_ends[entity_index] = start + len(rows)
+        self.version += 1
+
+        if self.num_orphan_rows * 2 > len(self.row_entities):
+            self.compact()
+
+    def compact(self):
+        """
+        remove the orphan rows (see set_labels), the rows of each entity stay contiguous and in the same order
+        """
+        row_entities = array(INDEX_TYPECODE)
+        row_languages = array(INDEX_TYPECODE)
+        row_strings = array(INDEX_TYPECODE)
+
+        for entity_index, (start, end) in enumerate(zip(self.entity_starts, self.entity_ends)):
+            self.entity_starts[entity_index] = len(row_entities)
+            row_entities.extend(self.row_entities[start:end])
+            row_languages.extend(self.row_languages[start:end])
+            row_strings.extend(self.row_strings[start:end])
+            self.entity_ends[entity_index] = len(row_entities)
+
+        self.row_entities = row_entities
+        self.row_languages = row_languages
+        self.row_strings = row_strings
+        self.num_orphan_rows = 0
+        self.version += 1
+
+    @property
+    def labels_cache(self):
+        if getattr(self, '_labels_cache', None) is None: # LabelStores pickled before the cache existed
+            self._labels_cache = OrderedDict()
+        return self._labels_cache
+
+    def get_labels(self, entity_id):
+        """
+        the labels of the LABELS_CACHE_SIZE most recently used entities are cached
+
+        :rtype: types.MappingProxyType
+        :return: language -> label (read-only, please use set_labels to change the labels)
+        """
+        entity_index = self.entity_to_index.get(entity_id)
+        if entity_index is None:
+            return MappingProxyType({})
+
+        cache = self.labels_cache
+        labels = cache.get(entity_index)
+        if labels is not None:
+            cache.move_to_end(entity_index)
+            return labels
+
+        labels = MappingProxyType({self.languages[self.row_languages[row]] : self.strings[self.row_strings[row]]
+                                   for row in range(self.entity_starts[entity_index],
+                                                    self.entity_ends[entity_index])})
+        cache[entity_index] = labels
+        if len(cache) > LABELS_CACHE_SIZE:
+            cache.popitem(last=False)
+        return labels
+
+    def get_label(self, entity_id, language):
+        """
+        :rtype: str
+        :return: the label of the entity in the language, None if there is none
+        """
+        entity_index = self.entity_to_index.get(entity_id)
+        language_index = self.language_to_index.get(language)
+        if entity_index is None or language_index is None:
+            return None
+
+        for row in range(self.entity_starts[entity_index], self.entity_ends[entity_index]):
+            if self.row_languages[row] == language_index:
+                return self.strings[self.row_strings[row]]
+        return None
+
+    def get_label_to_show(self, entity_id):
+        """
+        :rtype: str
+        :return: the label in the preferred language, else the first label of the entity
+        (None if the entity has no labels)
+        """
+        entity_index = self.entity_to_index.get(entity_id)
+        if entity_index is None:
+            return None
+
+        start = self.entity_starts[entity_index]
+        end = self.entity_ends[entity_index]
+        if start == end:
+            return None
+
+        preferred_index = self.language_to_index.get(self.preferred_language)
+        for row in range(start, end):
+            if self.row_languages[row] == preferred_index:
+                return self.strings[self.row_strings[row]]
+        return self.strings[self.row_strings[start]]
+
+    def get_entity_indices(self, entity_ids=None):
+        """
+        :rtype: numpy.ndarray
+        :return: the indices of the entities (all entities if entity_ids is None, -1 for unknown entities)
+        """
+        import numpy as np
+        if entity_ids is None:
+            return np.arange(len(self.entities))
+        return np.fromiter((self.entity_to_index.get(entity_id, -1) for entity_id in entity_ids),
+                           dtype=np.int64)
+
+    def get_arrays(self):
+        """
+        :rtype: tuple
+        :return: numpy views (no copies) of the row arrays (entities, languages, strings)
+        """
+        import numpy as np
+        return (np.frombuffer(self.row_entities, dtype=np.int32),
+                np.frombuffer(self.row_languages, dtype=np.int32),
+                np.frombuffer(self.row_strings, dtype=np.int32))
+
+    def get_labels_to_show(self, entity_ids=None):
+        """
+        vectorized version of get_label_to_show
+
+        :rtype: list
+        :return: the label to show of each entity (None for unknown entities and entities without labels)
+        """
+        import numpy as np
+
+        entity_indices = self.get_entity_indices(entity_ids)
+        row_entities, row_languages, row_strings = self.get_arrays()
+        starts = np.frombuffer(self.entity_starts, dtype=np.int32)
+        ends = np.frombuffer(self.entity_ends, dtype=np.int32)
+
+        # first row of each entity, replaced by its first row in the preferred language (if any)
+        entity_to_row = np.where(ends > starts, starts, -1).astype(np.int64)
+        preferred_index = self.language_to_index.get(self.preferred_language)
+        if preferred_index is not None:
+            preferred_rows = np.flatnonzero((row_languages == preferred_index) & (row_entities >= 0))
+            # assign in reverse so that the first preferred row of an entity is the one that remains
+            entity_to_row[row_entities[preferred_rows[::-1]]] = preferred_rows[::-1]
+
+        labels_to_show = []
+        for entity_index in entity_indices.tolist():
+            row = entity_to_row[entity_index] if entity_index >= 0 else -1
+            labels_to_show.append(self.strings[row_strings[row]] if row >= 0 else None)
+        return labels_to_show
+
+    def get_language_rank_matrix(self, entity_ids=None):
+        """
+        the rank matrix of all entities is computed once and cached until the labels change
+
+        :rtype: numpy.ndarray
+        :return: int matrix of shape (number of entities, number of languages (see self.languages)),
+        the position of the language in the labels of the entity (as in get_labels), -1 if the entity has no
+        label in the language
+        """
+        import numpy as np
+
+        if self._rank_matrix is None or self._rank_matrix_version != self.version:
+            row_entities, row_languages, _ = self.get_arrays()
+            starts = np.frombuffer(self.entity_starts, dtype=np.int32)
+
+            is_current = row_entities >= 0
+            rows = np.flatnonzero(is_current)
+            rank_matrix = np.full((len(self.entities), len(self.languages)), -1, dtype=np.int32)
+            rank_matrix[row_entities[rows], row_languages[rows]] = rows - starts[row_entities[rows]]
+
+            self._rank_matrix = rank_matrix
+            self._rank_matrix_version = self.version
+
+        entity_indices = self.get_entity_indices(entity_ids)
+        matrix = np.full((len(entity_indices), len(self.languages)), -1, dtype=np.int32)
+        is_known = entity_indices >= 0
+        matrix[is_known] = self._rank_matrix[entity_indices[is_known]]
+        return matrix
+
+    def get_language_matrix(self, entity_ids=None):
+        """
+        :rtype: numpy.ndarray
+        :return: boolean matrix of shape (number of entities, number of languages (see self.languages)),
+        True if the entity has a label in the language
+        """
+        return self.get_language_rank_matrix(entity_ids) >= 0
+
+    def get_language_counts(self, entity_ids=None):
+        """
+        :rtype: dict
+        :return: language -> number of entities with a label in the language
+        (languages in order of first occurrence in the store, languages without entities are omitted)
+        """
+        counts = self.get_language_matrix(entity_ids).sum(axis=0)
+        return {language : int(count)
+                for language, count in zip(self.languages, counts.tolist())
+                if count}
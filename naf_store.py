@@ -0,0 +1,465 @@
+"""
+Storage of and lookups into the NAF files of data releases
+
+Without a store, every data release has its own full copy of the NAF files:
+unstructured:
+    language1
+        title.naf
+    language2
+        title.naf
+
+With a store, each NAF file is stored once as a blob (hash -> blob) and
+each data release only keeps a title index (language -> title -> hash) in its
+unstructured folder (see NAF_INDEX_BASENAME).
+Releases share unchanged documents and staging only writes the files that changed.
+
+The usual layout can still be materialized using hard links to the blobs
+so that external tools, e.g., open-sesame, can read the folder as before.
+Blobs are read-only: never edit a materialized NAF file in place, stage the new version instead.
+
+All path lookups go through a NAFIndex, which is built once per unstructured folder
+using one os.scandir per language folder, i.e., checking whether a NAF file exists does not
+cost a stat syscall per document. The cached indices are rebuilt when the title index or one of the
+language folders changed on disk (see get_folder_signature), e.g., because another process wrote to them.
+
+resolve_naf_path is for reading: it can return the path to a shared blob.
+Writers use get_layout_naf_path and write_naf_file, which never write into a blob.
+"""
+import os
+import json
+import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+NAF_INDEX_BASENAME = 'naf_index.json'
+HASH_ALGORITHM = 'sha256'
+CHUNK_SIZE = 1024 * 1024 # number of bytes read at once when hashing a file
+
+# mapping from absolute unstructured folder -> (signature of the title index file, loaded release index)
+_release_indices = {}
+
+# mapping from absolute unstructured folder -> (signature of the folder, NAFIndex)
+_naf_indices = {}
+
+
+def hash_file(path):
+    """
+    compute the content hash of a file
+
+    :param str path: path to a file
+
+    :rtype: str
+    :return: hexdigest of the content of the file
+    """
+    the_hash = hashlib.new(HASH_ALGORITHM)
+    with open(path, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(CHUNK_SIZE), b''):
+            the_hash.update(chunk)
+    return the_hash.hexdigest()
+
+
+def get_index_path(unstructured_folder):
+    return os.path.join(unstructured_folder, NAF_INDEX_BASENAME)
+
+
+def get_file_signature(path):
+    """
+    :rtype: tuple
+    :return: (modification time in ns, size), None if the file does not exist
+    """
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+def get_folder_signature(unstructured_folder):
+    """
+    the signature changes when the title index is written or a NAF file is added to or removed from
+    a language folder (which updates the modification time of the language folder)
+
+    :rtype: tuple
+    :return: (signature of the title index, ((language, modification time in ns) for each language folder))
+    """
+    lang_signatures = []
+    if os.path.isdir(unstructured_folder):
+        with os.scandir(unstructured_folder) as lang_entries:
+            for lang_entry in lang_entries:
+                if lang_entry.is_dir():
+                    lang_signatures.append((lang_entry.name, lang_entry.stat().st_mtime_ns))
+
+    return get_file_signature(get_index_path(unstructured_folder)), tuple(sorted(lang_signatures))
+
+
+def load_release_index(unstructured_folder):
+    """
+    load the title index of a data release
+
+    :param str unstructured_folder: the unstructured folder of a data release
+
+    :rtype: dict
+    :return: None if the release does not use a NAF store, else
+    {
+    'store_folder' : path to the NAFStore,
+    'documents' : {language -> {title -> hash}}
+    }
+    """
+    key = os.path.abspath(unstructured_folder)
+    index_path = get_index_path(unstructured_folder)
+    signature = get_file_signature(index_path)
+
+    cached = _release_indices.get(key)
+    if cached is None or cached[0] != signature:
+        release_index = None
+        if signature is not None:
+            with open(index_path) as infile:
+                release_index = json.load(infile)
+        cached = (signature, release_index)
+        _release_indices[key] = cached
+
+    return cached[1]
+
+
+def write_release_index(unstructured_folder, release_index):
+    """
+    write the title index of a data release to disk (atomically)
+
+    :param str unstructured_folder: the unstructured folder of a data release
+    :param dict release_index: see load_release_index
+    """
+    if not os.path.exists(unstructured_folder):
+        os.makedirs(unstructured_folder)
+
+    index_path = get_index_path(unstructured_folder)
+    tmp_path = f'{index_path}.tmp'
+    with open(tmp_path, 'w') as outfile:
+        json.dump(release_index, outfile, sort_keys=True)
+    os.replace(tmp_path, index_path)
+
+    _release_indices[os.path.abspath(unstructured_folder)] = (get_file_signature(index_path), release_index)
+    invalidate_naf_index(unstructured_folder)
+
+
+def remove_release_index(unstructured_folder):
+    """
+    remove the title index of a data release, e.g., when the release is written without a NAF store.
+    Afterwards, resolve_naf_path only returns paths in the unstructured folder layout.
+
+    :rtype: bool
+    :return: True if there was a title index
+    """
+    index_path = get_index_path(unstructured_folder)
+    _release_indices.pop(os.path.abspath(unstructured_folder), None)
+    invalidate_naf_index(unstructured_folder)
+
+    if not os.path.exists(index_path):
+        return False
+    os.remove(index_path)
+    return True
+
+
+def scan_language_folder(language_and_folder):
+    """
+    :param tuple language_and_folder: (language, path to language folder)
+
+    :rtype: list
+    :return: [((language, title), naf_path)]
+    """
+    language, lang_folder = language_and_folder
+
+    title_id_and_paths = []
+    with os.scandir(lang_folder) as naf_entries:
+        for naf_entry in naf_entries:
+            if naf_entry.name.endswith('.naf'):
+                title_id = (language, naf_entry.name[:-len('.naf')])
+                title_id_and_paths.append((title_id, naf_entry.path))
+
+    return title_id_and_paths
+
+
+class NAFIndex:
+    """
+    release-level index of the NAF files in an unstructured folder:
+    (language, title) -> path
+
+    The index is built from the title index of a NAF store (if present)
+    and one os.scandir per language folder.
+    File sizes are obtained lazily (one stat per document, only when asked for).
+
+    :param str unstructured_folder: the unstructured folder of a data release
+    :param int num_workers: if higher than 1, the language folders are scanned concurrently,
+    which helps on network file systems
+    """
+    def __init__(self, unstructured_folder, num_workers=1, verbose=0):
+        self.unstructured_folder = unstructured_folder
+        self.num_workers = num_workers
+        self.verbose = verbose
+        self.title_id_to_path = {}
+        self.title_id_to_size = {}
+        self.scan()
+
+    def __len__(self):
+        return len(self.title_id_to_path)
+
+    def __str__(self):
+        return f'NAFIndex of {self.unstructured_folder} with {len(self)} NAF files'
+
+    def scan(self):
+        self.title_id_to_path = {}
+        self.title_id_to_size = {}
+
+        release_index = load_release_index(self.unstructured_folder)
+        if release_index is not None:
+            for language, title_to_digest in release_index['documents'].items():
+                for title, digest in title_to_digest.items():
+                    self.title_id_to_path[(language, title)] = get_blob_path(release_index['store_folder'], digest)
+
+        if os.path.isdir(self.unstructured_folder):
+            with os.scandir(self.unstructured_folder) as lang_entries:
+                lang_folders = [(lang_entry.name, lang_entry.path)
+                                for lang_entry in lang_entries
+                                if lang_entry.is_dir()]
+
+            if self.num_workers > 1:
+                with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+                    results = list(executor.map(scan_language_folder, lang_folders))
+            else:
+                results = [scan_language_folder(lang_folder)
+                           for lang_folder in lang_folders]
+
+            for title_id_and_paths in results:
+                for title_id, naf_path in title_id_and_paths:
+                    self.title_id_to_path.setdefault(title_id, naf_path)
+
+        if self.verbose >= 2:
+            print(self)
+
+    def get_path(self, language, title):
+        """
+        :rtype: str
+        :return: path to the NAF file, None if it does not exist
+        """
+        return self.title_id_to_path.get((language, title))
+
+    def exists(self, language, title):
+        return (language, title) in self.title_id_to_path
+
+    def get_size(self, language, title):
+        """
+        :rtype: int
+        :return: the file size in bytes, None if the NAF file does not exist
+        """
+        title_id = (language, title)
+        if title_id not in self.title_id_to_size:
+            naf_path = self.title_id_to_path.get(title_id)
+            if naf_path is None:
+                return None
+            self.title_id_to_size[title_id] = os.path.getsize(naf_path)
+        return self.title_id_to_size[title_id]
+
+
+def get_naf_index(unstructured_folder, num_workers=1):
+    """
+    obtain the (cached) NAFIndex of an unstructured folder.
+    The index is rebuilt if the folder changed on disk since it was built (see get_folder_signature).
+
+    :param str unstructured_folder: the unstructured folder of a data release
+    :param int num_workers: see NAFIndex (only used when the index is built)
+
+    :rtype: NAFIndex
+    """
+    key = os.path.abspath(unstructured_folder)
+    signature = get_folder_signature(unstructured_folder)
+
+    cached = _naf_indices.get(key)
+    if cached is None or cached[0] != signature:
+        cached = (signature, NAFIndex(unstructured_folder, num_workers=num_workers))
+        _naf_indices[key] = cached
+    return cached[1]
+
+
+def invalidate_naf_index(unstructured_folder):
+    """
+    discard the cached NAFIndex, e.g., after NAF files have been written to the folder
+    """
+    _naf_indices.pop(os.path.abspath(unstructured_folder), None)
+
+
+def resolve_naf_path(unstructured_folder, language, title):
+    """
+    obtain the path to read a NAF file from using the NAFIndex of the unstructured folder.
+    If the data release has a title index, the path to the blob in the NAFStore is returned,
+    else the path in the unstructured folder layout.
+    If the NAF file is not (yet) on disk, the path in the unstructured folder layout is returned.
+
+    Never write to the returned path: blobs are shared between data releases
+    (please use get_layout_naf_path and write_naf_file).
+
+    :param str unstructured_folder: the unstructured folder of a data release
+    :param str language: the language of the ReferenceText
+    :param str title: the title of the ReferenceText
+
+    :rtype: str
+    :return: path to the NAF file
+    """
+    naf_path = get_naf_index(unstructured_folder).get_path(language, title)
+
+    if naf_path is not None:
+        return naf_path
+
+    return get_layout_naf_path(unstructured_folder, language, title)
+
+
+def get_layout_naf_path(unstructured_folder, language, title):
+    """
+    obtain the path of a NAF file in the unstructured folder layout (never the path to a blob)
+
+    :rtype: str
+    :return: unstructured_folder/language/title.naf
+    """
+    return os.path.join(unstructured_folder,
+                        language,
+                        f'{title}.naf')
+
+
+def write_naf_file(src_path, naf_path):
+    """
+    copy a NAF file to a path in the unstructured folder layout (see get_layout_naf_path).
+    The file is copied to a temporary file that replaces naf_path, i.e., if naf_path is a hard link
+    to a blob (see NAFStore.materialize), the blob is not changed.
+    """
+    tmp_path = f'{naf_path}.{os.getpid()}.tmp'
+    shutil.copyfile(src_path, tmp_path)
+    os.replace(tmp_path, naf_path)
+
+
+def get_blob_path(store_folder, digest):
+    return os.path.join(store_folder,
+                        'blobs',
+                        digest[:2],
+                        f'{digest}.naf')
+
+
+class NAFStore:
+    """
+    content-addressed store of NAF files (hash -> blob)
+
+    :param str store_folder: the folder in which the blobs are stored, e.g., '../naf_store'.
+    The same store can be used by all data releases.
+    """
+    def __init__(self, store_folder, verbose=0):
+        self.store_folder = os.path.abspath(store_folder)
+        self.verbose = verbose
+
+        blobs_folder = os.path.join(self.store_folder, 'blobs')
+        if not os.path.exists(blobs_folder):
+            os.makedirs(blobs_folder)
+
+    def __str__(self):
+        return f'NAFStore at {self.store_folder}'
+
+    def add_file(self, path):
+        """
+        add a file to the store. Nothing is written if the content is already present.
+
+        :param str path: path to a NAF file
+
+        :rtype: tuple
+        :return: (hash, whether a new blob was written)
+        """
+        digest = hash_file(path)
+        blob_path = get_blob_path(self.store_folder, digest)
+
+        if os.path.exists(blob_path):
+            return digest, False
+
+        blob_folder = os.path.dirname(blob_path)
+        if not os.path.exists(blob_folder):
+            os.makedirs(blob_folder, exist_ok=True)
+
+        tmp_path = f'{blob_path}.{os.getpid()}.tmp'
+        shutil.copyfile(path, tmp_path)
+        os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, blob_path)
+
+        return digest, True
+
+    def get_release_index(self, unstructured_folder):
+        """
+        load the title index of a data release or create an empty one
+
+        :param str unstructured_folder: the unstructured folder of a data release
+
+        :rtype: dict
+        :return: see load_release_index
+        """
+        release_index = load_release_index(unstructured_folder)
+
+        if release_index is None:
+            release_index = {'store_folder': self.store_folder,
+                             'documents': {}}
+
+        assert release_index['store_folder'] == self.store_folder, \
+            f'{unstructured_folder} uses the store {release_index["store_folder"]}, not {self.store_folder}'
+
+        return release_index
+
+    def stage(self,
+              src_path,
+              release_index,
+              unstructured_folder,
+              language,
+              title,
+              materialize=True):
+        """
+        stage one NAF file into a data release
+
+        :param str src_path: the NAF file to stage
+        :param dict release_index: see get_release_index, updated in place
+        :param str unstructured_folder: the unstructured folder of the data release
+        :param str language: the language of the ReferenceText
+        :param str title: the title of the ReferenceText
+        :param bool materialize: if True, unstructured/language/title.naf is hard linked to the blob
+
+        :rtype: bool
+        :return: True if the document was new or changed for this data release
+        """
+        digest, _ = self.add_file(src_path)
+
+        lang_index = release_index['documents'].setdefault(language, {})
+        changed = lang_index.get(title) != digest
+        lang_index[title] = digest
+
+        if materialize:
+            naf_path = get_layout_naf_path(unstructured_folder, language, title)
+            if changed or not os.path.exists(naf_path):
+                self.materialize(digest, naf_path)
+
+        if self.verbose >= 3 and changed:
+            print(f'staged {src_path} as {language}/{title} ({digest})')
+
+        return changed
+
+    def materialize(self, digest, naf_path):
+        """
+        make the blob available at naf_path using a hard link
+        (a copy is made if the blob is on another file system)
+
+        :param str digest: the hash of the blob
+        :param str naf_path: the path in the unstructured folder layout
+        """
+        blob_path = get_blob_path(self.store_folder, digest)
+
+        lang_folder = os.path.dirname(naf_path)
+        if not os.path.exists(lang_folder):
+            os.makedirs(lang_folder, exist_ok=True)
+
+        # never write into an existing file: it might be a hard link to another blob
+        if os.path.lexists(naf_path):
+            os.remove(naf_path)
+
+        try:
+            os.link(blob_path, naf_path)
+        except OSError:
+            shutil.copyfile(blob_path, naf_path)
@@ -0,0 +1,470 @@
+"""
+Run open-sesame (or any other SRL command) on a folder of NAF files with several concurrent workers
+
+1. documents that already have an SRL layer from the same model version are skipped
+(see has_srl_layer, the version is stored in the nafHeader as linguisticProcessors layer="srl")
+2. the other documents are sharded into batches, each batch is a folder of hard links to the NAF files
+3. the batches are processed by a bounded number of workers (see get_num_workers), each worker runs
+the SRL command (see OpenSesameDriver) on one batch at a time
+4. the outputs are collected in one staging folder and moved back with move_back,
+which swaps the NAF folder using renames (the NAF files that were not processed are hard linked)
+5. callers write the summary of a successful run with write_summary, e.g., to check whether the run is done
+
+The command is a template, e.g.,
+'bash run_open_sesame.sh {input_folder} {tasks} {frame_to_info}' (the default, see DEFAULT_COMMAND_TEMPLATE)
+in which the placeholders are replaced by (quoted) paths. The command has to write one NAF file
+per input NAF file (with the same basename) to the output folder. If the template contains {output_folder},
+each batch gets its own output folder. If not, e.g., run_open_sesame.sh writes to the fixed folder output/NAF
+of its repository, the fixed folder has to be provided (naf_output_folder) and each worker runs the command
+in its own copy of the repository (see create_worker_folder): symbolic links to the files of the repository,
+except for its own (empty) naf_output_folder and private_folders. In both cases, batches run concurrently.
+For testing, a stub command can be used, e.g., benchmarks/stub_srl.py.
+
+Example:
+    driver = open_sesame_driver.OpenSesameDriver(command_template='python stub_srl.py {input_folder} {output_folder}',
+                                                 model_version='stub-1',
+                                                 batch_size=20)
+    title_to_output_path, summary = driver.run('data_releases/v1/unstructured/en')
+    open_sesame_driver.move_back('data_releases/v1/unstructured/en', title_to_output_path)
+"""
+import os
+import json
+import math
+import queue
+import shlex
+import shutil
+import tempfile
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from lxml import etree
+
+SRL_LAYER = 'srl'
+LP_NAME = 'open-sesame'
+DEFAULT_COMMAND_TEMPLATE = 'bash run_open_sesame.sh {input_folder} {tasks} {frame_to_info}'
+SUMMARY_BASENAME = 'open_sesame_summary.json'
+
+
+def get_available_memory_gb():
+    """
+    :rtype: float
+    :return: the available memory in GB (None if it can not be determined)
+    """
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / 1024 ** 3
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def get_num_workers(num_workers=None, memory_per_worker_gb=None):
+    """
+    bound the number of workers by the number of CPUs and the available memory
+
+    :param int num_workers: the requested number of workers (the number of CPUs if None)
+    :param float memory_per_worker_gb: the memory one worker needs (e.g., to load the open-sesame models)
+
+    :rtype: int
+    """
+    num_cpus = os.cpu_count() or 1
+    if num_workers is None:
+        num_workers = num_cpus
+    num_workers = min(num_workers, num_cpus)
+
+    if memory_per_worker_gb:
+        available_memory_gb = get_available_memory_gb()
+        if available_memory_gb is not None:
+            num_workers = min(num_workers, math.floor(available_memory_gb / memory_per_worker_gb))
+
+    return max(num_workers, 1)
+
+
+def has_srl_layer(naf_path, model_version, lp_name=LP_NAME):
+    """
+    check whether the nafHeader of a NAF file contains an SRL linguistic processor
+    with the provided name and version (only the header is parsed)
+
+    :rtype: bool
+    """
+    for _, header_el in etree.iterparse(naf_path, events=('end',), tag='nafHeader'):
+        for lp_el in header_el.xpath(f'linguisticProcessors[@layer="{SRL_LAYER}"]/lp'):
+            if lp_el.get('name') == lp_name and lp_el.get('version') == model_version:
+                return True
+        return False
+    return False
+
+
+def add_srl_linguistic_processor(naf_path, model_version, lp_name=LP_NAME):
+    """
+    record in the nafHeader that the SRL layer was produced by lp_name with model_version
+    (replaces a previous entry of lp_name)
+    """
+    doc = etree.parse(naf_path)
+    naf_el = doc.getroot()
+
+    header_el = naf_el.find('nafHeader')
+    if header_el is None:
+        header_el = etree.Element('nafHeader')
+        naf_el.insert(0, header_el)
+
+    lps_el = header_el.find(f'linguisticProcessors[@layer="{SRL_LAYER}"]')
+    if lps_el is None:
+        lps_el = etree.SubElement(header_el, 'linguisticProcessors', attrib={'layer' : SRL_LAYER})
+
+    for lp_el in lps_el.findall('lp'):
+        if lp_el.get('name') == lp_name:
+            lps_el.remove(lp_el)
+
+    etree.SubElement(lps_el, 'lp', attrib={'name' : lp_name,
+                                           'version' : model_version,
+                                           'timestamp' : datetime.now().isoformat()})
+
+    doc.write(naf_path, encoding='utf-8', xml_declaration=True, pretty_print=True)
+
+
+def write_summary(folder, summary, model_version):
+    """
+    write the summary of a run (see OpenSesameDriver.run) to folder/SUMMARY_BASENAME
+
+    :rtype: str
+    :return: the path to the summary
+    """
+    path = os.path.join(folder, SUMMARY_BASENAME)
+    content = {key : value
+               for key, value in summary.items()
+               if key != 'staging_folder'}
+    content['model_version'] = model_version
+    content['finished'] = datetime.now().isoformat()
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as outfile:
+        json.dump(content, outfile, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def create_worker_folder(src_folder, worker_folder, private_relpaths):
+    """
+    mirror src_folder in worker_folder using symbolic links, except for the folders of private_relpaths,
+    which are created empty, i.e., a command that runs in worker_folder reads the files of src_folder
+    but writes to its own private folders, e.g., output/NAF of a copy of the run_open-sesame repository
+
+    :param str src_folder: e.g., the path to the run_open-sesame repository
+    :param str worker_folder: the folder to create
+    :param list private_relpaths: paths relative to src_folder, e.g., ['output/NAF']
+    """
+    # nested dict of the path components of the private folders, {} for a private folder
+    private_tree = {}
+    for relpath in private_relpaths:
+        node = private_tree
+        for component in os.path.normpath(relpath).split(os.sep):
+            node = node.setdefault(component, {})
+
+    def mirror(src, dst, tree):
+        os.mkdir(dst)
+        if not tree: # private folder
+            return
+        if os.path.isdir(src):
+            with os.scandir(src) as entries:
+                for entry in entries:
+                    if entry.name not in tree:
+                        os.symlink(os.path.abspath(entry.path), os.path.join(dst, entry.name))
+        for name, subtree in tree.items():
+            mirror(os.path.join(src, name), os.path.join(dst, name), subtree)
+
+    mirror(src_folder, worker_folder, private_tree)
+
+
+def link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def move_back(naf_folder, title_to_output_path, verbose=0):
+    """
+    replace NAF files by their SRL output in one bulk operation:
+    a new version of naf_folder is built next to it (hard links for the unchanged files)
+    and swapped with naf_folder using two renames, i.e., readers never see a folder in which only some of
+    the NAF files are updated. Between the two renames naf_folder does not exist,
+    hence readers should not access naf_folder while move_back is running.
+
+    :param str naf_folder: e.g., data_releases/v1/unstructured/en
+    :param dict title_to_output_path: title -> path to the new NAF file
+    (the output files are moved, so they should be on the same file system)
+
+    :rtype: int
+    :return: the number of replaced NAF files
+    """
+    if not title_to_output_path:
+        return 0
+
+    naf_folder = naf_folder.rstrip(os.sep)
+    new_folder = f'{naf_folder}.srl_new'
+    old_folder = f'{naf_folder}.srl_old'
+    for folder in [new_folder, old_folder]:
+        if os.path.exists(folder):
+            shutil.rmtree(folder)
+    os.mkdir(new_folder)
+
+    with os.scandir(naf_folder) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            title = entry.name[:-len('.naf')] if entry.name.endswith('.naf') else None
+            if title not in title_to_output_path:
+                link_or_copy(entry.path, os.path.join(new_folder, entry.name))
+
+    for title, output_path in title_to_output_path.items():
+        shutil.move(output_path, os.path.join(new_folder, f'{title}.naf'))
+
+    os.rename(naf_folder, old_folder)
+    os.rename(new_folder, naf_folder)
+    shutil.rmtree(old_folder)
+
+    if verbose >= 1:
+        print(f'moved back {len(title_to_output_path)} NAF files to {naf_folder}')
+
+    return len(title_to_output_path)
+
+
+class OpenSesameDriver:
+    """
+    :param str command_template: the SRL command (see module docstring), placeholders:
+    {input_folder}, {output_folder} (optional), {tasks}, {frame_to_info}
+    :param str cwd: the folder in which the command is run, e.g., the path to the run_open-sesame repository
+    :param str naf_output_folder: the fixed folder to which the command writes its output,
+    required if command_template has no {output_folder} placeholder,
+    e.g., the open-sesame.naf_output_folder of the config file.
+    If it is inside cwd, each worker runs the command in its own copy of cwd (see create_worker_folder),
+    else the batches run one at a time.
+    :param list private_folders: other folders (relative to cwd) to which the command writes,
+    each worker gets its own (empty) version of them
+    :param str model_version: the version of the SRL models, stored in the nafHeader of each output
+    :param str tasks: e.g., target-frame
+    :param str frame_to_info: path to frame_to_info.json
+    :param int batch_size: number of NAF files per batch
+    :param int num_workers: maximum number of batches processed concurrently (bounded by get_num_workers)
+    :param float memory_per_worker_gb: memory one worker needs
+    :param str work_folder: folder for the batches and the staging folder
+    (a temporary folder next to the NAF folder if None, i.e., on the same file system)
+    """
+    def __init__(self,
+                 command_template=DEFAULT_COMMAND_TEMPLATE,
+                 cwd=None,
+                 naf_output_folder=None,
+                 private_folders=(),
+                 model_version='unknown',
+                 tasks='target-frame',
+                 frame_to_info='',
+                 batch_size=50,
+                 num_workers=None,
+                 memory_per_worker_gb=None,
+                 work_folder=None,
+                 verbose=0):
+        self.command_template = command_template
+        self.cwd = cwd
+        if naf_output_folder is not None and cwd is not None:
+            naf_output_folder = os.path.join(cwd, naf_output_folder) # relative to the folder of the command
+        self.naf_output_folder = naf_output_folder
+        self.model_version = model_version
+        self.tasks = tasks
+        self.frame_to_info = frame_to_info
+        self.batch_size = batch_size
+        self.num_workers = get_num_workers(num_workers, memory_per_worker_gb)
+        self.work_folder = work_folder
+        self.verbose = verbose
+
+        # paths relative to cwd of which each worker gets its own version (None: one shared cwd)
+        self.private_relpaths = None
+        if '{output_folder}' not in command_template:
+            assert naf_output_folder is not None, ('please provide naf_output_folder: the command template '
+                                                   'has no {output_folder} placeholder')
+            command_folder = cwd if cwd is not None else os.getcwd()
+            output_relpath = os.path.relpath(naf_output_folder, command_folder)
+            if output_relpath == os.curdir or output_relpath.startswith(os.pardir):
+                # concurrent workers would write to the same folder
+                if self.num_workers > 1:
+                    print(f'WARNING: the batches run one at a time, since naf_output_folder {naf_output_folder} '
+                          f'is not inside the folder of the command {command_folder}')
+                self.num_workers = 1
+            else:
+                self.private_relpaths = [output_relpath] + list(private_folders)
+
+    def __str__(self):
+        return (f'OpenSesameDriver (model version {self.model_version}): '
+                f'batches of {self.batch_size} NAF files, {self.num_workers} worker(s)')
+
+    def get_documents_to_process(self, naf_folder):
+        """
+        :rtype: tuple
+        :return: (list of NAF paths that have to be processed,
+        list of NAF paths that already have an SRL layer from self.model_version)
+        """
+        to_process = []
+        skipped = []
+        with os.scandir(naf_folder) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if not entry.is_file() or not entry.name.endswith('.naf'):
+                    continue
+                if has_srl_layer(entry.path, self.model_version):
+                    skipped.append(entry.path)
+                else:
+                    to_process.append(entry.path)
+        return to_process, skipped
+
+    def get_command(self, input_folder, output_folder):
+        return self.command_template.format(input_folder=shlex.quote(input_folder),
+                                            output_folder=shlex.quote(output_folder),
+                                            tasks=shlex.quote(self.tasks),
+                                            frame_to_info=shlex.quote(self.frame_to_info))
+
+    def run_batch(self, batch_folder, naf_paths, staging_folder, worker_folders=None):
+        """
+        run the SRL command on one batch and move its outputs to the staging folder
+
+        :param queue.Queue worker_folders: the worker folders (see create_worker_folder) that are not in use,
+        the command runs in one of them (in self.cwd if None)
+
+        :rtype: tuple
+        :return: (title -> path in the staging folder, list of titles without output)
+        """
+        if worker_folders is None:
+            return self.run_batch_in_folder(batch_folder, naf_paths, staging_folder, self.cwd)
+
+        worker_folder = worker_folders.get()
+        try:
+            return self.run_batch_in_folder(batch_folder, naf_paths, staging_folder, worker_folder)
+        finally:
+            worker_folders.put(worker_folder)
+
+    def run_batch_in_folder(self, batch_folder, naf_paths, staging_folder, command_folder):
+        input_folder = os.path.join(batch_folder, 'input')
+        os.makedirs(input_folder)
+        if '{output_folder}' in self.command_template:
+            output_folder = os.path.join(batch_folder, 'output')
+            os.makedirs(output_folder)
+        elif command_folder != self.cwd:
+            output_folder = os.path.join(command_folder, self.private_relpaths[0])
+        else:
+            output_folder = self.naf_output_folder
+            os.makedirs(output_folder, exist_ok=True)
+
+        for naf_path in naf_paths:
+            basename = os.path.basename(naf_path)
+            link_or_copy(naf_path, os.path.join(input_folder, basename))
+            # outputs of a previous run in a fixed output folder should not count as output of this run
+            previous_output_path = os.path.join(output_folder, basename)
+            if os.path.exists(previous_output_path):
+                os.remove(previous_output_path)
+
+        command = self.get_command(input_folder, output_folder)
+        if self.verbose >= 2:
+            print(command)
+
+        with open(os.path.join(batch_folder, 'log.txt'), 'w') as log_file:
+            subprocess.run(command,
+                           shell=True,
+                           cwd=command_folder,
+                           stdout=log_file,
+                           stderr=subprocess.STDOUT,
+                           check=True)
+
+        title_to_output_path = {}
+        missing = []
+        for naf_path in naf_paths:
+            basename = os.path.basename(naf_path)
+            title = basename[:-len('.naf')]
+            output_path = os.path.join(output_folder, basename)
+            if not os.path.exists(output_path):
+                missing.append(title)
+                continue
+
+            add_srl_linguistic_processor(output_path, self.model_version)
+            staged_path = os.path.join(staging_folder, basename)
+            shutil.move(output_path, staged_path) # the fixed output folder can be on another file system
+            title_to_output_path[title] = staged_path
+
+        shutil.rmtree(batch_folder)
+
+        return title_to_output_path, missing
+
+    def run(self, naf_folder):
+        """
+        process the NAF files of naf_folder that do not have an SRL layer from self.model_version
+
+        :param str naf_folder: e.g., data_releases/v1/unstructured/en
+
+        :rtype: tuple
+        :return: (title -> path to the output in the staging folder (see move_back),
+        summary {'processed', 'skipped', 'missing', 'failed_batches', 'staging_folder'}).
+        'missing' are the titles for which the command wrote no output, which callers should treat as an error
+        """
+        to_process, skipped = self.get_documents_to_process(naf_folder)
+
+        work_folder = self.work_folder
+        if work_folder is None:
+            work_folder = os.path.dirname(os.path.abspath(naf_folder))
+        os.makedirs(work_folder, exist_ok=True)
+        run_folder = tempfile.mkdtemp(prefix='.open_sesame_', dir=work_folder)
+        staging_folder = os.path.join(run_folder, 'staging')
+        os.mkdir(staging_folder)
+
+        batches = [to_process[index:index + self.batch_size]
+                   for index in range(0, len(to_process), self.batch_size)]
+
+        if self.verbose >= 1:
+            print(self)
+            print(f'{len(skipped)} NAF files already have an SRL layer from model version {self.model_version}')
+            print(f'{len(to_process)} NAF files to process in {len(batches)} batches')
+
+        # each worker runs the command with a fixed output folder in its own copy of self.cwd
+        worker_folders = None
+        if self.private_relpaths is not None and min(self.num_workers, len(batches)) > 1:
+            worker_folders = queue.Queue()
+            for worker_index in range(min(self.num_workers, len(batches))):
+                worker_folder = os.path.join(run_folder, f'worker_{worker_index}')
+                create_worker_folder(self.cwd or os.getcwd(), worker_folder, self.private_relpaths)
+                worker_folders.put(worker_folder)
+
+        title_to_output_path = {}
+        missing = []
+        failed_batches = {}
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            future_to_batch_index = {executor.submit(self.run_batch,
+                                                     os.path.join(run_folder, f'batch_{batch_index}'),
+                                                     batch,
+                                                     staging_folder,
+                                                     worker_folders) : batch_index
+                                     for batch_index, batch in enumerate(batches)}
+            for future, batch_index in future_to_batch_index.items():
+                try:
+                    batch_title_to_output_path, batch_missing = future.result()
+                except subprocess.CalledProcessError as error:
+                    failed_batches[batch_index] = str(error)
+                    if self.verbose >= 1:
+                        print(f'batch {batch_index} failed: {error} (see {run_folder}/batch_{batch_index}/log.txt)')
+                    continue
+                title_to_output_path.update(batch_title_to_output_path)
+                missing.extend(batch_missing)
+
+        summary = {'processed' : len(title_to_output_path),
+                   'skipped' : len(skipped),
+                   'missing' : missing,
+                   'failed_batches' : failed_batches,
+                   'staging_folder' : staging_folder}
+
+        if self.verbose >= 1:
+            print(f'processed {len(title_to_output_path)} NAF files, {len(missing)} without output, '
+                  f'{len(failed_batches)} failed batch(es)')
+
+        return title_to_output_path, summary
+
+    def cleanup(self, summary):
+        """
+        remove the temporary folder of a run (after the outputs were moved back or staged)
+        """
+        run_folder = os.path.dirname(summary['staging_folder'])
+        if os.path.exists(run_folder):
+            shutil.rmtree(run_folder)
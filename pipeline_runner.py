@@ -0,0 +1,330 @@
+"""
+Runner of pipelines that are modeled as a dependency graph of steps, e.g., the steps of a data release
+(see scripts/run_pipeline.py)
+
+Each step has a fingerprint based on:
+-its settings (e.g., the relevant part of the config file)
+-the size and modification time of its input paths (all files are visited for folders)
+-the runs of the steps it depends on
+
+A step is up to date (and skipped) if its fingerprint is the same as in the previous run and its outputs exist.
+If a step runs again, the steps that depend on it run again too.
+Steps of which all dependencies are done run concurrently in a pool of threads.
+All steps share one PipelineContext, e.g., to load a pickled EventTypeCollection only once
+(the steps that use it run one at a time, see PipelineContext.use_ev_coll_obj).
+"""
+import os
+import json
+import time
+import pickle
+import hashlib
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import networkx as nx
+
+
+def get_path_fingerprint(path):
+    """
+    :param str path: path to a file or folder
+
+    :rtype: list
+    :return: [relative path, size, modification time in ns] for the file or all files in the folder,
+    ['missing'] if the path does not exist
+    """
+    if not os.path.exists(path):
+        return ['missing']
+
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return [['', stat.st_size, stat.st_mtime_ns]]
+
+    entries = []
+    for folder, _, basenames in os.walk(path):
+        for basename in basenames:
+            file_path = os.path.join(folder, basename)
+            stat = os.stat(file_path)
+            entries.append([os.path.relpath(file_path, path), stat.st_size, stat.st_mtime_ns])
+    return sorted(entries)
+
+
+class Step:
+    """
+    one step of a pipeline
+
+    :param str name: unique name of the step
+    :param function: function that is called with the PipelineContext as argument
+    :param list dependencies: names of the steps that have to be done before this step
+    :param list input_paths: files and folders read by the step that are not produced by its dependencies
+    :param settings: JSON serializable settings that determine the output of the step
+    :param list output_paths: files and folders written by the step
+    :param int version: increase when the function changes in a way that invalidates earlier outputs
+    """
+    def __init__(self,
+                 name,
+                 function,
+                 dependencies=(),
+                 input_paths=(),
+                 settings=None,
+                 output_paths=(),
+                 version=1):
+        self.name = name
+        self.function = function
+        self.dependencies = list(dependencies)
+        self.input_paths = list(input_paths)
+        self.settings = settings
+        self.output_paths = list(output_paths)
+        self.version = version
+
+    def __str__(self):
+        return f'Step {self.name} (depends on {self.dependencies})'
+
+    def get_fingerprint(self, dependency_runs):
+        """
+        :param dict dependency_runs: dependency name -> its run (see PipelineRunner.state)
+
+        :rtype: str
+        """
+        content = {
+            'name' : self.name,
+            'version' : self.version,
+            'settings' : self.settings,
+            'inputs' : {path : get_path_fingerprint(path)
+                        for path in self.input_paths},
+            'dependencies' : dependency_runs,
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def outputs_exist(self):
+        return all(os.path.exists(path) for path in self.output_paths)
+
+
+class PipelineContext:
+    """
+    state shared by the steps of one run, e.g., the loaded EventTypeCollection
+
+    :param dict settings: the loaded config file
+    :param str ev_coll_path: path to the pickled EventTypeCollection
+    """
+    def __init__(self, settings, ev_coll_path=None, verbose=0):
+        self.settings = settings
+        self.ev_coll_path = ev_coll_path
+        self.verbose = verbose
+        self._ev_coll_obj = None
+        self._lock = threading.Lock()
+        self._ev_coll_lock = threading.Lock()
+
+    def get_ev_coll_obj(self):
+        """
+        load the pickled EventTypeCollection once per run.
+        The object is shared by the steps and not thread-safe (e.g., its caches are updated while reading),
+        hence steps should use it via use_ev_coll_obj.
+        """
+        with self._lock:
+            if self._ev_coll_obj is None:
+                with open(self.ev_coll_path, 'rb') as infile:
+                    self._ev_coll_obj = pickle.load(infile)
+                if self.verbose >= 1:
+                    print(f'loaded EventTypeCollection from {self.ev_coll_path}')
+            return self._ev_coll_obj
+
+    @contextmanager
+    def use_ev_coll_obj(self):
+        """
+        the shared EventTypeCollection for the duration of a step, e.g.,
+        with context.use_ev_coll_obj() as ev_coll_obj:
+            convert_to_sem.convert_to_sem(ev_coll_obj, context.settings)
+
+        Only one step at a time uses the object, the other steps (e.g., subprocesses) still run concurrently.
+        """
+        with self._ev_coll_lock:
+            yield self.get_ev_coll_obj()
+
+    def invalidate_ev_coll_obj(self):
+        """
+        call after a step wrote a new version of the pickled EventTypeCollection
+        """
+        with self._lock:
+            self._ev_coll_obj = None
+
+
+class PipelineRunner:
+    """
+    :param list steps: instances of Step
+    :param str state_path: JSON file in which the fingerprint of each step is stored
+    :param PipelineContext context: passed to each step
+    :param int num_workers: maximum number of steps that run concurrently
+    """
+    def __init__(self,
+                 steps,
+                 state_path,
+                 context,
+                 num_workers=4,
+                 verbose=0):
+        self.name_to_step = {step.name : step for step in steps}
+        assert len(self.name_to_step) == len(steps), 'step names should be unique'
+
+        self.g = nx.DiGraph()
+        for step in steps:
+            self.g.add_node(step.name)
+            for dependency in step.dependencies:
+                assert dependency in self.name_to_step, f'{step.name} depends on unknown step {dependency}'
+                self.g.add_edge(dependency, step.name)
+        assert nx.is_directed_acyclic_graph(self.g), 'the dependencies of the steps contain a cycle'
+
+        self.state_path = state_path
+        self.context = context
+        self.num_workers = num_workers
+        self.verbose = verbose
+        self.state = self.load_state()
+        self._lock = threading.Lock()
+
+    def load_state(self):
+        """
+        :rtype: dict
+        :return: step name -> {'fingerprint', 'finished', 'seconds'} of its last successful run
+        """
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as infile:
+                return json.load(infile)
+        return {}
+
+    def write_state(self):
+        folder = os.path.dirname(self.state_path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        tmp_path = f'{self.state_path}.tmp'
+        with open(tmp_path, 'w') as outfile:
+            json.dump(self.state, outfile, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def get_steps_to_consider(self, targets=None, with_dependencies=True):
+        """
+        :param list targets: names of steps, all steps if None
+        :param bool with_dependencies: if True, the (indirect) dependencies of the targets are included
+
+        :rtype: list
+        :return: step names in topological order
+        """
+        if targets is None:
+            names = set(self.g)
+        else:
+            names = set()
+            for target in targets:
+                assert target in self.name_to_step, f'unknown step {target}, choose from {sorted(self.name_to_step)}'
+                names.add(target)
+                if with_dependencies:
+                    names.update(nx.ancestors(self.g, target))
+
+        return [name for name in nx.topological_sort(self.g) if name in names]
+
+    def get_dependency_runs(self, step):
+        return {dependency : self.state.get(dependency)
+                for dependency in step.dependencies}
+
+    def is_up_to_date(self, step):
+        """
+        :rtype: tuple
+        :return: (whether the step can be skipped, its current fingerprint)
+        """
+        fingerprint = step.get_fingerprint(self.get_dependency_runs(step))
+        previous_run = self.state.get(step.name)
+        up_to_date = all([previous_run is not None and previous_run['fingerprint'] == fingerprint,
+                          step.outputs_exist()])
+        return up_to_date, fingerprint
+
+    def run_step(self, step, fingerprint):
+        if self.verbose >= 1:
+            print(f'running step {step.name} ({datetime.now()})')
+
+        start = time.perf_counter()
+        step.function(self.context)
+        seconds = round(time.perf_counter() - start, 2)
+
+        with self._lock:
+            self.state[step.name] = {'fingerprint' : fingerprint,
+                                     'finished' : datetime.now().isoformat(),
+                                     'seconds' : seconds}
+            self.write_state()
+
+        if self.verbose >= 1:
+            print(f'finished step {step.name} in {seconds} seconds')
+
+    def run(self, targets=None, with_dependencies=True, force=False, dry_run=False):
+        """
+        run the steps that are not up to date
+
+        :param list targets: names of steps to run, all steps if None
+        :param bool with_dependencies: if False, only the targets are considered
+        (their dependencies are assumed to be done)
+        :param bool force: if True, all considered steps are run
+        :param bool dry_run: if True, nothing is run, the summary shows which steps would run,
+        i.e., the steps that are not up to date and the steps that depend on them
+
+        :rtype: dict
+        :return: {'ran': [names], 'skipped': [names], 'failed': {name: error}, 'not_run': [names]}
+        """
+        to_consider = self.get_steps_to_consider(targets, with_dependencies=with_dependencies)
+        summary = {'ran' : [], 'skipped' : [], 'failed' : {}, 'not_run' : []}
+
+        pending = list(to_consider)
+        done = set(self.g) - set(to_consider) # steps outside of the selection are treated as done
+        running = {}
+        would_run = set() # steps that would run in a dry run
+
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            while pending or running:
+                for name in list(pending):
+                    step = self.name_to_step[name]
+                    if any(dependency in summary['failed'] or dependency in summary['not_run']
+                           for dependency in step.dependencies):
+                        pending.remove(name)
+                        summary['not_run'].append(name)
+                        continue
+
+                    if not all(dependency in done for dependency in step.dependencies):
+                        continue
+
+                    pending.remove(name)
+                    up_to_date, fingerprint = self.is_up_to_date(step)
+                    if dry_run and any(dependency in would_run for dependency in step.dependencies):
+                        up_to_date = False # the run of the dependency would change the fingerprint
+
+                    if up_to_date and not force:
+                        summary['skipped'].append(name)
+                        done.add(name)
+                        if self.verbose >= 1:
+                            print(f'skipped step {name}: up to date')
+                    elif dry_run:
+                        summary['ran'].append(name)
+                        done.add(name)
+                        would_run.add(name)
+                        if self.verbose >= 1:
+                            print(f'would run step {name}')
+                    else:
+                        running[executor.submit(self.run_step, step, fingerprint)] = name
+
+                if not running: # the steps are visited in topological order, hence nothing is pending anymore
+                    continue
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        summary['ran'].append(name)
+                        done.add(name)
+                    else:
+                        summary['failed'][name] = repr(error)
+                        if self.verbose >= 1:
+                            print(f'FAILED step {name}: {error!r}')
+
+        if self.verbose >= 1:
+            print()
+            print(f'ran {len(summary["ran"])} step(s), skipped {len(summary["skipped"])} up-to-date step(s)')
+            print(f'{len(summary["failed"])} step(s) failed, {len(summary["not_run"])} step(s) not run')
+
+        return summary
@@ -0,0 +1,262 @@
+"""
+Phase-level instrumentation of long running constructors, e.g.,
+wd_classes.EventTypeCollection and bl_classes.BLCollection
+
+For each phase, the wall time, the item counts, and (optionally) the peak memory usage are recorded
+in a report (a dict), which is attached to the object as phase_report and can be written to disk as JSON.
+Selected phases can be profiled with cProfile or with the sampling profiler pyinstrument (if installed).
+
+Example:
+    profiler = profiling.PhaseProfiler(measure_memory=True,
+                                       profile_phases={'compute_bls'},
+                                       profile_folder='output/profiles',
+                                       report_path='output/phase_report.json')
+    bl_coll_obj = bl_classes.BLCollection(..., profiler=profiler)
+    bl_coll_obj.phase_report['phases']
+"""
+import os
+import json
+import time
+import cProfile
+import tracemalloc
+from datetime import datetime
+from contextlib import contextmanager, ExitStack
+
+PROFILER_TYPES = {'cprofile', 'pyinstrument'}
+
+
+class PhaseRecord:
+    """
+    the measurements of one phase, see PhaseProfiler.phase
+    """
+    def __init__(self, name):
+        self.name = name
+        self.seconds = None
+        self.peak_memory_mb = None
+        self.counts = {}
+        self.profile_path = None
+
+    def count(self, **counts):
+        """
+        record item counts of the phase, e.g., record.count(incidents=len(inc_id_to_inc_obj))
+        """
+        self.counts.update(counts)
+
+    def to_dict(self):
+        info = {'phase' : self.name,
+                'seconds' : self.seconds}
+        if self.peak_memory_mb is not None:
+            info['peak_memory_mb'] = self.peak_memory_mb
+        if self.counts:
+            info['counts'] = self.counts
+        if self.profile_path is not None:
+            info['profile_path'] = self.profile_path
+        return info
+
+
+class PhaseProfiler:
+    """
+    records the phases of one run, e.g., of one constructor call
+
+    :param str name: the name of the run, e.g., 'BLCollection' (set by start if None)
+    :param bool measure_memory: if True, the peak memory usage of each phase is measured using tracemalloc
+    (which slows down the phases). Nested phases are supported, on Python < 3.9 (no tracemalloc.reset_peak)
+    the peak of a nested phase is an upper bound
+    :param profile_phases: the phases that are profiled (set of phase names), True for all phases
+    :param str profiler_type: 'cprofile' (pstats file NAME.PHASE.prof) | 'pyinstrument' (NAME.PHASE.html)
+    :param str profile_folder: folder in which the profiles are written
+    :param str report_path: if provided, the report is written to this path as JSON (see write_report)
+    """
+    def __init__(self,
+                 name=None,
+                 measure_memory=False,
+                 profile_phases=(),
+                 profiler_type='cprofile',
+                 profile_folder=None,
+                 report_path=None,
+                 verbose=0):
+        assert profiler_type in PROFILER_TYPES, f'{profiler_type} not in {PROFILER_TYPES}'
+        if profile_phases:
+            assert profile_folder is not None, 'please provide profile_folder when profiling phases'
+
+        self.name = name
+        self.measure_memory = measure_memory
+        self.profile_phases = profile_phases
+        self.profiler_type = profiler_type
+        self.profile_folder = profile_folder
+        self.report_path = report_path
+        self.verbose = verbose
+
+        self.started = datetime.now().isoformat()
+        self.records = []
+        self.memory_stack = [] # [memory at start, peak so far] of the open phases, the innermost last
+
+    def __str__(self):
+        info = [f'PhaseProfiler {self.name}:']
+        for record in self.records:
+            info.append(f'phase {record.name}: {record.to_dict()}')
+        return '\n'.join(info)
+
+    def should_profile(self, phase_name):
+        if self.profile_phases is True:
+            return True
+        return phase_name in self.profile_phases
+
+    @contextmanager
+    def phase(self, phase_name):
+        """
+        measure a phase
+
+        with profiler.phase('compute_bls') as record:
+            ...
+            record.count(bls=len(bls))
+
+        :param str phase_name: name of the phase
+        """
+        record = PhaseRecord(phase_name)
+        self.records.append(record)
+
+        try:
+            with ExitStack() as stack:
+                if self.measure_memory:
+                    stack.enter_context(self.measure_peak_memory(record))
+                if self.should_profile(phase_name):
+                    stack.enter_context(self.get_profile_context(phase_name, record))
+
+                start = time.perf_counter()
+                try:
+                    yield record
+                finally:
+                    record.seconds = round(time.perf_counter() - start, 4)
+        finally:
+            if self.verbose >= 2:
+                print(f'{self.name} phase {phase_name}: {record.to_dict()}')
+
+    @contextmanager
+    def measure_peak_memory(self, record):
+        """
+        store the peak memory usage of the phase (relative to its start) in the record.
+        tracemalloc is started by the outermost phase and stopped when it ends.
+        The peak of an open outer phase is kept in self.memory_stack when a nested phase resets the peak.
+        """
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+
+        memory_at_start, peak = tracemalloc.get_traced_memory()
+        for outer in self.memory_stack:
+            outer[1] = max(outer[1], peak)
+        if hasattr(tracemalloc, 'reset_peak'): # Python >= 3.9
+            tracemalloc.reset_peak()
+
+        entry = [memory_at_start, memory_at_start]
+        self.memory_stack.append(entry)
+        try:
+            yield
+        finally:
+            self.memory_stack.pop()
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(entry[1], peak)
+            for outer in self.memory_stack:
+                outer[1] = max(outer[1], peak)
+            record.peak_memory_mb = round((peak - memory_at_start) / 1024 ** 2, 2)
+
+            if started_tracing:
+                tracemalloc.stop()
+
+    @contextmanager
+    def get_profile_context(self, phase_name, record):
+        """
+        profile the phase with self.profiler_type and store the path to the profile in the record
+        """
+        if not os.path.isdir(self.profile_folder):
+            os.makedirs(self.profile_folder)
+
+        if self.profiler_type == 'cprofile':
+            profile_path = os.path.join(self.profile_folder, f'{self.name}.{phase_name}.prof')
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                profile.dump_stats(profile_path)
+
+        elif self.profiler_type == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                raise ImportError('pyinstrument is not installed, please use profiler_type cprofile')
+            profile_path = os.path.join(self.profile_folder, f'{self.name}.{phase_name}.html')
+            profile = Profiler()
+            profile.start()
+            try:
+                yield
+            finally:
+                profile.stop()
+                with open(profile_path, 'w') as outfile:
+                    outfile.write(profile.output_html())
+
+        record.profile_path = profile_path
+
+    def get_report(self):
+        """
+        :rtype: dict
+        :return: {'name', 'started', 'total_seconds', 'measure_memory', 'phases': [see PhaseRecord.to_dict]}
+        """
+        return {
+            'name' : self.name,
+            'started' : self.started,
+            'total_seconds' : round(sum(record.seconds or 0 for record in self.records), 4),
+            'measure_memory' : self.measure_memory,
+            'phases' : [record.to_dict() for record in self.records]
+        }
+
+    def write_report(self, report_path=None):
+        """
+        write the report to disk as JSON (atomically)
+
+        :param str report_path: path to the JSON file, self.report_path if None
+
+        :rtype: str
+        :return: the path to which the report was written
+        """
+        report_path = report_path or self.report_path
+        assert report_path is not None, 'please provide a report_path'
+
+        folder = os.path.dirname(report_path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        tmp_path = f'{report_path}.tmp'
+        with open(tmp_path, 'w') as outfile:
+            json.dump(self.get_report(), outfile, indent=2)
+        os.replace(tmp_path, report_path)
+
+        if self.verbose:
+            print(f'written phase report to: {report_path}')
+
+        return report_path
+
+    def start(self, name):
+        """
+        start a run: set the name (if not provided) and discard the phases of a previous run
+
+        :param str name: the name of the run, e.g., 'BLCollection'
+        """
+        if self.name is None:
+            self.name = name
+        self.started = datetime.now().isoformat()
+        self.records = []
+
+    def finish(self):
+        """
+        write the report to disk (if self.report_path is set) and return it
+
+        :rtype: dict
+        :return: see get_report
+        """
+        if self.report_path is not None:
+            self.write_report()
+
+        return self.get_report()
@@ -1,12 +1,13 @@
 """
 Usage:
-  run_ble.py --threshold=<threshold>
+  run_ble.py --threshold=<threshold> [--result_store_path=<result_store_path>]
 
 Options:
   --threshold=<threshold> the subsumer threshold
+  --result_store_path=<result_store_path>  SQLite database to which the run is added, see bl_store.py [default: output/bl_results.db]
 
 Example:
-    python run_ble.py --threshold=0
+    python run_ble.py --threshold=0 --result_store_path="output/bl_results.db"
 """
 from docopt import docopt
 import bl_classes
@@ -21,6 +22,7 @@ print(arguments)
 print()
 
 threshold = int(arguments['--threshold'])
+result_store_path = arguments['--result_store_path']
 
 # path to directed graph (see bottom of ble_classes.py for example)
 path = 'wd_cache/g.p'
@@ -33,6 +35,7 @@ bl_coll_obj = bl_classes.BLCollection(g=g,
                                       weight_property='occurrence_frequency',
                                       subsumer_threshold=threshold,
                                       root_zero=True,
+                                      result_store_path=result_store_path,
                                       verbose=1)
 
 utils.get_overview_table(input_folder='output',
@@ -18,15 +18,26 @@ import json
 import os 
 import shutil
 
-# load arguments
-arguments = docopt(__doc__)
-print()
-print('PROVIDED ARGUMENTS')
-print(arguments)
-print()
-
-verbose = int(arguments['--verbose'])
-settings = json.load(open(arguments['--path_config_json']))
-
-shutil.copytree(settings['paths']['lexicon_data'],
-                settings['paths']['data_release_frames_folder'])
+
+def add_lexicon_data(settings):
+    """
+    copy the FrameNet lexicon data to DATA_RELEASE_FRAMES_FOLDER
+
+    :param dict settings: the loaded config file
+    """
+    shutil.copytree(settings['paths']['lexicon_data'],
+                    settings['paths']['data_release_frames_folder'])
+
+
+if __name__ == '__main__':
+    # load arguments
+    arguments = docopt(__doc__)
+    print()
+    print('PROVIDED ARGUMENTS')
+    print(arguments)
+    print()
+
+    verbose = int(arguments['--verbose'])
+    settings = json.load(open(arguments['--path_config_json']))
+
+    add_lexicon_data(settings)
@@ -18,22 +18,29 @@ import json
 import os
 import shutil
 
-# load arguments
-arguments = docopt(__doc__)
-print()
-print('PROVIDED ARGUMENTS')
-print(arguments)
-print()
 
-verbose = int(arguments['--verbose'])
-settings = json.load(open(arguments['--path_config_json']))
+def add_readme_license(settings):
+    """
+    copy the licenses to DATA_RELEASE_FOLDER
 
-out_dir = settings['paths']['data_release_folder']
+    :param dict settings: the loaded config file
+    """
+    out_dir = settings['paths']['data_release_folder']
 
-for license, path in settings['licenses'].items():
-    shutil.copy(src=path,
-                dst=out_dir)
+    for license, path in settings['licenses'].items():
+        shutil.copy(src=path,
+                    dst=out_dir)
 
 
+if __name__ == '__main__':
+    # load arguments
+    arguments = docopt(__doc__)
+    print()
+    print('PROVIDED ARGUMENTS')
+    print(arguments)
+    print()
 
+    verbose = int(arguments['--verbose'])
+    settings = json.load(open(arguments['--path_config_json']))
 
+    add_readme_license(settings)
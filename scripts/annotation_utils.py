@@ -5,12 +5,12 @@ import pandas as pd
 import networkx as nx
 import statistics
 import math
+import itertools
 
-from sklearn.metrics import cohen_kappa_score
+import numpy as np
 
-import seaborn as sns
 import pandas
-import matplotlib.pyplot as plt
+# seaborn and matplotlib are only imported by create_heatmap
 
 ANNOTATION_TASKS = ["participants", "subevents"]
 
@@ -19,95 +19,285 @@ TASK_TO_INDEX = {
     'subevents' : 1
 }
 
-def load_user_annotations(user_annotations_folder, annotation_task, batches, verbose=0):
+# integer codes of the annotation values in the long-format annotation table (see load_annotations)
+LIKERT_VALUES = [1, 2, 3, 4, 5, 6, 7]
+MISSING_CODE = 0 # the user did not annotate the edge
+DK_CODE = -1 # don't know
+NS_CODE = -2 # not sure
+
+STRING_VALUE_TO_CODE = {str(likert_value) : likert_value
+                        for likert_value in LIKERT_VALUES}
+STRING_VALUE_TO_CODE['dk'] = DK_CODE
+STRING_VALUE_TO_CODE['ns'] = NS_CODE
+
+CODE_TO_VALUE = {likert_value : likert_value
+                 for likert_value in LIKERT_VALUES}
+CODE_TO_VALUE[DK_CODE] = 'dk'
+CODE_TO_VALUE[NS_CODE] = 'ns'
+CODE_TO_VALUE[MISSING_CODE] = None
+
+def load_annotations(main_anno_folder, users, batches, verbose=0):
     """
-    Load the user annotations for
-    a) one annotation task
-    b) n batches
+    Load the annotations of all users and batches into one long-format table,
+    i.e., one row per (edge, user, task).
+    The input format is main_anno_folder/USER/BATCH/annotations/{annotations.json, id_to_edge.json}
 
-    :rtype: dict
-    :return: mapping from (src, tgt) -> value
+    Each JSON file is read once (for all annotation tasks).
+    If a user annotated an edge in more than one batch, the first annotation is used.
+
+    :param str main_anno_folder: the folder containing one folder per user
+    :param list users: the users, e.g., ['Piek', 'Antske']
+    :param list batches: the batches, e.g., ['other', 'sport']
+
+    :rtype: pandas.DataFrame
+    :return: long-format table with the columns
+    'edge_id' (int, in order of first occurrence), 'parent', 'child', 'user', 'task',
+    'value' (int code, see STRING_VALUE_TO_CODE)
     """
-    user_annotations = dict()
-    index = TASK_TO_INDEX[annotation_task]
+    edge_to_id = dict()
+    columns = {'edge_id' : [],
+               'parent' : [],
+               'child' : [],
+               'user' : [],
+               'task' : [],
+               'value' : []}
+
+    for user in users:
+        user_edges = set()
 
+        for batch in batches:
+            folder_path = os.path.join(main_anno_folder, user, batch)
+            anno_json_path = os.path.join(folder_path, 'annotations', 'annotations.json')
+            index_json_path = os.path.join(folder_path, 'annotations', 'id_to_edge.json')
+            assert os.path.exists(anno_json_path)
 
-    for batch in batches:
-        folder_path = os.path.join(user_annotations_folder, batch)
-        anno_json_path = os.path.join(folder_path, 'annotations', 'annotations.json')
-        index_json_path = os.path.join(folder_path, 'annotations', 'id_to_edge.json')
-        assert os.path.exists(anno_json_path)
+            with open(anno_json_path) as infile:
+                anno = json.load(infile)
 
-        with open(anno_json_path) as infile:
-            anno = json.load(infile)
+            with open(index_json_path) as infile:
+                id_to_edge = json.load(infile)
 
-        with open(index_json_path) as infile:
-            id_to_edge = json.load(infile)
+            for id_, values in anno.items():
 
-        for id_, values in anno.items():
+                if id_ == 'the_end':
+                    continue
 
-            if id_ == 'the_end':
-                continue
+                edge = tuple(id_to_edge[id_]) # edges is (parent, child)
 
+                if edge in user_edges:
+                    if verbose >= 2:
+                        print()
+                        print(f'found existing annotation of {user} for {edge}: skipping')
+                    continue
+                user_edges.add(edge)
 
-            if values == False:
-                string_value = 'dk'
-            elif type(values) == list:
-                string_value = values[index]
+                if edge not in edge_to_id:
+                    edge_to_id[edge] = len(edge_to_id)
 
-            edge = id_to_edge[id_] # edges is (parent, child)
+                for task in ANNOTATION_TASKS:
+                    if values == False:
+                        string_value = 'dk'
+                    elif type(values) == list:
+                        string_value = values[TASK_TO_INDEX[task]]
 
-            if string_value in {'dk', 'ns'}:
-                value = string_value
-            elif string_value in {'1', '2', '3', '4', '5', '6', '7'}:
-                value = int(string_value)
-            else:
-                raise Exception(f'provided annotation {string_value} for id {id_} is not valid. Please inspect.')
+                    if string_value not in STRING_VALUE_TO_CODE:
+                        raise Exception(f'provided annotation {string_value} for id {id_} is not valid. Please inspect.')
 
-            key = tuple(edge)
+                    columns['edge_id'].append(edge_to_id[edge])
+                    columns['parent'].append(edge[0])
+                    columns['child'].append(edge[1])
+                    columns['user'].append(user)
+                    columns['task'].append(task)
+                    columns['value'].append(STRING_VALUE_TO_CODE[string_value])
 
-            if key in user_annotations:
-                print()
-                print(f'found existing annotation for {key}: skipping')
-                continue
-            user_annotations[tuple(edge)] = value
+    annotations_df = pd.DataFrame(columns)
+    annotations_df['value'] = annotations_df['value'].astype(np.int8)
 
     if verbose >= 1:
         print()
-        print(f'folder {user_annotations_folder}')
-        print(f'annotation task: {annotation_task}')
+        print(f'folder {main_anno_folder}')
+        print(f'users: {users}')
         print(f'batches: {batches}')
-        print(f'# of items annotated: {len(user_annotations)}')
-        print(Counter(user_annotations.values()))
+        print(f'# of annotated edges: {len(edge_to_id)}')
+        print(f'# of annotations: {len(annotations_df)}')
 
-    return user_annotations
+    return annotations_df
 
 
-def combine_annotations(users, batches, main_anno_folder, verbose=0):
+def get_rating_matrix(annotations_df, annotation_task, users):
+    """
+    convert the long-format annotation table (see load_annotations) into a matrix
+    with one row per edge and one column per user
+
+    :rtype: tuple
+    :return: (list of edges, numpy.ndarray of shape (number of edges, number of users)
+    containing the value codes (MISSING_CODE if the user did not annotate the edge))
+    """
+    edges_df = annotations_df.drop_duplicates('edge_id').sort_values('edge_id')
+    edges = list(zip(edges_df['parent'], edges_df['child']))
+    assert edges_df['edge_id'].tolist() == list(range(len(edges)))
+
+    task_df = annotations_df[annotations_df['task'] == annotation_task]
+    user_index = task_df['user'].map({user : index
+                                      for index, user in enumerate(users)})
+    task_df = task_df[user_index.notna()]
+    user_index = user_index[user_index.notna()].astype(int)
+
+    ratings = np.full((len(edges), len(users)), MISSING_CODE, dtype=np.int8)
+    ratings[task_df['edge_id'].to_numpy(), user_index.to_numpy()] = task_df['value'].to_numpy()
+
+    return edges, ratings
+
+
+def annotations_to_nested_dict(annotations_df, users):
+    """
+    :rtype: dict
+    :return: mapping from edge -> user -> task -> value
+    (an integer, 'dk', 'ns', or None if the user did not annotate the edge)
+    """
     edge_to_user_to_task_to_value = dict()
 
-    for user in users:
-        for task in ANNOTATION_TASKS:
-            print()
-            print(f'working on task {task} for user {user}')
-            user_annotations_folder = os.path.join(main_anno_folder, user)
-            edge_to_value = load_user_annotations(user_annotations_folder=user_annotations_folder,
-                                                  annotation_task=task,
-                                                  batches=batches,
-                                                  verbose=verbose)
-
-            for edge, value in edge_to_value.items():
-                if edge not in edge_to_user_to_task_to_value:
-                    info = {user : {task : None}
-                            for user in users
-                            for task in ANNOTATION_TASKS}
-                    edge_to_user_to_task_to_value[edge] = info
-
-                edge_to_user_to_task_to_value[edge][user][task] = value
+    task_to_ratings = dict()
+    for task in ANNOTATION_TASKS:
+        edges, ratings = get_rating_matrix(annotations_df, task, users)
+        task_to_ratings[task] = ratings.tolist()
+
+    for edge_index, edge in enumerate(edges):
+        edge_to_user_to_task_to_value[edge] = {user : {task : CODE_TO_VALUE[task_to_ratings[task][edge_index][user_index]]
+                                                       for task in ANNOTATION_TASKS}
+                                               for user_index, user in enumerate(users)}
 
     return edge_to_user_to_task_to_value
 
 
+def combine_annotations(users, batches, main_anno_folder, verbose=0):
+    annotations_df = load_annotations(main_anno_folder=main_anno_folder,
+                                      users=users,
+                                      batches=batches,
+                                      verbose=verbose)
+    return annotations_to_nested_dict(annotations_df, users)
+
+
+def cohen_kappa(labels_one, labels_two):
+    """
+    Cohen's kappa between two annotators (same result as sklearn.metrics.cohen_kappa_score)
+
+    :param numpy.ndarray labels_one: the labels of the first annotator
+    :param numpy.ndarray labels_two: the labels of the second annotator
+
+    :rtype: float
+    """
+    labels_one = np.asarray(labels_one)
+    labels_two = np.asarray(labels_two)
+    categories = np.union1d(labels_one, labels_two)
+    num_categories = len(categories)
+
+    indices_one = np.searchsorted(categories, labels_one)
+    indices_two = np.searchsorted(categories, labels_two)
+    confusion = np.bincount(indices_one * num_categories + indices_two,
+                            minlength=num_categories * num_categories).reshape(num_categories, num_categories)
+
+    num_items = confusion.sum()
+    observed = np.trace(confusion) / num_items
+    expected = (confusion.sum(axis=1) @ confusion.sum(axis=0)) / num_items ** 2
+
+    if expected == 1:
+        return float('nan')
+    return float((observed - expected) / (1 - expected))
+
+
+def fleiss_kappa(ratings, categories=LIKERT_VALUES):
+    """
+    Fleiss' kappa for any number of annotators
+
+    :param numpy.ndarray ratings: (number of items, number of annotators),
+    each item should be rated by all annotators
+
+    :rtype: float
+    """
+    counts = (ratings[:, :, None] == np.asarray(categories)[None, None, :]).sum(axis=1)
+    num_items, num_raters = ratings.shape
+    assert (counts.sum(axis=1) == num_raters).all(), 'each item should be rated by all annotators'
+
+    item_agreement = ((counts ** 2).sum(axis=1) - num_raters) / (num_raters * (num_raters - 1))
+    observed = item_agreement.mean()
+    category_proportions = counts.sum(axis=0) / (num_items * num_raters)
+    expected = (category_proportions ** 2).sum()
+
+    if expected == 1:
+        return float('nan')
+    return float((observed - expected) / (1 - expected))
+
+
+def krippendorff_alpha(ratings, level_of_measurement='nominal', categories=LIKERT_VALUES):
+    """
+    Krippendorff's alpha for any number of annotators.
+    Values that are not in categories, e.g., MISSING_CODE, DK_CODE, and NS_CODE, are treated as missing.
+
+    :param numpy.ndarray ratings: (number of items, number of annotators)
+    :param str level_of_measurement: 'nominal' or 'interval'
+
+    :rtype: float
+    """
+    categories = np.asarray(categories)
+    counts = (ratings[:, :, None] == categories[None, None, :]).sum(axis=1)
+    values_per_item = counts.sum(axis=1)
+
+    pairable = values_per_item >= 2
+    counts = counts[pairable]
+    weights = 1 / (values_per_item[pairable] - 1)
+
+    coincidences = counts.T @ (counts * weights[:, None]) - np.diag((counts * weights[:, None]).sum(axis=0))
+    category_totals = coincidences.sum(axis=1)
+    num_values = category_totals.sum()
+
+    if level_of_measurement == 'nominal':
+        distances = 1 - np.eye(len(categories))
+    elif level_of_measurement == 'interval':
+        distances = (categories[:, None] - categories[None, :]) ** 2
+    else:
+        raise Exception(f'level of measurement {level_of_measurement} not supported')
+
+    observed_disagreement = (coincidences * distances).sum()
+    expected_disagreement = (np.outer(category_totals, category_totals) * distances).sum() / (num_values - 1)
+
+    if expected_disagreement == 0:
+        return float('nan')
+    return float(1 - observed_disagreement / expected_disagreement)
+
+
+def compute_agreement_scores(ratings, users):
+    """
+    compute pairwise and multi-rater agreement
+
+    :param numpy.ndarray ratings: see get_rating_matrix
+    :param list users: the users (one per column of ratings)
+
+    :rtype: dict
+    :return: {
+    'cohen_kappa' : {(user_one, user_two) : kappa} (items labeled with a Likert value by both users),
+    'fleiss_kappa' : kappa (items labeled with a Likert value by all users),
+    'krippendorff_alpha_nominal' : alpha,
+    'krippendorff_alpha_interval' : alpha (the other values count as missing)
+    }
+    """
+    is_likert = ratings > 0
+
+    pair_to_kappa = dict()
+    for (index_one, user_one), (index_two, user_two) in itertools.combinations(enumerate(users), 2):
+        both_likert = is_likert[:, index_one] & is_likert[:, index_two]
+        pair_to_kappa[(user_one, user_two)] = cohen_kappa(ratings[both_likert, index_one],
+                                                          ratings[both_likert, index_two])
+
+    scores = {
+        'cohen_kappa' : pair_to_kappa,
+        'fleiss_kappa' : fleiss_kappa(ratings[is_likert.all(axis=1)]),
+        'krippendorff_alpha_nominal' : krippendorff_alpha(ratings, 'nominal'),
+        'krippendorff_alpha_interval' : krippendorff_alpha(ratings, 'interval'),
+    }
+    return scores
+
+
 def obtain_kappa_score(output_folder, users, annotation_task):
     """
 
@@ -133,60 +323,48 @@ def obtain_kappa_score(output_folder, users, annotation_task):
         labels_user_one.append(info_user_one[key])
         labels_user_two.append(info_user_two[key])
 
-    kappa = cohen_kappa_score(y1=labels_user_one, y2=labels_user_two)
+    kappa = cohen_kappa(labels_user_one, labels_user_two)
 
     return kappa
 
-def compute_agreement(edge_to_user_to_task_to_value,
+def compute_agreement(annotations_df,
                       annotation_task,
+                      users,
                       output_folder,
                       verbose=0):
     """
     create a table in which the user agreement for a particular task is shown
 
-    """
-    category_to_edges = defaultdict(list)
-
-    filtered_user_to_edge_to_value = defaultdict(dict)
-    num_cat_other = 0
-
-    for edge, user_to_task_to_value in edge_to_user_to_task_to_value.items():
-
-        user_to_value = {user: task_to_value[annotation_task]
-                         for user, task_to_value in user_to_task_to_value.items()}
-        values = list(user_to_value.values())
-
-        if values == ['dk' , 'dk']:
-            if verbose >= 2:
-                print(f'discarded {edge} {annotation_task} because both annotators indicated "dk"')
-            continue
+    :param pandas.DataFrame annotations_df: see load_annotations
+    :param str annotation_task: participants or subevents
+    :param list users: the users, e.g., ['Piek', 'Antske']
+    :param str output_folder: the tables, the filtered annotations per user, and the scores are written here
 
-        if values == ['ns' , 'ns']:
-            if verbose >= 2:
-                print(f'discarded {edge} {annotation_task} because both annotators indicated "ns"')
-            continue
-
-        category = "other"
-        if all([type(value) == int
-                for value in values]):
-            category = abs(values[0] - values[1]) # we focus on two annotators
+    :rtype: dict
+    :return: see compute_agreement_scores
+    """
+    edges, ratings = get_rating_matrix(annotations_df, annotation_task, users)
 
-        if category == "other":
-            num_cat_other += 1
-            continue
+    all_dk = (ratings == DK_CODE).all(axis=1)
+    all_ns = (ratings == NS_CODE).all(axis=1)
+    all_likert = (ratings > 0).all(axis=1)
 
-        category_to_edges[category].append(edge)
+    if verbose >= 2:
+        for edge_index in np.flatnonzero(all_dk):
+            print(f'discarded {edges[edge_index]} {annotation_task} because all annotators indicated "dk"')
+        for edge_index in np.flatnonzero(all_ns):
+            print(f'discarded {edges[edge_index]} {annotation_task} because all annotators indicated "ns"')
 
-        for user, value in user_to_value.items():
-            edge_string = '---'.join([id_ for id_ in edge])
-            filtered_user_to_edge_to_value[user][edge_string] = value
+    kept = ~(all_dk | all_ns)
+    num_cat_other = int((kept & ~all_likert).sum())
 
-    num_annotations = []
-    for user, annotations in filtered_user_to_edge_to_value.items():
-        num_annotations.append(len(annotations))
-    assert len(set(num_annotations)) == 1, f'this set should only have one value: {num_annotations}'
+    selected = np.flatnonzero(kept & all_likert)
+    selected_ratings = ratings[selected]
+    deltas = selected_ratings.max(axis=1) - selected_ratings.min(axis=1) # absolute difference for two annotators
 
-    for user, annotations in filtered_user_to_edge_to_value.items():
+    edge_strings = ['---'.join(edges[edge_index]) for edge_index in selected]
+    for user_index, user in enumerate(users):
+        annotations = dict(zip(edge_strings, selected_ratings[:, user_index].tolist()))
         json_path = os.path.join(output_folder, f'{annotation_task}_{user}.json')
         with open(json_path, 'w') as outfile:
             json.dump(annotations, outfile)
@@ -197,27 +375,13 @@ def compute_agreement(edge_to_user_to_task_to_value,
         print('i.e., one annotator specified an integer and the other dk or ns')
 
     # create table
-    list_of_lists = []
-    headers = ['Delta between annotations', 'Number of items']
-
-    for category, edges in category_to_edges.items():
-        one_row = [category, len(edges)]
-        list_of_lists.append(one_row)
-
-    df = pd.DataFrame(list_of_lists, columns=headers)
-    df = df.sort_values('Delta between annotations')
+    categories, num_items_per_category = np.unique(deltas, return_counts=True)
+    df = pd.DataFrame({'Delta between annotations' : categories.astype(int),
+                       'Number of items' : num_items_per_category})
 
     # cumulative relative frequency
-    num_items = sum(df['Number of items'])
-    cum_rel_freq_values = []
-    cum_rel_freq = 0
-
-    for index, row in df.iterrows():
-        rel_freq = 100 * (row['Number of items'] / num_items)
-        cum_rel_freq += rel_freq
-        cum_rel_freq_values.append(cum_rel_freq)
-
-    df['Cumulative Rel Freq'] = cum_rel_freq_values
+    num_items = num_items_per_category.sum()
+    df['Cumulative Rel Freq'] = np.cumsum(100 * (num_items_per_category / num_items))
 
     # export table
     excel_path = os.path.join(output_folder, f'agreement_{annotation_task}.xlsx')
@@ -235,6 +399,22 @@ def compute_agreement(edge_to_user_to_task_to_value,
         print()
         print(f'saved agreement for {annotation_task} to {latex_path}')
 
+    scores = compute_agreement_scores(ratings, users)
+
+    scores_path = os.path.join(output_folder, f'agreement_scores_{annotation_task}.json')
+    with open(scores_path, 'w') as outfile:
+        json.dump({key : ({'---'.join(pair) : kappa for pair, kappa in value.items()}
+                          if type(value) == dict else value)
+                   for key, value in scores.items()},
+                  outfile,
+                  indent=4)
+
+    if verbose >= 1:
+        print()
+        print(f'saved agreement scores for {annotation_task} to {scores_path}')
+
+    return scores
+
 
 def load_graph_from_edgelist(path_to_edge_list, verbose=0):
     """
@@ -282,36 +462,127 @@ def update_sample_graph_with_annotations(sample_graph,
     return sample_graph
 
 
-def get_average_edge_value(g, edge, annotation_task, users, verbose=0):
+def get_edge_value_arrays(g, users, annotation_tasks=ANNOTATION_TASKS):
     """
+    represent the annotated graph as edge-indexed arrays (edges in the order of g.edges())
+
+    :param g: the sample graph with annotations as edge attributes (see update_sample_graph_with_annotations)
+    :param list users: the users, e.g., ['Piek', 'Antske']
+    :param list annotation_tasks: the annotation tasks
+
+    :rtype: tuple
+    :return: (list of nodes, list of edges,
+    numpy.ndarray with the index of the parent of each edge,
+    numpy.ndarray with the index of the child of each edge,
+    numpy.ndarray of shape (number of edges, number of tasks, number of users) with the integer values
+    (NaN if the value is not an integer, e.g., 'dk', or missing))
+    """
+    nodes = list(g.nodes())
+    node_to_index = {node : index for index, node in enumerate(nodes)}
+    edges = list(g.edges())
 
-    :param g:
-    :param edge:
-    :param annotation_task:
-    :return:
+    parent_indices = np.fromiter((node_to_index[u] for u, v in edges), dtype=np.int64, count=len(edges))
+    child_indices = np.fromiter((node_to_index[v] for u, v in edges), dtype=np.int64, count=len(edges))
+
+    flat_values = []
+    no_values = {}
+    for u, v, attrs in g.edges(data=True):
+        for task in annotation_tasks:
+            user_to_value = attrs.get(task) or no_values
+            for user in users:
+                value = user_to_value.get(user)
+                flat_values.append(value if type(value) == int else np.nan)
+
+    values = np.array(flat_values, dtype=np.float64).reshape((len(edges), len(annotation_tasks), len(users)))
+
+    return nodes, edges, parent_indices, child_indices, values
+
+
+def compute_candidate_basic_levels(g, users, annotation_tasks=ANNOTATION_TASKS, verbose=0):
     """
-    values = []
-    u, v = edge
-    attrs = g.get_edge_data(u, v)
+    determine the candidate basic levels (see determine_candidate_basic_levels)
+    for all annotation tasks in one pass over the edges
 
-    if attrs:
-        for user, value in attrs[annotation_task].items():
-            if type(value) == int:
-                values.append(value)
+    The average of an edge is only used if all users provided an integer value.
+    The children and parent averages of all nodes are computed with segment reductions (np.bincount)
+    over the parent and child index of each edge (summed in the same order as before, hence the same floats).
 
-    if len(values) != len(users):
-        values = []
+    :rtype: dict
+    :return: annotation task -> output of determine_candidate_basic_levels
+    """
+    nodes, edges, parent_indices, child_indices, values = get_edge_value_arrays(g, users, annotation_tasks)
+    num_nodes = len(nodes)
+
+    # a node needs at least one child and one parent
+    has_children = np.bincount(parent_indices, minlength=num_nodes) > 0
+    has_parents = np.bincount(child_indices, minlength=num_nodes) > 0
+
+    # edges grouped by their parent (children edges of a node) and by their child (parent edges of a node),
+    # in the order of g.successors and g.predecessors
+    children_order = np.argsort(parent_indices, kind='stable').tolist()
+    children_offsets = np.concatenate([[0], np.cumsum(np.bincount(parent_indices, minlength=num_nodes))]).tolist()
+    edge_to_index = {edge : index for index, edge in enumerate(edges)}
+    parents_order = np.fromiter((edge_to_index[(parent, node)]
+                                 for node in nodes
+                                 for parent in g.predecessors(node)), dtype=np.int64, count=len(edges))
+    parents_offsets = np.concatenate([[0], np.cumsum(np.bincount(child_indices, minlength=num_nodes))]).tolist()
+    parents_order_list = parents_order.tolist()
+
+    task_to_ev_to_anno_info = {}
+    for task_index, annotation_task in enumerate(annotation_tasks):
+        task_values = values[:, task_index, :]
+        edge_is_valid = ~np.isnan(task_values).any(axis=1) if len(users) else np.zeros(len(edges), dtype=bool)
+        edge_avgs = np.where(edge_is_valid, task_values.sum(axis=1) / max(len(users), 1), 0.0)
+
+        children_sums = np.bincount(parent_indices, weights=edge_avgs, minlength=num_nodes)
+        children_counts = np.bincount(parent_indices, weights=edge_is_valid, minlength=num_nodes)
+        parent_sums = np.bincount(child_indices[parents_order], weights=edge_avgs[parents_order], minlength=num_nodes)
+        parent_counts = np.bincount(child_indices, weights=edge_is_valid, minlength=num_nodes)
+
+        is_candidate = has_children & has_parents & (children_counts > 0) & (parent_counts > 0)
+
+        # python lists are faster than numpy arrays for the item lookups below
+        edge_avg_list = edge_avgs.tolist()
+        edge_is_valid_list = edge_is_valid.tolist()
+
+        ev_to_anno_info = {}
+        for node_index in np.flatnonzero(is_candidate).tolist():
+            node = nodes[node_index]
+
+            children_edge_indices = children_order[children_offsets[node_index]:children_offsets[node_index + 1]]
+            children_edges_to_value = {edges[edge_index] : edge_avg_list[edge_index]
+                                       for edge_index in children_edge_indices
+                                       if edge_is_valid_list[edge_index]}
+
+            parent_edge_indices = parents_order_list[parents_offsets[node_index]:parents_offsets[node_index + 1]]
+            parent_edges_to_value = {edges[edge_index] : edge_avg_list[edge_index]
+                                     for edge_index in parent_edge_indices
+                                     if edge_is_valid_list[edge_index]}
+
+            children_value = float(children_sums[node_index] / children_counts[node_index])
+            parent_value = float(parent_sums[node_index] / parent_counts[node_index])
+            result = {
+                'children': children_value,
+                'children_edges_to_value' : children_edges_to_value,
+                'parents': parent_value,
+                'parents_edges_to_value' : parent_edges_to_value,
+                'delta' : children_value - parent_value
+            }
+
+            if verbose >= 3:
+                print()
+                print(node)
+                print(result)
 
-    if values:
-        avg = sum(values) / len(values)
-    else:
-        avg = None
+            ev_to_anno_info[node] = result
+
+        if verbose:
+            print()
+            print(f'collected relevant BLE annotation information for {len(ev_to_anno_info)} nodes ({annotation_task})')
 
-    if verbose >= 4:
-        if values:
-            print(values)
+        task_to_ev_to_anno_info[annotation_task] = ev_to_anno_info
 
-    return avg
+    return task_to_ev_to_anno_info
 
 
 def determine_candidate_basic_levels(g, annotation_task, users, verbose=0):
@@ -342,75 +613,10 @@ def determine_candidate_basic_levels(g, annotation_task, users, verbose=0):
     “parents” -> avg from edges
     }
     """
-    ev_to_anno_info = {}
-
-    for node in g.nodes():
-
-        children = g.successors(node)
-        parents = g.predecessors(node)
-
-        children_edges = [(node, child)
-                           for child in children]
-        assert len(children_edges) == len(set(children_edges))
-
-        parent_edges = [(parent, node)
-                        for parent in parents]
-        assert len(parent_edges) == len(set(parent_edges))
-
-        for parent, child in children_edges + parent_edges:
-            assert g.has_edge(parent, child), f'{(parent, child)} not found in graph'
-
-        if any([not children_edges,
-                not parent_edges]):
-            continue
-
-        children_avgs = []
-        children_edges_to_value = dict()
-        for children_edge in children_edges:
-            child_edge_avg = get_average_edge_value(g, children_edge, annotation_task, users, verbose=verbose)
-            if child_edge_avg is not None:
-                children_avgs.append(child_edge_avg)
-                children_edges_to_value[children_edge] = child_edge_avg
-
-        parent_avgs = []
-        parent_edges_to_value = dict()
-        for parent_edge in parent_edges:
-            parent_edge_avg = get_average_edge_value(g, parent_edge, annotation_task, users, verbose=verbose)
-            if parent_edge_avg is not None:
-                parent_avgs.append(parent_edge_avg)
-                parent_edges_to_value[parent_edge] = parent_edge_avg
-
-        if any([not children_avgs,
-                not parent_avgs]):
-            continue
-
-        children_value = sum(children_avgs) / len(children_avgs)
-        parent_value = sum(parent_avgs) / len(parent_avgs)
-        delta = children_value - parent_value
-        result = {
-            'children': children_value,
-            'children_edges_to_value' : children_edges_to_value,
-            'parents': parent_value,
-            'parents_edges_to_value' : parent_edges_to_value,
-            'delta' : delta
-        }
-
-        if verbose >= 3:
-            print()
-            print(node)
-            print('children', children_edges)
-            print('children averages', children_avgs)
-            print('parents', parent_edges)
-            print('parent averages', parent_avgs)
-            print(result)
-
-        ev_to_anno_info[node] = result
-
-    if verbose:
-        print()
-        print(f'collected relevant BLE annotation information for {len(ev_to_anno_info)} nodes')
-
-    return ev_to_anno_info
+    return compute_candidate_basic_levels(g,
+                                          users=users,
+                                          annotation_tasks=[annotation_task],
+                                          verbose=verbose)[annotation_task]
 
 
 def ble_analysis(candidate_ble_info,
@@ -548,6 +754,9 @@ def create_heatmap(piek_json,
                    verbose=0):
     """
     """
+    import seaborn as sns
+    import matplotlib.pyplot as plt
+
     # initialize dataframe
     likert_values = [1, 2, 3, 4, 5, 6, 7]
     df = pandas.DataFrame()
@@ -76,23 +76,28 @@ if verbose >= 1:
     print()
     print(f'(re)created results folder {output_folder}')
 
-edge_to_user_to_task_to_value = utils.combine_annotations(users=users,
-                                                          batches=batches,
-                                                          main_anno_folder=main_anno_folder,
-                                                          verbose=verbose)
+annotations_df = utils.load_annotations(main_anno_folder=main_anno_folder,
+                                        users=users,
+                                        batches=batches,
+                                        verbose=verbose)
+edge_to_user_to_task_to_value = utils.annotations_to_nested_dict(annotations_df, users)
 
 
 
 for annotation_task in ANNOTATION_TASKS:
-    utils.compute_agreement(edge_to_user_to_task_to_value,
-                            annotation_task,
-                            output_folder=output_folder,
-                            verbose=verbose)
+    scores = utils.compute_agreement(annotations_df,
+                                     annotation_task,
+                                     users=users,
+                                     output_folder=output_folder,
+                                     verbose=verbose)
 
-    kappa = utils.obtain_kappa_score(output_folder, users, annotation_task)
     print()
     print('Kappa')
-    print(kappa)
+    for (user_one, user_two), kappa in scores['cohen_kappa'].items():
+        print(user_one, user_two, kappa)
+    print("Fleiss' kappa", scores['fleiss_kappa'])
+    print("Krippendorff's alpha (nominal)", scores['krippendorff_alpha_nominal'])
+    print("Krippendorff's alpha (interval)", scores['krippendorff_alpha_interval'])
 
 
 
@@ -104,6 +109,12 @@ sample_anno_g = utils.update_sample_graph_with_annotations(sample_graph=sample_g
                                                            verbose=verbose)
 
 
+# candidate basic levels for all annotation tasks in one pass over the edges
+annotation_task_to_candidate_ble_info = utils.compute_candidate_basic_levels(g=sample_anno_g,
+                                                                            users=users,
+                                                                            annotation_tasks=ANNOTATION_TASKS,
+                                                                            verbose=verbose)
+
 annotation_task_to_ble_info = {}
 for annotation_task in ANNOTATION_TASKS:
 
@@ -111,10 +122,7 @@ for annotation_task in ANNOTATION_TASKS:
         print()
         print(f'analyzing for task {annotation_task}')
 
-    task_ble_info = utils.determine_candidate_basic_levels(g=sample_anno_g,
-                                                           annotation_task=annotation_task,
-                                                           users=users,
-                                                           verbose=verbose)
+    task_ble_info = annotation_task_to_candidate_ble_info[annotation_task]
 
     dot_folder = os.path.join(output_folder, annotation_task)
     os.mkdir(dot_folder)
@@ -7,8 +7,9 @@ import operator
 
 import networkx as nx
 import pandas as pd
-import graphviz
 sys.path.append('../')
+import graph_utils
+import dot_utils
 
 def get_leaf_nodes(g,
                    verbose=0):
@@ -170,10 +171,12 @@ def determine_sample(subgraph,
     :rtype: networkx.classes.digraph.DiGraph
     :return: trimmed directed graph containing only the edges selected to annotate
     """
+    closure_index = graph_utils.ClosureIndex(subgraph)
+
     # subgraphs to remove
     nodes_of_subgraphs_to_remove = set()
     for subgraph_to_remove in remove_subgraphs:
-        subsumers = nx.descendants(subgraph, subgraph_to_remove)
+        subsumers = closure_index.descendants(subgraph_to_remove)
         nodes_of_subgraphs_to_remove.add(subgraph_to_remove)
         nodes_of_subgraphs_to_remove.update(subsumers)
 
@@ -184,7 +187,7 @@ def determine_sample(subgraph,
     # determine all subsumers all selected children
     relevant_nodes = set([EVENT_NODE])
     for selected_child in selected_children:
-        child_subsumers = nx.descendants(subgraph, selected_child)
+        child_subsumers = closure_index.descendants(selected_child)
         relevant_nodes.add(selected_child)
         relevant_nodes.update(child_subsumers)
 
@@ -227,15 +230,16 @@ def convert_to_images(graph, ev_coll_obj, images_folder, annotations_folder, ver
 
     :param networkx.classes.digraph.DiGraph graph: the graph containing only edges to annotate
     :param str images_folder: the folder where the images, each image of one edge, are stored
+    (images of which the DOT source did not change are not rendered again, see dot_utils.render_dot_sources)
     :param str annotations_folder: the folder where the JSON with the annotations are stored
     """
-    for folder in [images_folder, annotations_folder]:
-        if os.path.exists(folder):
-            shutil.rmtree(folder)
-        os.mkdir(folder)
+    if os.path.exists(annotations_folder):
+        shutil.rmtree(annotations_folder)
+    os.mkdir(annotations_folder)
 
     annotations = dict()
     id_to_edge = dict()
+    name_to_dot_source = dict()
 
     for id_, (parent, child) in enumerate(graph.edges(), 1):
 
@@ -250,16 +254,17 @@ def convert_to_images(graph, ev_coll_obj, images_folder, annotations_folder, ver
             '',
             '0 -> 1[dir=back, label="subclass of"];',
             '}'])
-        source_obj = graphviz.Source(source=dot_string,
-                                     format='svg')
-        source_obj.render(directory=images_folder,
-                          filename=f'{id_}',
-                          format='svg')
-
+        name_to_dot_source[f'{id_}'] = dot_string
 
         annotations[id_] = False
         id_to_edge[id_] = [parent, child]
 
+    summary = dot_utils.render_dot_sources(name_to_dot_source,
+                                           output_folder=images_folder,
+                                           format='svg',
+                                           verbose=verbose)
+    assert not summary['failed'], f'failed to render the images of edge ids: {sorted(summary["failed"])}'
+
     path_annotations = os.path.join(annotations_folder, 'annotations.json')
     path_id_to_edge = os.path.join(annotations_folder, 'id_to_edge.json')
 
@@ -295,7 +300,8 @@ def export(export_folder, settings, images_folder, annotations_folder, path_the_
     # copy images folder
     export_images_folder = os.path.join(export_folder, 'images')
     shutil.copytree(images_folder,
-                    export_images_folder)
+                    export_images_folder,
+                    ignore=shutil.ignore_patterns(dot_utils.MANIFEST_BASENAME))
 
     # cp the_end.svg
     shutil.copy(path_the_end_svg,
@@ -316,9 +322,18 @@ images_folder = os.path.join(out_dir, 'images')
 annotations_folder = os.path.join(out_dir, 'annotations')
 sample_graph_path = f'{out_dir}/sample.edges'
 
+# the images folder is kept: only images of which the DOT source changed are rendered again
 if os.path.exists(out_dir):
-    shutil.rmtree(out_dir)
-os.mkdir(out_dir)
+    for basename in os.listdir(out_dir):
+        path = os.path.join(out_dir, basename)
+        if path == images_folder:
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+else:
+    os.mkdir(out_dir)
 os.mkdir(dot_folder)
 
 EVENT_NODE = 'Q1656682'
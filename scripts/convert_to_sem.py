@@ -21,22 +21,34 @@ import sys
 
 sys.path.append('../')
 
-# load arguments
-arguments = docopt(__doc__)
-print()
-print('PROVIDED ARGUMENTS')
-print(arguments)
-print()
-
-verbose = int(arguments['--verbose'])
-settings = json.load(open(arguments['--path_config_json']))
-
-ev_coll_obj = pickle.load(open(settings['paths']['wd_representation_with_mwep'],
-                          'rb'))
-
-os.mkdir(settings['paths']['data_release_rdf_folder'])
-ttl_path = os.path.join(settings['paths']['data_release_rdf_folder'],
-                        f'{settings["mwep"]["project"]}.ttl')
-ev_coll_obj.serialize(event_types=settings['event_types'],
-                      unstructured_folder=settings['paths']['data_release_naf_folder'],
-                      filename=ttl_path)
+
+def convert_to_sem(ev_coll_obj, settings):
+    """
+    serialize the main event types as SEM to DATA_RELEASE_RDF_FOLDER/PROJECT.ttl
+
+    :param wd_classes.EventTypeCollection ev_coll_obj: the EventTypeCollection with the MWEP integrations
+    :param dict settings: the loaded config file
+    """
+    os.mkdir(settings['paths']['data_release_rdf_folder'])
+    ttl_path = os.path.join(settings['paths']['data_release_rdf_folder'],
+                            f'{settings["mwep"]["project"]}.ttl')
+    ev_coll_obj.serialize(event_types=settings['event_types'],
+                          unstructured_folder=settings['paths']['data_release_naf_folder'],
+                          filename=ttl_path)
+
+
+if __name__ == '__main__':
+    # load arguments
+    arguments = docopt(__doc__)
+    print()
+    print('PROVIDED ARGUMENTS')
+    print(arguments)
+    print()
+
+    verbose = int(arguments['--verbose'])
+    settings = json.load(open(arguments['--path_config_json']))
+
+    ev_coll_obj = pickle.load(open(settings['paths']['wd_representation_with_mwep'],
+                              'rb'))
+
+    convert_to_sem(ev_coll_obj, settings)
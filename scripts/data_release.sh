@@ -1,5 +1,8 @@
 export LC_ALL="en_US.UTF-8"
 
+# alternatively, run all steps below (except typical frames) as a pipeline that skips up-to-date steps:
+#python run_pipeline.py --path_config_json="../config/v1.json" --verbose="1"
+
 #bash represent_wd.sh
 
 #bash create_input_txt_mwep.sh
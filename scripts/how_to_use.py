@@ -16,7 +16,11 @@ event_types = {
 'Q40244',
 'Q645883'}
 
-for event_type in event_types:
-    naf_paths = ev_type_coll.get_paths_of_reftexts_of_one_event_subgraph(f'http://www.wikidata.org/entity/{event_type}',
-                                                                         'data/wiki_output',
-                                                                         verbose=1)
+# one call for all event types: overlapping subgraphs are only visited once
+event_type_to_naf_paths = ev_type_coll.get_paths_of_reftexts_of_event_subgraphs({f'http://www.wikidata.org/entity/{event_type}'
+                                                                                 for event_type in event_types},
+                                                                                'data/wiki_output',
+                                                                                verbose=1)
+
+for event_type, naf_paths in event_type_to_naf_paths.items():
+    print(event_type, len(naf_paths))
@@ -20,21 +20,33 @@ import pickle
 import sys
 sys.path.append('../')
 
-# load arguments
-arguments = docopt(__doc__)
-print()
-print('PROVIDED ARGUMENTS')
-print(arguments)
-print()
-
-verbose = int(arguments['--verbose'])
-settings = json.load(open(arguments['--path_config_json']))
-
-ev_coll_obj = pickle.load(open(settings['paths']['wd_representation_with_mwep'],
-                          'rb'))
-
-ev_coll_obj.create_json_files(main_event_types=settings['event_types'],
-                              json_dir=settings['paths']['data_release_json_folder'],
-                              project=settings['mwep']['project'],
-                              wd_prefix='http://www.wikidata.org/entity/',
-                              verbose=0)
+
+def integrate_structured_data(ev_coll_obj, settings):
+    """
+    write the JSON files of the structured data of the main event types
+
+    :param wd_classes.EventTypeCollection ev_coll_obj: the EventTypeCollection with the MWEP integrations
+    :param dict settings: the loaded config file
+    """
+    ev_coll_obj.create_json_files(main_event_types=settings['event_types'],
+                                  json_dir=settings['paths']['data_release_json_folder'],
+                                  project=settings['mwep']['project'],
+                                  wd_prefix='http://www.wikidata.org/entity/',
+                                  verbose=0)
+
+
+if __name__ == '__main__':
+    # load arguments
+    arguments = docopt(__doc__)
+    print()
+    print('PROVIDED ARGUMENTS')
+    print(arguments)
+    print()
+
+    verbose = int(arguments['--verbose'])
+    settings = json.load(open(arguments['--path_config_json']))
+
+    ev_coll_obj = pickle.load(open(settings['paths']['wd_representation_with_mwep'],
+                              'rb'))
+
+    integrate_structured_data(ev_coll_obj, settings)
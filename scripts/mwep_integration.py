@@ -6,7 +6,7 @@ Usage:
   mwep_integration.py --path_ev_type_coll=<path_ev_type_coll> --outpath_ev_type_coll=<outpath_ev_type_coll>\
   --path_mwep_repo=<path_mwep_repo>\
   --path_inc_coll_obj=<path_inc_coll_obj>  --path_mwep_wiki_output=<path_mwep_wiki_output>\
-  --path_wd_wiki_output=<path_wd_wiki_output> --verbose=<verbose>
+  --path_wd_wiki_output=<path_wd_wiki_output> [--naf_store_folder=<naf_store_folder>] --verbose=<verbose>
 
 Options:
     --path_ev_type_coll=<path_ev_type_coll> path where the pickled EventTypeCollection is stored on disk
@@ -15,6 +15,7 @@ Options:
     --path_inc_coll_obj=<path_inc_coll_obj> path where the pickled IncidentCollection from MWEP is stored on disk
     --path_mwep_wiki_output=<path_mwep_wiki_output> path to folder where the NAF files are stored as output of running MWEP
     --path_wd_wiki_output=<path_wd_wiki_output> path to folder where the NAF files belonging to EventTypeCollection are stored
+    --naf_store_folder=<naf_store_folder> optional: stage the NAF files into this content-addressed store (see ../naf_store.py) instead of copying them
     --verbose=<verbose> 0 --> no stdout 1 --> general stdout 2 --> detailed stdout
 """
 from docopt import docopt
@@ -37,6 +38,7 @@ ev_type_coll.incorporate_incident_collection(path_to_mwep_repo=arguments['--path
                                              path_to_incident_coll_obj=arguments['--path_inc_coll_obj'],
                                              path_mwep_wiki_output_folder=arguments['--path_mwep_wiki_output'],
                                              path_wd_wiki_output_folder=arguments['--path_wd_wiki_output'],
+                                             naf_store_folder=arguments['--naf_store_folder'],
                                              verbose=verbose)
 
 # overwrite EventTypeCollection on disk
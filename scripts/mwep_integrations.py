@@ -51,6 +51,7 @@ mwep_folder=settings['paths']['mwep_folder']
 mwep_wiki_output=settings['paths']['mwep_wiki_output']
 wd_wiki_output=settings['paths']['data_release_naf_folder']
 path_event_types_txt=settings['paths']['event_types_txt']
+naf_store_folder=settings['paths'].get('naf_store_folder')
 
 languages = ",".join(sorted(settings['mwep']['languages']))
 
@@ -67,6 +68,8 @@ with open(path_event_types_txt) as infile:
             f'--path_wd_wiki_output="{wd_wiki_output}"',
             '--verbose=3'
         ]
+        if naf_store_folder:
+            subcommands.insert(-1, f'--naf_store_folder="{naf_store_folder}"')
         command = ' '.join(subcommands)
         print()
         print(command)
@@ -10,6 +10,19 @@ Options:
     --path_config_json=<path_config_json> e.g., ../config/v1.json
     --verbose=<verbose> 0 nothing, 1 descriptive stats, 2 debugging information
 
+The NAF files are processed in batches by several workers (see open_sesame_driver.py).
+By default, run_open_sesame.sh is called, which writes to the fixed folder "naf_output_folder"
+of the "open-sesame" section of the config file, hence each worker runs it in its own copy of path_repo
+(symbolic links, except for its own naf_output_folder).
+Optional keys of the "open-sesame" section of the config file:
+    "command": command template (default: open_sesame_driver.DEFAULT_COMMAND_TEMPLATE)
+    "private_folders": other folders of path_repo to which the command writes (default: none)
+    "model_version": stored in the nafHeader, documents with an SRL layer from this version are skipped
+    (default: the git commit of path_repo)
+    "batch_size": number of NAF files per batch (default: 50)
+    "num_workers": maximum number of concurrent workers (default: number of CPUs)
+    "memory_per_worker_gb": memory one worker needs, bounds the number of workers (default: 4)
+
 Example:
     python run_open_sesame.py --path_config_json="../config/v1.json" --verbose="2"
 """
@@ -20,6 +33,8 @@ import os
 import subprocess
 
 sys.path.append('../')
+import naf_store
+import open_sesame_driver
 
 # load arguments
 arguments = docopt(__doc__)
@@ -31,36 +46,64 @@ print()
 verbose = int(arguments['--verbose'])
 settings = json.load(open(arguments['--path_config_json']))
 
+open_sesame_settings = settings['open-sesame']
 frame_to_info = os.path.join(settings['paths']['lexicon_data'],
                              'frame_to_info.json')
 
-parts = [
-    f'cd {settings["open-sesame"]["path_repo"]}',
-    '&&',
-    "bash run_open_sesame.sh",
-    os.path.join(settings['paths']['data_release_naf_folder'], 'en'),
-    settings['open-sesame']['tasks'],
-    frame_to_info
-]
-command = ' '.join(parts)
-print(command)
-result = subprocess.check_output(command, shell=True)
-print(result)
-
-naf_out = os.path.join(settings['open-sesame']['path_repo'], 'output', 'NAF')
+model_version = open_sesame_settings.get('model_version')
+if model_version is None:
+    try:
+        model_version = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                                cwd=open_sesame_settings['path_repo']).decode('utf-8').strip()
+    except (subprocess.CalledProcessError, OSError):
+        model_version = 'unknown'
+
+driver = open_sesame_driver.OpenSesameDriver(
+    command_template=open_sesame_settings.get('command', open_sesame_driver.DEFAULT_COMMAND_TEMPLATE),
+    cwd=open_sesame_settings['path_repo'],
+    naf_output_folder=open_sesame_settings.get('naf_output_folder'),
+    private_folders=open_sesame_settings.get('private_folders', []),
+    model_version=model_version,
+    tasks=open_sesame_settings['tasks'],
+    frame_to_info=os.path.abspath(frame_to_info),
+    batch_size=open_sesame_settings.get('batch_size', 50),
+    num_workers=open_sesame_settings.get('num_workers'),
+    memory_per_worker_gb=open_sesame_settings.get('memory_per_worker_gb', 4),
+    verbose=verbose)
+
 wd_en_out = os.path.join(settings['paths']['data_release_naf_folder'], 'en')
-cp_parts = [
-    'find',
-    naf_out,
-    '-name',
-    "'*naf'",
-    "-exec",
-    "cp",
-    "{}",
-    wd_en_out,
-    "\\;"
-    ]
-cp_command = ' '.join(cp_parts)
-print(cp_command)
-result = subprocess.check_output(cp_command, shell=True)
-print(result)
+title_to_output_path, summary = driver.run(wd_en_out)
+
+naf_store_folder = settings['paths'].get('naf_store_folder')
+if naf_store_folder:
+    # stage the output into the NAF store: only changed documents are written
+    # and the blobs shared with other data releases are never overwritten
+    store = naf_store.NAFStore(naf_store_folder, verbose=verbose)
+    release_index = store.get_release_index(settings['paths']['data_release_naf_folder'])
+    num_changed = 0
+    for title, naf_path in title_to_output_path.items():
+        num_changed += store.stage(src_path=naf_path,
+                                   release_index=release_index,
+                                   unstructured_folder=settings['paths']['data_release_naf_folder'],
+                                   language='en',
+                                   title=title)
+    naf_store.write_release_index(settings['paths']['data_release_naf_folder'], release_index)
+    print(f'staged open-sesame output into {store}: {num_changed} changed NAF files')
+else:
+    # one bulk swap of the English NAF folder instead of one copy per file
+    open_sesame_driver.move_back(wd_en_out, title_to_output_path, verbose=verbose)
+
+naf_store.invalidate_naf_index(settings['paths']['data_release_naf_folder'])
+driver.cleanup(summary)
+
+if summary['failed_batches']:
+    raise Exception(f'{len(summary["failed_batches"])} batch(es) failed: {summary["failed_batches"]}')
+
+if summary['missing']:
+    raise Exception(f'open-sesame wrote no output for {len(summary["missing"])} NAF file(s) '
+                    f'({summary["processed"]} processed), please check the command and its output folder: '
+                    f'{summary["missing"][:10]}')
+
+# marks the run as done (see the output_paths of run_open_sesame in run_pipeline.py)
+summary_path = open_sesame_driver.write_summary(settings['paths']['data_release_naf_folder'], summary, model_version)
+print(f'written {summary_path}')
@@ -0,0 +1,233 @@
+"""
+Run the steps of a data release as a pipeline (see pipeline_runner.py)
+
+The steps (and the steps they depend on):
+* call_mwep
+* mwep_integrations (call_mwep)
+* run_open_sesame (mwep_integrations)
+* integrate_structured_data (mwep_integrations)
+* add_lexicon_data (mwep_integrations)
+* add_readme_license (mwep_integrations)
+* write_structured_and_unstructured (integrate_structured_data, run_open_sesame)
+* convert_to_sem (run_open_sesame)
+* write_stats (run_open_sesame)
+
+Steps that are up to date are skipped, steps of which the dependencies are done run concurrently.
+call_mwep, mwep_integrations, and run_open_sesame run their script as a subprocess,
+the other steps call the function of their script in this process.
+Steps run concurrently in threads. integrate_structured_data, write_structured_and_unstructured,
+convert_to_sem, and write_stats share one EventTypeCollection, which is loaded once and updates its caches
+while it is read, hence these steps use it one at a time (see PipelineContext.use_ev_coll_obj).
+run_open_sesame writes open_sesame_driver.SUMMARY_BASENAME to the NAF folder of the data release when it is done.
+The fingerprints of the steps are stored in DATA_RELEASES_FOLDER/.pipeline_state_PROJECT.json.
+
+python run_pipeline.py --path_config_json=<path_config_json> --verbose=<verbose>
+
+Usage:
+  run_pipeline.py --path_config_json=<path_config_json> [--steps=<steps>] [--no_dependencies]\
+ [--force] [--dry_run] [--num_workers=<num_workers>] [--verbose=<verbose>]
+
+Options:
+    --path_config_json=<path_config_json>  e.g., ../config/v1.json
+    --steps=<steps>  comma-separated names of steps, e.g., "convert_to_sem,write_stats" (default: all steps)
+    --no_dependencies  only consider the provided steps, i.e., not the steps they depend on
+    --force  run the steps even if they are up to date
+    --dry_run  only show which steps are not up to date
+    --num_workers=<num_workers>  maximum number of steps that run concurrently [default: 4]
+    --verbose=<verbose>  0 nothing, 1 descriptive stats, 2 debugging information [default: 1]
+
+Example:
+    python run_pipeline.py --path_config_json="../config/v1.json" --verbose="1"
+"""
+from docopt import docopt
+import json
+import os
+import sys
+import shutil
+import subprocess
+
+sys.path.append('../')
+import pipeline_runner
+import open_sesame_driver
+
+# the steps that run in this process use the functions of the scripts of this folder
+import add_lexicon_data
+import add_readme_license
+import convert_to_sem
+import integrate_structured_data
+import write_stats
+import write_structured_and_unstructured
+
+SCRIPTS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_script_function(script, path_config_json, verbose):
+    """
+    :rtype: function
+    :return: function that runs one of the scripts of this folder as a subprocess
+    """
+    def run_script(context):
+        command = [sys.executable,
+                   script,
+                   f'--path_config_json={path_config_json}',
+                   f'--verbose={verbose}']
+        if verbose >= 2:
+            print(' '.join(command))
+        subprocess.run(command, cwd=SCRIPTS_FOLDER, check=True)
+    return run_script
+
+
+def remove_folder(folder):
+    if os.path.exists(folder):
+        shutil.rmtree(folder)
+
+
+def integrate_structured_data_step(context):
+    settings = context.settings
+    remove_folder(settings['paths']['data_release_json_folder'])
+    with context.use_ev_coll_obj() as ev_coll_obj:
+        integrate_structured_data.integrate_structured_data(ev_coll_obj, settings)
+
+
+def write_structured_and_unstructured_step(context):
+    with context.use_ev_coll_obj() as ev_coll_obj:
+        write_structured_and_unstructured.write_structured_and_unstructured(ev_coll_obj, context.settings)
+
+
+def convert_to_sem_step(context):
+    settings = context.settings
+    remove_folder(settings['paths']['data_release_rdf_folder'])
+    with context.use_ev_coll_obj() as ev_coll_obj:
+        convert_to_sem.convert_to_sem(ev_coll_obj, settings)
+
+
+def write_stats_step(context):
+    with context.use_ev_coll_obj() as ev_coll_obj:
+        write_stats.write_stats(ev_coll_obj, context.settings)
+
+
+def add_lexicon_data_step(context):
+    settings = context.settings
+    remove_folder(settings['paths']['data_release_frames_folder'])
+    add_lexicon_data.add_lexicon_data(settings)
+
+
+def add_readme_license_step(context):
+    add_readme_license.add_readme_license(context.settings)
+
+
+def get_data_release_steps(settings, path_config_json, verbose=0):
+    """
+    :param dict settings: the loaded config file
+    :param str path_config_json: path to the config file (passed to the scripts that run as a subprocess)
+
+    :rtype: list
+    :return: instances of pipeline_runner.Step
+    """
+    paths = settings['paths']
+    Step = pipeline_runner.Step
+
+    run_mwep_integrations = get_script_function('mwep_integrations.py', path_config_json, verbose)
+
+    def mwep_integrations(context):
+        run_mwep_integrations(context)
+        # the script wrote a new version of the pickled EventTypeCollection
+        context.invalidate_ev_coll_obj()
+
+    steps = [
+        Step('call_mwep',
+             get_script_function('call_mwep.py', path_config_json, verbose),
+             input_paths=[paths['mwep_settings'],
+                          paths['event_types_txt']],
+             settings=[settings['mwep'], paths['mwep_folder']]),
+        Step('mwep_integrations',
+             mwep_integrations,
+             dependencies=['call_mwep'],
+             input_paths=[paths['wd_representation_base'],
+                          paths['bin_folder'],
+                          paths['mwep_wiki_output'],
+                          paths['event_types_txt']],
+             settings=[settings['mwep']['languages'], paths.get('naf_store_folder')],
+             output_paths=[paths['wd_representation_with_mwep'],
+                           paths['data_release_naf_folder']]),
+        Step('run_open_sesame',
+             get_script_function('run_open_sesame.py', path_config_json, verbose),
+             dependencies=['mwep_integrations'],
+             input_paths=[os.path.join(paths['lexicon_data'], 'frame_to_info.json')],
+             settings=[settings['open-sesame'], paths.get('naf_store_folder')],
+             output_paths=[os.path.join(paths['data_release_naf_folder'], open_sesame_driver.SUMMARY_BASENAME)]),
+        Step('integrate_structured_data',
+             integrate_structured_data_step,
+             dependencies=['mwep_integrations'],
+             settings=[settings['event_types'], settings['mwep']['project']],
+             output_paths=[os.path.join(paths['data_release_json_folder'], 'inc2doc_index.json')]),
+        Step('add_lexicon_data',
+             add_lexicon_data_step,
+             dependencies=['mwep_integrations'],
+             input_paths=[paths['lexicon_data']],
+             output_paths=[paths['data_release_frames_folder']]),
+        Step('add_readme_license',
+             add_readme_license_step,
+             dependencies=['mwep_integrations'],
+             input_paths=list(settings['licenses'].values()),
+             output_paths=[os.path.join(paths['data_release_folder'], os.path.basename(path))
+                           for path in settings['licenses'].values()]),
+        Step('write_structured_and_unstructured',
+             write_structured_and_unstructured_step,
+             dependencies=['integrate_structured_data', 'run_open_sesame'],
+             settings=[settings['event_types']],
+             output_paths=[os.path.join(paths['data_release_json_folder'], 'structured_and_unstructured.json')]),
+        Step('convert_to_sem',
+             convert_to_sem_step,
+             dependencies=['run_open_sesame'],
+             settings=[settings['event_types'], settings['mwep']['project']],
+             output_paths=[os.path.join(paths['data_release_rdf_folder'], f'{settings["mwep"]["project"]}.ttl')]),
+        Step('write_stats',
+             write_stats_step,
+             dependencies=['run_open_sesame'],
+             settings=[settings['event_types'], settings['mwep']['languages']],
+             output_paths=[paths['data_release_stats_folder']]),
+    ]
+    return steps
+
+
+if __name__ == '__main__':
+    # load arguments
+    arguments = docopt(__doc__)
+    print()
+    print('PROVIDED ARGUMENTS')
+    print(arguments)
+    print()
+
+    verbose = int(arguments['--verbose'])
+    path_config_json = os.path.abspath(arguments['--path_config_json'])
+    settings = json.load(open(path_config_json))
+
+    # the paths in the config files are relative to this folder
+    os.chdir(SCRIPTS_FOLDER)
+
+    context = pipeline_runner.PipelineContext(settings,
+                                              ev_coll_path=settings['paths']['wd_representation_with_mwep'],
+                                              verbose=verbose)
+
+    # the data release folder is removed by mwep_integrations, hence the state is stored one level up
+    state_path = os.path.join(settings['paths']['data_releases_folder'],
+                              f'.pipeline_state_{settings["mwep"]["project"]}.json')
+
+    runner = pipeline_runner.PipelineRunner(steps=get_data_release_steps(settings, path_config_json, verbose),
+                                            state_path=state_path,
+                                            context=context,
+                                            num_workers=int(arguments['--num_workers']),
+                                            verbose=verbose)
+
+    targets = None
+    if arguments['--steps']:
+        targets = [step.strip() for step in arguments['--steps'].split(',')]
+
+    summary = runner.run(targets=targets,
+                         with_dependencies=not arguments['--no_dependencies'],
+                         force=arguments['--force'],
+                         dry_run=arguments['--dry_run'])
+
+    if summary['failed']:
+        sys.exit(1)
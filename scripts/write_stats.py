@@ -20,20 +20,32 @@ import sys
 
 sys.path.append('../')
 
-# load arguments
-arguments = docopt(__doc__)
-print()
-print('PROVIDED ARGUMENTS')
-print(arguments)
-print()
-
-verbose = int(arguments['--verbose'])
-settings = json.load(open(arguments['--path_config_json']))
-
-ev_coll_obj = pickle.load(open(settings['paths']['wd_representation_with_mwep'],
-                               'rb'))
-
-ev_coll_obj.write_stats(event_types=settings['event_types'],
-                        stats_folder=settings['paths']['data_release_stats_folder'],
-                        unstructured_folder=settings['paths']['data_release_naf_folder'],
-                        languages=settings['mwep']['languages'])
+
+def write_stats(ev_coll_obj, settings):
+    """
+    write descriptive statistics about the main event types to DATA_RELEASE_STATS_FOLDER
+
+    :param wd_classes.EventTypeCollection ev_coll_obj: the EventTypeCollection with the MWEP integrations
+    :param dict settings: the loaded config file
+    """
+    ev_coll_obj.write_stats(event_types=settings['event_types'],
+                            stats_folder=settings['paths']['data_release_stats_folder'],
+                            unstructured_folder=settings['paths']['data_release_naf_folder'],
+                            languages=settings['mwep']['languages'])
+
+
+if __name__ == '__main__':
+    # load arguments
+    arguments = docopt(__doc__)
+    print()
+    print('PROVIDED ARGUMENTS')
+    print(arguments)
+    print()
+
+    verbose = int(arguments['--verbose'])
+    settings = json.load(open(arguments['--path_config_json']))
+
+    ev_coll_obj = pickle.load(open(settings['paths']['wd_representation_with_mwep'],
+                                   'rb'))
+
+    write_stats(ev_coll_obj, settings)
@@ -21,25 +21,36 @@ import sys
 
 sys.path.append('../')
 
-# load arguments
-arguments = docopt(__doc__)
-print()
-print('PROVIDED ARGUMENTS')
-print(arguments)
-print()
 
-verbose = int(arguments['--verbose'])
-settings = json.load(open(arguments['--path_config_json']))
+def write_structured_and_unstructured(ev_coll_obj, settings):
+    """
+    write the structured and unstructured data of the main event types to one JSON file
 
-ev_coll_obj = pickle.load(open(settings['paths']['wd_representation_with_mwep'],
-                               'rb'))
+    :param wd_classes.EventTypeCollection ev_coll_obj: the EventTypeCollection with the MWEP integrations
+    :param dict settings: the loaded config file
+    """
+    ev_coll_obj.write_all_to_one_json(event_types=settings['event_types'],
+                                      json_folder=settings['paths']['data_release_json_folder'],
+                                      unstructured_folder=settings['paths']['data_release_naf_folder'])
 
-if os.path.exists(settings['paths']['typical_frames_path']):
-    typical_frames = json.load(open(settings['paths']['typical_frames_path']))
-else:
-    typical_frames = {}
 
-ev_coll_obj.write_all_to_one_json(event_types=settings['event_types'],
-                                  json_folder=settings['paths']['data_release_json_folder'],
-                                  unstructured_folder=settings['paths']['data_release_naf_folder'])
+if __name__ == '__main__':
+    # load arguments
+    arguments = docopt(__doc__)
+    print()
+    print('PROVIDED ARGUMENTS')
+    print(arguments)
+    print()
 
+    verbose = int(arguments['--verbose'])
+    settings = json.load(open(arguments['--path_config_json']))
+
+    ev_coll_obj = pickle.load(open(settings['paths']['wd_representation_with_mwep'],
+                                   'rb'))
+
+    if os.path.exists(settings['paths']['typical_frames_path']):
+        typical_frames = json.load(open(settings['paths']['typical_frames_path']))
+    else:
+        typical_frames = {}
+
+    write_structured_and_unstructured(ev_coll_obj, settings)
@@ -0,0 +1,129 @@
+"""
+Record/replay cache of SPARQL responses
+
+Each response is stored as one JSON file named after the hash of the query text:
+cache_folder
+    ab
+        ab12...ef.json {'query': ..., 'endpoint': ..., 'recorded': ..., 'response': ...}
+
+Modes (see SPARQLCache):
+-record: always call the endpoint and store the response
+-replay: only use stored responses, a query that was not recorded is an error (offline, reproducible)
+-auto: replay if the response is stored, else call the endpoint and record the response
+
+Example:
+    cache = sparql_cache.SPARQLCache('sparql_cache', mode='auto')
+    wd_utils.run_queries('wd_cache', sparql_cache=cache, verbose=2)
+
+or from the command line (see wd_utils.py):
+    python wd_utils.py --sparql_cache_folder="sparql_cache" --sparql_cache_mode="replay"
+"""
+import os
+import json
+import hashlib
+from datetime import datetime
+
+MODES = {'record', 'replay', 'auto'}
+
+
+def get_query_hash(query):
+    """
+    :param str query: a SPARQL query
+
+    :rtype: str
+    :return: sha256 hexdigest of the query text (leading and trailing whitespace are ignored)
+    """
+    return hashlib.sha256(query.strip().encode('utf-8')).hexdigest()
+
+
+class SPARQLCache:
+    """
+    :param str cache_folder: folder in which the responses are stored (created if it does not exist)
+    :param str mode: record | replay | auto (see module docstring)
+    """
+    def __init__(self, cache_folder, mode='auto', verbose=0):
+        assert mode in MODES, f'{mode} not in {MODES}'
+        self.cache_folder = cache_folder
+        self.mode = mode
+        self.verbose = verbose
+
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_recorded = 0
+
+        if not os.path.isdir(cache_folder):
+            os.makedirs(cache_folder)
+
+    def __str__(self):
+        return (f'SPARQLCache at {self.cache_folder} (mode {self.mode}): '
+                f'{self.num_hits} hit(s), {self.num_misses} miss(es), {self.num_recorded} recorded')
+
+    def __contains__(self, query):
+        return os.path.exists(self.get_path(query))
+
+    def __len__(self):
+        return sum(1 for _ in self.iter_paths())
+
+    def get_path(self, query):
+        query_hash = get_query_hash(query)
+        return os.path.join(self.cache_folder, query_hash[:2], f'{query_hash}.json')
+
+    def iter_paths(self):
+        for folder, _, basenames in os.walk(self.cache_folder):
+            for basename in basenames:
+                if basename.endswith('.json'):
+                    yield os.path.join(folder, basename)
+
+    @property
+    def replays(self):
+        return self.mode in {'replay', 'auto'}
+
+    @property
+    def records(self):
+        return self.mode in {'record', 'auto'}
+
+    def get(self, query):
+        """
+        :param str query: a SPARQL query
+
+        :rtype: dict
+        :return: the recorded response, None if the query was not recorded
+        """
+        path = self.get_path(query)
+        if not os.path.exists(path):
+            self.num_misses += 1
+            if self.verbose >= 2:
+                print(f'SPARQL cache miss {get_query_hash(query)}')
+            return None
+
+        with open(path) as infile:
+            entry = json.load(infile)
+        self.num_hits += 1
+        return entry['response']
+
+    def put(self, query, response, endpoint=None):
+        """
+        store a response (atomically, an existing entry is replaced)
+
+        :param str query: a SPARQL query
+        :param dict response: the response of the endpoint
+        :param str endpoint: the url of the endpoint (only stored as metadata)
+        """
+        path = self.get_path(query)
+        folder = os.path.dirname(path)
+        if not os.path.isdir(folder):
+            os.makedirs(folder, exist_ok=True)
+
+        entry = {'query' : query,
+                 'endpoint' : endpoint,
+                 'recorded' : datetime.now().isoformat(),
+                 'response' : response}
+
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as outfile:
+            json.dump(entry, outfile)
+        os.replace(tmp_path, path)
+
+        self.num_recorded += 1
+        if self.verbose >= 2:
+            print(f'SPARQL cache recorded {get_query_hash(query)}')
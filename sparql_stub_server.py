@@ -0,0 +1,312 @@
+"""
+Local stub of a SPARQL endpoint (SPARQL 1.1 protocol, JSON results) for development and load testing
+
+Queries are answered with:
+1. responses recorded in a SPARQLCache (see sparql_cache.py), and/or
+2. synthetic responses for the queries in wd_utils.QUERIES, computed from wd_cache-style JSON files,
+e.g., written by benchmarks/synthetic.py. The VALUES of batched queries are respected.
+
+Latency and errors can be injected to test the retry and batching logic of wd_utils.
+GET /stats returns the number of requests, hits, misses, and injected errors.
+
+Example:
+    server = sparql_stub_server.start_stub_server(wd_cache_folder='wd_cache', latency=0.05, error_rate=0.1)
+    wd_utils.run_queries('wd_cache_copy', wdt_sparql_url=server.url)
+    server.shutdown()
+
+Usage:
+  sparql_stub_server.py [--port=<port>] [--cache_folder=<cache_folder>] [--wd_cache_folder=<wd_cache_folder>]\
+ [--latency=<latency>] [--error_rate=<error_rate>] [--seed=<seed>] [--verbose=<verbose>]
+
+Options:
+    --port=<port>  the port [default: 8890]
+    --cache_folder=<cache_folder>  folder of a SPARQLCache with recorded responses
+    --wd_cache_folder=<wd_cache_folder>  folder with wd_cache JSON files used for synthetic responses
+    --latency=<latency>  number of seconds added to each response [default: 0]
+    --error_rate=<error_rate>  probability that a request fails with HTTP status 500 [default: 0]
+    --seed=<seed>  random seed of the error injection [default: 0]
+    --verbose=<verbose>  0 nothing, 1 requests [default: 0]
+"""
+import os
+import json
+import time
+import random
+import threading
+from collections import Counter
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import wd_utils
+import sparql_cache
+
+# query name -> (variables, basename of the wd_cache JSON file)
+QUERY_NAME_TO_RESPONSE_INFO = {
+    'subclass_of' : (['subclass1', 'subclass2'], 'subclass_of.json'),
+    'instance_of' : (['type_id', 'incident'], 'instance_of.json'),
+    'inc_to_props' : (['incident', 'property'], 'inc_to_props.json'),
+    'inc_to_labels' : (['incident', 'label', 'lang'], 'inc_to_labels.json'),
+    'id_props' : (['prop'], 'id_props.json'),
+    'prop_to_labels' : (['prop', 'label'], 'prop_to_labels.json'),
+    'event_type_to_labels' : (['event_type', 'label'], 'event_type_to_labels.json'),
+}
+
+
+def get_binding(value):
+    if value.startswith('http://') or value.startswith('https://'):
+        return {'type' : 'uri', 'value' : value}
+    return {'type' : 'literal', 'value' : value}
+
+
+def match_query(query):
+    """
+    determine which query of wd_utils.QUERIES a query is, including the items of the VALUES clause
+
+    :param str query: a SPARQL query
+
+    :rtype: tuple
+    :return: (query name, set of full uris in the VALUES clause (None if the query is not batched)),
+    (None, None) if the query is not part of wd_utils.QUERIES
+    """
+    query = query.strip()
+    for query_name, template in wd_utils.QUERIES.items():
+        template = template.strip()
+        if '%s' not in template:
+            if query.startswith(template):
+                return query_name, None
+            continue
+
+        prefix = template.split('%s')[0]
+        if query.startswith(prefix):
+            end = query.index('}', len(prefix))
+            items = {wd_utils.from_short_uri_to_full_uri(item)
+                     for item in query[len(prefix):end].split()}
+            return query_name, items
+
+    return None, None
+
+
+class SyntheticResponder:
+    """
+    answer the queries of wd_utils.QUERIES using wd_cache-style JSON files
+
+    :param str wd_cache_folder: folder with the JSON files (see QUERY_NAME_TO_RESPONSE_INFO),
+    missing files result in empty responses
+    """
+    def __init__(self, wd_cache_folder):
+        self.wd_cache_folder = wd_cache_folder
+        self.query_name_to_rows = {}
+
+        for query_name, (variables, basename) in QUERY_NAME_TO_RESPONSE_INFO.items():
+            path = os.path.join(wd_cache_folder, basename)
+            rows = []
+            if os.path.exists(path):
+                with open(path) as infile:
+                    for relation in json.load(infile):
+                        if isinstance(relation, str):
+                            rows.append([relation])
+                        elif query_name == 'inc_to_labels':
+                            incident, (lang, label) = relation
+                            rows.append([incident, label, lang])
+                        else:
+                            rows.append(list(relation))
+            self.query_name_to_rows[query_name] = rows
+
+    def respond(self, query):
+        """
+        :rtype: dict
+        :return: SPARQL JSON results, None if the query is not part of wd_utils.QUERIES
+        """
+        query_name, items = match_query(query)
+        if query_name is None:
+            return None
+
+        variables, _ = QUERY_NAME_TO_RESPONSE_INFO[query_name]
+        bindings = []
+        for row in self.query_name_to_rows[query_name]:
+            if items is not None and row[0] not in items:
+                continue
+            bindings.append({variable : get_binding(value)
+                             for variable, value in zip(variables, row)})
+
+        return {'head' : {'vars' : variables},
+                'results' : {'bindings' : bindings}}
+
+
+class StubSPARQLServer(ThreadingHTTPServer):
+    """
+    :param tuple server_address: (host, port), port 0 selects a free port
+    :param sparql_cache.SPARQLCache cache: recorded responses (only read)
+    :param SyntheticResponder synthetic_responder: used for queries that are not in the cache
+    :param float latency: number of seconds added to each response
+    :param float error_rate: probability that a request fails with HTTP status 500
+    :param int seed: random seed of the error injection
+    """
+    daemon_threads = True
+
+    def __init__(self,
+                 server_address,
+                 cache=None,
+                 synthetic_responder=None,
+                 latency=0.0,
+                 error_rate=0.0,
+                 seed=0,
+                 verbose=0):
+        super().__init__(server_address, StubSPARQLHandler)
+        self.cache = cache
+        self.synthetic_responder = synthetic_responder
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.verbose = verbose
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/sparql'
+
+    def get_response(self, query):
+        """
+        :rtype: tuple
+        :return: (HTTP status, response)
+        """
+        with self.lock:
+            self.stats['requests'] += 1
+            inject_error = self.rng.random() < self.error_rate
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if inject_error:
+            with self.lock:
+                self.stats['injected_errors'] += 1
+            return 500, None
+
+        response = None
+        if self.cache is not None:
+            response = self.cache.get(query)
+        if response is None and self.synthetic_responder is not None:
+            response = self.synthetic_responder.respond(query)
+
+        with self.lock:
+            self.stats['hits' if response is not None else 'misses'] += 1
+
+        if response is None:
+            return 404, None
+        return 200, response
+
+
+class StubSPARQLHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == '/stats':
+            with self.server.lock:
+                self.send_json(200, dict(self.server.stats))
+            return
+
+        query = parse_qs(parsed.query).get('query', [None])[0]
+        self.answer(query)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8')
+
+        if self.headers.get('Content-Type', '').startswith('application/sparql-query'):
+            query = body
+        else:
+            query = parse_qs(body).get('query', [None])[0]
+        self.answer(query)
+
+    def answer(self, query):
+        if query is None:
+            self.send_error(400, 'missing query parameter')
+            return
+
+        status, response = self.server.get_response(query)
+        if status == 200:
+            self.send_json(200, response, content_type='application/sparql-results+json')
+        elif status == 404:
+            self.send_error(404, f'no recorded or synthetic response for query {sparql_cache.get_query_hash(query)}')
+        else:
+            self.send_error(status, 'injected error')
+
+    def send_json(self, status, content, content_type='application/json'):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose >= 1:
+            super().log_message(format, *args)
+
+
+def start_stub_server(host='127.0.0.1',
+                      port=0,
+                      cache_folder=None,
+                      wd_cache_folder=None,
+                      latency=0.0,
+                      error_rate=0.0,
+                      seed=0,
+                      verbose=0):
+    """
+    start a StubSPARQLServer in a background thread
+
+    :param str cache_folder: folder of a SPARQLCache with recorded responses
+    :param str wd_cache_folder: folder with wd_cache JSON files used for synthetic responses
+
+    :rtype: StubSPARQLServer
+    :return: the running server, use server.url as endpoint and server.shutdown() to stop it
+    """
+    assert any([cache_folder, wd_cache_folder]), 'please provide cache_folder and/or wd_cache_folder'
+
+    cache = None
+    if cache_folder is not None:
+        cache = sparql_cache.SPARQLCache(cache_folder, mode='replay')
+
+    synthetic_responder = None
+    if wd_cache_folder is not None:
+        synthetic_responder = SyntheticResponder(wd_cache_folder)
+
+    server = StubSPARQLServer((host, port),
+                              cache=cache,
+                              synthetic_responder=synthetic_responder,
+                              latency=latency,
+                              error_rate=error_rate,
+                              seed=seed,
+                              verbose=verbose)
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    if verbose >= 1:
+        print(f'stub SPARQL server running at {server.url}')
+
+    return server
+
+
+if __name__ == '__main__':
+    from docopt import docopt
+
+    arguments = docopt(__doc__)
+    print()
+    print('PROVIDED ARGUMENTS')
+    print(arguments)
+    print()
+
+    server = start_stub_server(port=int(arguments['--port']),
+                               cache_folder=arguments['--cache_folder'],
+                               wd_cache_folder=arguments['--wd_cache_folder'],
+                               latency=float(arguments['--latency']),
+                               error_rate=float(arguments['--error_rate']),
+                               seed=int(arguments['--seed']),
+                               verbose=max(int(arguments['--verbose']), 1))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,9 +1,13 @@
-import pandas
+import os
+import json
 import pickle
 from glob import glob
 import random
 import math
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+STATS_SUFFIX = '.stats.json' # see get_stats_path
 
 
 
@@ -12,21 +16,86 @@ def chunks(lst, n):
     for i in range(0, len(lst), n):
         yield lst[i:i + n]
 
+def get_stats_path(bl_coll_path):
+    """
+    :param str bl_coll_path: path to a pickled BLCollection, e.g., output/resource=Wikidata+...+threshold=0.p
+
+    :rtype: str
+    :return: path to the stats summary of the BLCollection, e.g., output/resource=Wikidata+...+threshold=0.stats.json
+    """
+    return f'{os.path.splitext(bl_coll_path)[0]}{STATS_SUFFIX}'
+
+
+def write_stats(stats_path, summary):
+    """
+    :param str stats_path: see get_stats_path
+    :param dict summary: see bl_classes.BLCollection.get_summary
+    """
+    tmp_path = f'{stats_path}.tmp'
+    with open(tmp_path, 'w') as outfile:
+        json.dump(summary, outfile, indent=4)
+    os.replace(tmp_path, stats_path)
+
+
+def load_stats(stats_path):
+    """
+    :rtype: dict
+    :return: see bl_classes.BLCollection.get_summary (the (minimum, mean, maximum) stats are tuples again)
+    """
+    with open(stats_path) as infile:
+        summary = json.load(infile)
+
+    summary['stats'] = {key : tuple(value) if type(value) == list else value
+                        for key, value in summary['stats'].items()}
+    return summary
+
+
+def load_stats_from_pickle(bl_coll_path):
+    """
+    load a pickled BLCollection and write its stats summary (for pickles written before the summaries existed)
+
+    :rtype: dict
+    :return: see bl_classes.BLCollection.get_summary (without resource)
+    """
+    with open(bl_coll_path, 'rb') as infile:
+        bl_coll = pickle.load(infile)
+
+    summary = {
+        'resource' : None,
+        'root_node' : bl_coll.root_node,
+        'root_zero' : bl_coll.root_zero,
+        'weight_property' : bl_coll.weight_property,
+        'subsumer_threshold' : bl_coll.subsumer_threshold,
+        'stats' : bl_coll.get_stats()
+    }
+
+    write_stats(get_stats_path(bl_coll_path), summary)
+
+    return summary
+
+
 def get_overview_table(input_folder,
                        suffix="*.p",
                        only_average=True,
                        excel_path=None,
-                       new_headers=None):
+                       latex_path=None,
+                       new_headers=None,
+                       num_workers=None):
     """
 
     :param str input_folder: folder where BLCollection objects are stored
     :param str suffix: suffix to query, e.g., *p
     :param bool only_average: if True, only show average, else also minimum and maximum
     :param str excel_path: if provided, write table to excel file
+    :param str latex_path: if provided, write table to LaTeX file
+    :param int num_workers: number of processes used to load pickles without (up-to-date) stats summary
+    (see get_stats_path), the number of CPUs if None
 
     :rtype:
     :return: pandas Dataframe (one row for each table)
     """
+    import pandas
+
     list_of_lists = []
 
     attrs = ['# of nodes with bl',
@@ -39,14 +108,26 @@ def get_overview_table(input_folder,
 
     headers = ['TH'] + attrs
 
+    summaries = []
+    to_load = []
     for bl_coll_path in glob(f'{input_folder}/{suffix}'):
+        stats_path = get_stats_path(bl_coll_path)
+        if os.path.exists(stats_path) and os.path.getmtime(stats_path) >= os.path.getmtime(bl_coll_path):
+            summaries.append(load_stats(stats_path))
+        else:
+            to_load.append(bl_coll_path)
+
+    if len(to_load) == 1:
+        summaries.append(load_stats_from_pickle(to_load[0]))
+    elif to_load:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            summaries.extend(executor.map(load_stats_from_pickle, to_load))
 
-        bl_coll = pickle.load(open(bl_coll_path, 'rb'))
+    for summary in summaries:
 
-        one_row = [bl_coll.subsumer_threshold]
+        one_row = [summary['subsumer_threshold']]
 
-        bl_coll.stats = bl_coll.get_stats()
-        stats = bl_coll.stats
+        stats = summary['stats']
 
         for attr in attrs:
 
@@ -73,6 +154,9 @@ def get_overview_table(input_folder,
     if excel_path is not None:
         df.to_excel(excel_path, index=False)
 
+    if latex_path is not None:
+        df.to_latex(latex_path, index=False)
+
     return df.sort_values('TH')
 
 
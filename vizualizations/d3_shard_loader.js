@@ -0,0 +1,75 @@
+// Loads the JSON shards written by EventTypeCollection.write_d3_json_shards (create_d3_tree with export_format='json').
+//
+// index.json: {"root": ROOT, "shards": [{"id": .., "path": .., "num_nodes": .., "num_links": ..}]}
+// SHARD.json: {"nodes": [{"id": .., "label": ..}], "links": [[source, target]], "hover": {"ID (LABEL)": hover text}}
+//
+// The shards are converted to the format of the inline export, i.e., links as {source: .., target: ..}
+// and the hover texts in dict, so that the tree code of the template can be reused.
+//
+// Usage in the template (create_d3_tree copies this file to the data folder, and replaces
+// INSERT_DATA_FOLDER_HERE by the relative path to the data folder and INSERT_DATA_INDEX_HERE by the
+// relative path to its index.json):
+//
+//   <script src="INSERT_DATA_FOLDER_HERE/d3_shard_loader.js"></script>
+//   <script>
+//     let dict = {};
+//     let loader = new D3ShardLoader("INSERT_DATA_INDEX_HERE", dict);
+//     loader.loadIndex()
+//       .then(index => loader.loadShard(index.root))   // the root and its children
+//       .then(links => drawTree(links));                // drawTree: the existing tree code of the template
+//     // when a child of the root is expanded:
+//     // loader.loadShard(childId).then(links => addToTree(links));
+//   </script>
+
+class D3ShardLoader {
+    constructor(indexPath, hoverDict) {
+        this.indexPath = indexPath;
+        this.baseUrl = indexPath.substring(0, indexPath.lastIndexOf('/') + 1);
+        this.hoverDict = hoverDict;
+        this.index = null;
+        this.shardIdToPath = {};
+        this.shardIdToLinks = {};   // shards are fetched at most once
+    }
+
+    loadIndex() {
+        if (this.index !== null) {
+            return Promise.resolve(this.index);
+        }
+        return fetch(this.indexPath)
+            .then(response => response.json())
+            .then(index => {
+                this.index = index;
+                index.shards.forEach(shard => { this.shardIdToPath[shard.id] = shard.path; });
+                return index;
+            });
+    }
+
+    hasShard(shardId) {
+        return shardId in this.shardIdToPath;
+    }
+
+    // resolves to the links of the shard ([] if the node has no shard of its own)
+    loadShard(shardId) {
+        if (shardId in this.shardIdToLinks) {
+            return Promise.resolve(this.shardIdToLinks[shardId]);
+        }
+        if (!this.hasShard(shardId)) {
+            return Promise.resolve([]);
+        }
+        return fetch(this.baseUrl + this.shardIdToPath[shardId])
+            .then(response => response.json())
+            .then(data => {
+                Object.assign(this.hoverDict, data.hover);
+                let links = data.links.map(link => ({source: link[0], target: link[1]}));
+                this.shardIdToLinks[shardId] = links;
+                return links;
+            });
+    }
+
+    // all shards, e.g., to show the complete tree
+    loadAllShards() {
+        return this.loadIndex()
+            .then(index => Promise.all(index.shards.map(shard => this.loadShard(shard.id))))
+            .then(shardLinks => [].concat(...shardLinks));
+    }
+}
@@ -5,17 +5,18 @@ from collections import defaultdict
 import os
 import shutil
 import random
-import pandas
 import operator
 
-import pandas as pd
 from lxml import etree
 import networkx as nx
-import graphviz as gv
-from rdflib import Graph
-from rdflib import URIRef, Literal, XSD
-from rdflib.namespace import Namespace
-from rdflib.namespace import RDF, RDFS
+# numpy, pandas (statistics), graphviz (vizualize), and rdflib (serialize) are imported by the functions using them
+
+import naf_store
+import graph_utils
+import label_store
+import profiling
+
+SHARD_LOADER_BASENAME = 'd3_shard_loader.js' # in the folder of the d3 template, see create_d3_tree
 
 def get_leaf_nodes(g,
                    verbose=0):
@@ -50,6 +51,8 @@ def show_top_n(a_dict,
                label_attr_name=None,
                n=10,
                add_rel_freq=False):
+    import pandas
+
     headers = ['Item', 'Value']
 
     if add_rel_freq:
@@ -154,6 +157,8 @@ def get_sent_df(ref_text_objs, unstructured_folder):
     :param wd_classes.ReferenceText ref_text_objs:
     :return:
     """
+    import pandas as pd
+
     list_of_lists = []
     headers = ['ReferenceText URI',
                '# of gold sentences',
@@ -184,6 +189,8 @@ def get_event_type_df(event_type_objs):
     :param wd_classes.EventType event_type_objs:
     :return:
     """
+    import pandas as pd
+
     headers = ['Event type', '# of incidents']
     lists_of_lists = []
 
@@ -208,12 +215,41 @@ def get_event_type_df(event_type_objs):
     return df
 
 
+def get_reference_text_language_counts(incident_objs, languages):
+    """
+    count the ReferenceTexts per Incident and language in one pass over the ReferenceTexts
+
+    :param list incident_objs: instances of wd_classes.Incident
+    :param list languages: the languages, e.g., ['en', 'nl', 'it']
+
+    :rtype: numpy.ndarray
+    :return: int matrix of shape (number of incidents, number of languages)
+    """
+    import numpy as np
+
+    language_to_index = {}
+    for language in languages:
+        language_to_index.setdefault(language, len(language_to_index))
+    num_languages = len(language_to_index)
+
+    cells = [inc_index * num_languages + language_to_index[ref_text_obj.language]
+             for inc_index, inc_obj in enumerate(incident_objs)
+             for ref_text_obj in inc_obj.reference_texts.values()
+             if ref_text_obj.language in language_to_index]
+
+    counts = np.bincount(np.array(cells, dtype=np.int64), minlength=len(incident_objs) * num_languages)
+    counts = counts.reshape(len(incident_objs), num_languages)
+    return counts[:, [language_to_index[language] for language in languages]]
+
+
 def get_incidents_df(incident_objs, languages):
     """
 
     :param wd_classes.Incident incident_objs:
     :return:
     """
+    import pandas as pd
+
     list_of_lists = []
     headers = ['Incident',
                '# of sem:hasPlace',
@@ -227,7 +263,10 @@ def get_incidents_df(incident_objs, languages):
 
     sem_rels = ['sem:hasPlace',  'sem:hasTimeStamp', 'sem:hasActor']
 
-    for inc_obj in incident_objs:
+    incident_objs = list(incident_objs)
+    ref_text_language_counts = get_reference_text_language_counts(incident_objs, languages)
+
+    for inc_obj, language_counts in zip(incident_objs, ref_text_language_counts.tolist()):
 
         one_row = [
             inc_obj.full_uri,
@@ -239,12 +278,7 @@ def get_incidents_df(incident_objs, languages):
 
         one_row.append(len(inc_obj.reference_texts))
 
-        for language in languages:
-            num = 0
-            for ref_text_obj in inc_obj.reference_texts.values():
-                if ref_text_obj.language == language:
-                    num += 1
-            one_row.append(num)
+        one_row.extend(language_counts)
 
         list_of_lists.append(one_row)
 
@@ -259,6 +293,8 @@ def get_ref_text_df(ref_text_objs, unstructured_folder):
     :param wd_classes.ReferenceText ref_text_objs:
     :return:
     """
+    import pandas as pd
+
     list_of_lists = []
     headers = ['ReferenceText',
                '# of tokens',
@@ -322,6 +358,8 @@ class EventTypeCollection:
     :param int min_leaf_incident_freq: the minimum number of incident that a leaf node in the directed has to have
     to be accepted in the graph. If this is set to 1 or higher, all leaf nodes will be removed until there are
     only leaf nodes with the minimum number of allowed incidents
+    :param profiling.PhaseProfiler profiler: instrumentation of the loading phases (see profiling.py).
+    The wall time and item counts of each phase are stored in self.phase_report
     """
     def __init__(self,
                  path_subclass_of_rels,
@@ -334,40 +372,76 @@ class EventTypeCollection:
                  needed_properties=set(),
                  properties_to_ignore=set(),
                  min_leaf_incident_freq=0,
+                 profiler=None,
                  verbose=0):
         self.verbose = verbose
 
-        self.prop_id_to_prop_obj = self.get_property_to_property_obj(path_prop_to_labels=path_prop_to_labels, properties_to_ignore=properties_to_ignore)
-        self.inc_id_to_inc_obj = self.get_inc_to_inc_obj(path_inc_to_labels=path_inc_to_labels,
-                                                         path_inc_to_props=path_inc_to_props,
-                                                         needed_properties=needed_properties)
-        self.event_type_id_to_event_type_obj = self.get_event_type_to_eventtype_obj(path_event_type_to_labels=path_event_type_to_labels)
-        self.update_event_types_with_incidents(path_instance_of_rels=path_instance_of_rels)
+        if profiler is None:
+            profiler = profiling.PhaseProfiler(verbose=verbose)
+        profiler.start('EventTypeCollection')
+
+        # the labels of all Properties, Incidents, and EventTypes (see label_store.py)
+        self.label_store = label_store.LabelStore()
+
+        with profiler.phase('get_property_to_property_obj') as record:
+            self.prop_id_to_prop_obj = self.get_property_to_property_obj(path_prop_to_labels=path_prop_to_labels, properties_to_ignore=properties_to_ignore)
+            record.count(properties=len(self.prop_id_to_prop_obj))
+
+        with profiler.phase('get_inc_to_inc_obj') as record:
+            self.inc_id_to_inc_obj = self.get_inc_to_inc_obj(path_inc_to_labels=path_inc_to_labels,
+                                                             path_inc_to_props=path_inc_to_props,
+                                                             needed_properties=needed_properties)
+            record.count(incidents=len(self.inc_id_to_inc_obj))
 
-        self.g, \
-        self.leaf_nodes = self.create_directed_graph(path_subclass_of_rels,
-                                                     root_node,
-                                                     min_leaf_incident_freq)
+        with profiler.phase('get_event_type_to_eventtype_obj') as record:
+            self.event_type_id_to_event_type_obj = self.get_event_type_to_eventtype_obj(path_event_type_to_labels=path_event_type_to_labels)
+            record.count(event_types=len(self.event_type_id_to_event_type_obj))
+
+        with profiler.phase('update_event_types_with_incidents'):
+            self.update_event_types_with_incidents(path_instance_of_rels=path_instance_of_rels)
+
+        with profiler.phase('create_directed_graph') as record:
+            self.g, \
+            self.leaf_nodes = self.create_directed_graph(path_subclass_of_rels,
+                                                         root_node,
+                                                         min_leaf_incident_freq)
+            record.count(nodes=self.g.number_of_nodes(),
+                         edges=self.g.number_of_edges(),
+                         leaf_nodes=len(self.leaf_nodes))
 
         # restrict to only event subgraph
-        self.event_type_id_to_event_type_obj = {event_uri : event_type_obj
-                                                for event_uri, event_type_obj in self.event_type_id_to_event_type_obj.items()
-                                                if event_type_obj.title_id in self.g}
+        with profiler.phase('restrict_to_graph') as record:
+            self.event_type_id_to_event_type_obj = {event_uri : event_type_obj
+                                                    for event_uri, event_type_obj in self.event_type_id_to_event_type_obj.items()
+                                                    if event_type_obj.title_id in self.g}
+            record.count(event_types=len(self.event_type_id_to_event_type_obj))
 
         # create inc_uri to event types
-        self.inc_uri_to_event_types = self.get_inc_uri_to_event_types()
+        with profiler.phase('get_inc_uri_to_event_types') as record:
+            self.inc_uri_to_event_types = self.get_inc_uri_to_event_types()
+            record.count(incidents=len(self.inc_uri_to_event_types))
+
+        with profiler.phase('compute_prop_freq') as record:
+            self.prop_to_freq, \
+            self.evtype_and_prop_to_freq = self.compute_prop_freq()
+            record.count(properties=len(self.prop_to_freq),
+                         event_type_property_pairs=len(self.evtype_and_prop_to_freq))
 
-        self.prop_to_freq, \
-        self.evtype_and_prop_to_freq = self.compute_prop_freq()
-        self.update_cue_validities()
+        with profiler.phase('update_cue_validities'):
+            self.update_cue_validities()
 
-        for event_type_obj in self.event_type_id_to_event_type_obj.values():
-            event_type_obj.set_children(self.g)
-            event_type_obj.set_parents(self.g)
-            event_type_obj.set_subsumers(self.g)
-            event_type_obj.set_parent_to_siblings(self.g)
+        with profiler.phase('set_relations') as record:
+            for event_type_obj in self.event_type_id_to_event_type_obj.values():
+                event_type_obj.set_children(self.g)
+                event_type_obj.set_parents(self.g)
+                event_type_obj.set_subsumers(self.g)
+                event_type_obj.set_parent_to_siblings(self.g)
+            record.count(event_types=len(self.event_type_id_to_event_type_obj))
 
-        self.stats = self.compute_stats(root_node, min_leaf_incident_freq, needed_properties)
+        with profiler.phase('compute_stats'):
+            self.stats = self.compute_stats(root_node, min_leaf_incident_freq, needed_properties)
+
+        self.phase_report = profiler.finish()
 
 
     def __str__(self):
@@ -378,12 +452,68 @@ class EventTypeCollection:
 
         return '\n'.join(info)
 
+    def __getstate__(self):
+        # the subsumer mappings are not pickled, they are cheap to rebuild (see get_subsumer_mapping)
+        state = self.__dict__.copy()
+        state.pop('_subsumer_cache', None)
+        state.pop('_subsumer_cache_graph_key', None)
+        return state
+
+    @property
+    def closure_index(self):
+        """
+        cached descendant/ancestor closures of self.g (see graph_utils.ClosureIndex)
+        """
+        if getattr(self, '_closure_index', None) is None:
+            self._closure_index = graph_utils.ClosureIndex(self.g)
+        return self._closure_index
+
+    def get_descendants(self, event_full_uri):
+        """
+        :param str event_full_uri: e.g., http://www.wikidata.org/entity/Q40231
+
+        :rtype: frozenset
+        :return: title ids of all subsumers of the event type
+        """
+        ev_type_obj = self.event_type_id_to_event_type_obj[event_full_uri]
+        return self.closure_index.descendants(ev_type_obj.title_id)
+
+    def get_ancestors(self, event_full_uri):
+        """
+        :param str event_full_uri: e.g., http://www.wikidata.org/entity/Q40231
+
+        :rtype: frozenset
+        :return: title ids of all event types that subsume the event type
+        """
+        ev_type_obj = self.event_type_id_to_event_type_obj[event_full_uri]
+        return self.closure_index.ancestors(ev_type_obj.title_id)
+
+    def get_subgraph(self, event_full_uri, exclude_leaf_nodes=False):
+        """
+        obtain the subgraph of an event type and all its subsumers.
+        The result is a read-only view on self.g, which is cached.
+
+        :param str event_full_uri: e.g., http://www.wikidata.org/entity/Q40231
+        :param bool exclude_leaf_nodes: if True, self.leaf_nodes are not part of the subgraph
+        """
+        title_id = self.event_type_id_to_event_type_obj[event_full_uri].title_id
+
+        if not exclude_leaf_nodes:
+            return self.closure_index.subgraph(title_id)
+
+        def compute():
+            nodes = (self.closure_index.descendants(title_id) | {title_id}) - self.leaf_nodes
+            return self.g.subgraph(nodes)
+
+        return self.closure_index.get_or_compute(('subgraph_without_leaf_nodes', title_id),
+                                                 compute)
 
     def incorporate_incident_collection(self,
                                         path_to_mwep_repo,
                                         path_to_incident_coll_obj,
                                         path_mwep_wiki_output_folder,
                                         path_wd_wiki_output_folder,
+                                        naf_store_folder=None,
                                         verbose=0):
         """
         Incorporate output from MWEP (https://github.com/cltl/multilingual-wiki-event-pipeline)
@@ -397,6 +527,9 @@ class EventTypeCollection:
         very likely called 'wiki_output'
         :param str path_wd_wiki_output_folder: folder where you want to store the NAF files
         that have been incorporated into EventTypeCollection
+        :param str naf_store_folder: if provided, the NAF files are staged into the
+        content-addressed store (see naf_store.py) instead of being copied,
+        i.e., data releases share unchanged documents
         """
         # load incident collection object
         sys.path.append(path_to_mwep_repo) # this is not elegant but it solves the problem
@@ -421,9 +554,21 @@ class EventTypeCollection:
                 print()
                 print(f'created folder {path_wd_wiki_output_folder}')
 
+        store = None
+        if naf_store_folder is not None:
+            store = naf_store.NAFStore(naf_store_folder, verbose=verbose)
+            release_index = store.get_release_index(path_wd_wiki_output_folder)
+        elif naf_store.remove_release_index(path_wd_wiki_output_folder):
+            # a title index of an earlier run with a NAF store would resolve the NAF files to the shared blobs
+            if verbose >= 1:
+                print(f'removed the title index of {path_wd_wiki_output_folder}, the NAF files are written without a NAF store')
+
+        mwep_naf_index = naf_store.get_naf_index(path_mwep_wiki_output_folder)
+
         # update incidents
         incs_found_in_event_type_coll = set()
         ref_texts_added = set()
+        ref_texts_changed = set()
         for mwep_inc_obj in inc_coll_obj.incidents:
             full_inc_uri = f'http://www.wikidata.org/entity/{mwep_inc_obj.wdt_id}'
 
@@ -455,19 +600,34 @@ class EventTypeCollection:
                     os.mkdir(wiki_output_lang_folder)
 
                 mwep_naf_path = new_ref_text_obj.get_naf_path_of_reference_text(path_mwep_wiki_output_folder)
-                wd_naf_path = new_ref_text_obj.get_naf_path_of_reference_text(path_wd_wiki_output_folder)
 
-                if os.path.exists(mwep_naf_path):
-                    shutil.copy(mwep_naf_path, wd_naf_path)
+                if mwep_naf_index.exists(new_ref_text_obj.language, new_ref_text_obj.title):
+                    if store is not None:
+                        changed = store.stage(src_path=mwep_naf_path,
+                                              release_index=release_index,
+                                              unstructured_folder=path_wd_wiki_output_folder,
+                                              language=new_ref_text_obj.language,
+                                              title=new_ref_text_obj.title)
+                        if changed:
+                            ref_texts_changed.add(new_ref_text_obj.title_id)
+                    else:
+                        wd_naf_path = new_ref_text_obj.get_layout_naf_path_of_reference_text(path_wd_wiki_output_folder)
+                        naf_store.write_naf_file(mwep_naf_path, wd_naf_path)
                     inc_obj.reference_texts[new_ref_text_obj.title_id] = new_ref_text_obj
                     ref_texts_added.add(new_ref_text_obj.title_id)
 
+        if store is not None:
+            naf_store.write_release_index(path_wd_wiki_output_folder, release_index)
+        naf_store.invalidate_naf_index(path_wd_wiki_output_folder)
+
         if verbose >= 1:
             print()
             print(f'found {len(incs_found_in_event_type_coll)} matching Incidents from the total {len(inc_coll_obj.incidents)} from the IncidentCollection in the EventTypeCollection')
             print('When an Incident was not found in the EventTypeCollection, this is probably due to the requirements to be allowed into the EventTypeCollection.')
             print()
             print(f'added {len(ref_texts_added)} ReferenceTexts')
+            if store is not None:
+                print(f'{len(ref_texts_changed)} of them were new or changed in {store}')
 
 
     def get_paths_of_reftexts_of_one_event_subgraph(self,
@@ -486,23 +646,23 @@ class EventTypeCollection:
         very likely called 'wiki_output' with probably three folders 'en', 'nl', and 'it'
         :return: set of absolute XML paths
         """
-        main_ev_obj = self.event_type_id_to_event_type_obj[event_full_uri]
-
         naf_paths = set()
 
         all_relevant_ev_types = set([event_full_uri])
         all_relevant_ev_types.update([f'http://www.wikidata.org/entity/{subsumer}'
-                                      for subsumer in main_ev_obj.subsumers])
+                                      for subsumer in self.get_descendants(event_full_uri)])
 
         if verbose >= 1:
             print(f'found {len(all_relevant_ev_types)} event type + subsumers')
 
+        naf_index = naf_store.get_naf_index(wiki_output_folder)
+
         for relevant_ev_type in all_relevant_ev_types:
             ev_obj = self.event_type_id_to_event_type_obj[relevant_ev_type]
             for inc_obj in ev_obj.incidents:
                 for ref_text_obj in inc_obj.reference_texts.values():
-                    naf_path = ref_text_obj.get_naf_path_of_reference_text(wiki_output_folder)
-                    assert os.path.exists(naf_path), f'{naf_path} does not exist on disk. Please inspect.'
+                    naf_path = naf_index.get_path(ref_text_obj.language, ref_text_obj.title)
+                    assert naf_path is not None, f'{ref_text_obj.get_naf_path_of_reference_text(wiki_output_folder)} does not exist on disk. Please inspect.'
                     naf_paths.add(naf_path)
 
         if verbose >= 1:
@@ -510,6 +670,69 @@ class EventTypeCollection:
 
         return naf_paths
 
+    def get_paths_of_reftexts_of_event_subgraphs(self,
+                                                 event_full_uris,
+                                                 wiki_output_folder,
+                                                 num_workers=1,
+                                                 verbose=0):
+        """
+        batch version of get_paths_of_reftexts_of_one_event_subgraph:
+        the union of the subsumers of all event types is visited once
+        and each Incident is visited once, also when the subgraphs overlap
+
+        :param iterable event_full_uris: e.g., {http://www.wikidata.org/entity/Q2540467, ..}
+        :param str wiki_output_folder: the folder with the NAF output from MWEP,
+        very likely called 'wiki_output' with probably three folders 'en', 'nl', and 'it'
+        :param int num_workers: if higher than 1, the language folders are scanned concurrently
+        to check whether the NAF files exist (see naf_store.NAFIndex)
+
+        :rtype: dict
+        :return: mapping event_full_uri -> set of absolute XML paths
+        """
+        event_to_relevant_title_ids = {}
+        for event_full_uri in event_full_uris:
+            ev_type_obj = self.event_type_id_to_event_type_obj[event_full_uri]
+            relevant_title_ids = set(self.get_descendants(event_full_uri))
+            relevant_title_ids.add(ev_type_obj.title_id)
+            event_to_relevant_title_ids[event_full_uri] = relevant_title_ids
+
+        all_relevant_title_ids = set()
+        for relevant_title_ids in event_to_relevant_title_ids.values():
+            all_relevant_title_ids.update(relevant_title_ids)
+
+        if verbose >= 1:
+            print(f'found {len(all_relevant_title_ids)} unique event types + subsumers for {len(event_to_relevant_title_ids)} event types')
+
+        naf_index = naf_store.get_naf_index(wiki_output_folder, num_workers=num_workers)
+
+        inc_uri_to_naf_paths = {}
+        title_id_to_naf_paths = {}
+        for title_id in all_relevant_title_ids:
+            ev_obj = self.event_type_id_to_event_type_obj[f'http://www.wikidata.org/entity/{title_id}']
+            ev_naf_paths = set()
+            for inc_obj in ev_obj.incidents:
+                if inc_obj.full_uri not in inc_uri_to_naf_paths:
+                    inc_naf_paths = set()
+                    for ref_text_obj in inc_obj.reference_texts.values():
+                        naf_path = naf_index.get_path(ref_text_obj.language, ref_text_obj.title)
+                        assert naf_path is not None, f'{ref_text_obj.get_naf_path_of_reference_text(wiki_output_folder)} does not exist on disk. Please inspect.'
+                        inc_naf_paths.add(naf_path)
+                    inc_uri_to_naf_paths[inc_obj.full_uri] = inc_naf_paths
+                ev_naf_paths.update(inc_uri_to_naf_paths[inc_obj.full_uri])
+            title_id_to_naf_paths[title_id] = ev_naf_paths
+
+        event_to_naf_paths = {}
+        for event_full_uri, relevant_title_ids in event_to_relevant_title_ids.items():
+            naf_paths = set()
+            for title_id in relevant_title_ids:
+                naf_paths.update(title_id_to_naf_paths[title_id])
+            event_to_naf_paths[event_full_uri] = naf_paths
+
+            if verbose >= 1:
+                print(f'found {len(naf_paths)} ReferenceTexts of event type {event_full_uri}')
+
+        return event_to_naf_paths
+
     def get_inc_uri_to_event_types(self):
         """
         create a mapping from Incident full uri ->
@@ -557,7 +780,8 @@ class EventTypeCollection:
             prop_obj = Property(title_labels={'en' : label},
                                 title_id=title_id,
                                 full_uri=prop_uri,
-                                prefix_uri=f'wdt:{title_id}')
+                                prefix_uri=f'wdt:{title_id}',
+                                label_store=self.label_store)
 
             prop_id_to_prop_obj[prop_uri] = prop_obj
 
@@ -612,7 +836,8 @@ class EventTypeCollection:
                                title_id=title_id,
                                full_uri=inc_uri,
                                prefix_uri=f'wd:{title_id}',
-                               properties=prop_objs)
+                               properties=prop_objs,
+                               label_store=self.label_store)
 
             inc_uri_to_inc_obj[inc_uri] = inc_obj
 
@@ -647,7 +872,8 @@ class EventTypeCollection:
             event_type_obj = EventType(title_labels={'en' : label},
                                        title_id=title_id,
                                        full_uri=event_type_uri,
-                                       prefix_uri=f'wd:{title_id}')
+                                       prefix_uri=f'wd:{title_id}',
+                                       label_store=self.label_store)
 
             event_type_uri_to_event_type_obj[event_type_uri] = event_type_obj
 
@@ -878,26 +1104,27 @@ class EventTypeCollection:
         e.g., ('http://www.wikidata.org/entity/Q40231', 'http://www.wikidata.org/entity/Q1656682')
 
         """
+        import graphviz as gv
+
         assert [root, from_to].count(None) == 1, f'you can only provide root OR from_to'
 
         if output_path:
             assert output_path.endswith('.svg'), f'output path has to end with .svg'
 
         if root is not None:
-            root_ev_type_obj = self.event_type_id_to_event_type_obj[root]
-            the_descendants = nx.descendants(self.g, root_ev_type_obj.title_id)
-            the_descendants.add(root_ev_type_obj.title_id)
-            sub_g = self.g.subgraph(the_descendants).copy()
+            sub_g = self.get_subgraph(root)
 
             nodes = list(sub_g.nodes())
             edges = list(sub_g.edges())
 
         g = gv.Digraph()
 
-        for node in nodes:
-            ev_type_uri = node.replace('wd:', 'http://www.wikidata.org/entity/')
-            ev_type_obj = self.event_type_id_to_event_type_obj[ev_type_uri]
-            hover_text = self.create_hover_text(ev_type_obj)
+        ev_type_objs = [self.event_type_id_to_event_type_obj[node.replace('wd:', 'http://www.wikidata.org/entity/')]
+                        for node in nodes]
+        title_id_to_hover_text = self.create_hover_texts(ev_type_objs)
+
+        for node, ev_type_obj in zip(nodes, ev_type_objs):
+            hover_text = title_id_to_hover_text[ev_type_obj.title_id]
             g.node(node.replace('wd:', ''),
                    tooltip=hover_text)
 
@@ -912,6 +1139,69 @@ class EventTypeCollection:
 
         return g
 
+    def clear_graph_caches(self):
+        """
+        discard the caches that depend on the structure of self.g
+        (the closure index and the subsumer mappings), e.g., after nodes or edges were added or removed
+        """
+        if getattr(self, '_closure_index', None) is not None:
+            self._closure_index.clear()
+        self._subsumer_cache = {}
+        self._subsumer_cache_graph_key = None
+
+    def get_subsumer_mapping(self, event_types, wd_prefix='http://www.wikidata.org/entity/'):
+        """
+        compute (or obtain from the cache) the mapping from each subsumer to the main event types it falls under.
+        The cache is keyed by the frozenset of event types and is discarded when self.g is replaced
+        or its number of nodes changes (please call clear_graph_caches after other changes to the graph).
+
+        :param iterable event_types: event types, e.g., {'Q47566', 'Q858439'}
+
+        :rtype: tuple
+        :return: (mapping from specific event type -> main event type for the event types under one main event type,
+        mapping from specific event type -> frozenset of main event types for the event types under several ones)
+        """
+        graph_key = (id(self.g), self.g.number_of_nodes()) # both are O(1), unlike the number of edges
+        if getattr(self, '_subsumer_cache_graph_key', None) != graph_key:
+            self._subsumer_cache = {}
+            self._subsumer_cache_graph_key = graph_key
+
+        key = (frozenset(event_types), wd_prefix)
+        if key not in self._subsumer_cache:
+            specific_to_main_event_types = defaultdict(set)
+            for event_type in key[0]:
+                ev_obj = self.event_type_id_to_event_type_obj.get(f'{wd_prefix}{event_type}', None)
+                if ev_obj is None:
+                    continue
+
+                specific_to_main_event_types[event_type].add(event_type)
+                for subsumer in ev_obj.subsumers:
+                    specific_to_main_event_types[subsumer].add(event_type)
+
+            specific_to_main_event_type = {}
+            conflicts = {}
+            for specific_event_type, main_event_types in specific_to_main_event_types.items():
+                if len(main_event_types) == 1:
+                    specific_to_main_event_type[specific_event_type] = next(iter(main_event_types))
+                else:
+                    conflicts[specific_event_type] = frozenset(main_event_types)
+
+            self._subsumer_cache[key] = (specific_to_main_event_type, conflicts)
+
+        return self._subsumer_cache[key]
+
+    def get_subsumer_conflicts(self, event_types, wd_prefix='http://www.wikidata.org/entity/'):
+        """
+        :param iterable event_types: event types, e.g., {'Q47566', 'Q858439'}
+
+        :rtype: dict
+        :return: mapping from event type -> sorted list of the main event types it falls under
+        (only for the event types that fall under more than one main event type)
+        """
+        _, conflicts = self.get_subsumer_mapping(event_types, wd_prefix=wd_prefix)
+        return {specific_event_type : sorted(main_event_types)
+                for specific_event_type, main_event_types in conflicts.items()}
+
     def get_subsumers_of_set_of_event_types(self,
                                             event_types,
                                             wd_prefix='http://www.wikidata.org/entity/',
@@ -925,41 +1215,49 @@ class EventTypeCollection:
         then a txt file will be written to disk.
         one line for each event type
 
-        :rtype: set
-        :return: set of event types
+        The mapping is cached per set of event types (see get_subsumer_mapping).
+        An event type that falls under several main event types is mapped to the one
+        that occurs last in event_types (as before), these conflicts are reported if verbose >= 1.
+
+        :rtype: dict
+        :return: mapping from specific event type -> main event type
         """
+        event_types = list(event_types)
+        cached_mapping, conflicts = self.get_subsumer_mapping(event_types, wd_prefix=wd_prefix)
+
+        # the resolution of the conflicts depends on the order of event_types, hence it is cached per order
+        resolved_key = ('resolved', tuple(event_types), wd_prefix)
+        if resolved_key not in self._subsumer_cache:
+            resolved_mapping = dict(cached_mapping)
+            main_event_type_to_position = {event_type : position
+                                           for position, event_type in enumerate(event_types)}
+            for specific_event_type, main_event_types in conflicts.items():
+                resolved_mapping[specific_event_type] = max(main_event_types,
+                                                            key=main_event_type_to_position.get)
+            self._subsumer_cache[resolved_key] = resolved_mapping
+
+        specific_to_main_event_type = dict(self._subsumer_cache[resolved_key])
+
         if verbose >= 2:
             print()
             print(f'detected {len(event_types)} event types')
-
-        all_event_types = set()
-        specific_to_main_event_type = {}
-
-        for event_type in event_types:
-            full_uri = f'{wd_prefix}{event_type}'
-            ev_obj = self.event_type_id_to_event_type_obj.get(full_uri, None)
-
-            if ev_obj is None:
-                if verbose >= 2:
+            for event_type in event_types:
+                if f'{wd_prefix}{event_type}' not in self.event_type_id_to_event_type_obj:
                     print(f'{event_type} not in Wikidata representation')
-                continue
-
-            all_event_types.add(event_type)
-            specific_to_main_event_type[event_type] = event_type
-            all_event_types.update(ev_obj.subsumers)
-
-            for subsumer in ev_obj.subsumers:
-                specific_to_main_event_type[subsumer] = event_type
 
-            if verbose >= 4:
-                print(f'{event_type}: {len(ev_obj.subsumers) + 1} subsumers')
+        if verbose >= 1 and conflicts:
+            print()
+            print(f'{len(conflicts)} event type(s) fall under more than one main event type, '
+                  f'each is mapped to the main event type that occurs last in event_types:')
+            for specific_event_type, main_event_types in sorted(conflicts.items())[:10]:
+                print(f'{specific_event_type}: {sorted(main_event_types)} -> {specific_to_main_event_type[specific_event_type]}')
 
         if verbose >= 2:
-            print(f'detected {len(all_event_types)} event types')
+            print(f'detected {len(specific_to_main_event_type)} event types')
 
         if output_path:
             with open(output_path, 'w') as outfile:
-                for event_type in all_event_types:
+                for event_type in set(specific_to_main_event_type):
                     outfile.write(f'{event_type}\n')
             if verbose >= 2:
                 print(f'written txt to {output_path}')
@@ -971,6 +1269,7 @@ class EventTypeCollection:
                        output_path,
                        template_path='vizualizations/template_d3.html',
                        exclude_leaf_nodes=False,
+                       export_format='inline',
                        verbose=0):
         """
         create input formats for the d3 tree vizualition
@@ -984,19 +1283,23 @@ class EventTypeCollection:
             -links will replace INSERT_LINKS_HERE on line 49 of template_path
         the result will be stored at output_path
         :param bool exclude_leaf_nodes: if True, nodes without children or not included in the vizualization
+        :param str export_format: inline | json
+        -inline: all links are inlined into the HTML file
+        -json: the nodes, links and hover texts are written as compact JSON files to the folder
+        OUTPUT_PATH_data (see write_d3_json_shards), with one shard per subtree of a child of the root.
+        The template has to load the shards with vizualizations/d3_shard_loader.js, which is copied to
+        OUTPUT_PATH_data (see the usage in that file): INSERT_DATA_INDEX_HERE is replaced by the relative path
+        to index.json, INSERT_DATA_FOLDER_HERE by the relative path to OUTPUT_PATH_data,
+        and INSERT_LINKS_HERE by nothing. An AssertionError is raised if the template does not contain
+        INSERT_DATA_INDEX_HERE, since the HTML file would then contain no data.
+        This is recommended for large hierarchies, e.g., with root http://www.wikidata.org/entity/Q1656682
         """
         assert root in self.event_type_id_to_event_type_obj, f'{root} not found'
+        options = {'inline', 'json'}
+        assert export_format in options, f'please choose for export_format from {options}'
 
         # create subgraph
-        root_ev_type_obj = self.event_type_id_to_event_type_obj[root]
-        the_descendants = nx.descendants(self.g, root_ev_type_obj.title_id)
-        the_descendants.add(root_ev_type_obj.title_id)
-
-        if exclude_leaf_nodes:
-            the_descendants = {node
-                               for node in the_descendants
-                               if node not in self.leaf_nodes}
-        sub_g = self.g.subgraph(the_descendants).copy()
+        sub_g = self.get_subgraph(root, exclude_leaf_nodes=exclude_leaf_nodes)
 
         nodes = list(sub_g.nodes())
         edges = list(sub_g.edges())
@@ -1009,15 +1312,39 @@ class EventTypeCollection:
             print(nx.info(sub_g))
 
         # create hover_dict
-        hover_dict = {}
+        ev_type_objs = [self.event_type_id_to_event_type_obj[f'http://www.wikidata.org/entity/{node}']
+                        for node in nodes]
+        title_id_to_hover_text = self.create_hover_texts(ev_type_objs)
+
+        with open(template_path) as infile:
+            raw = infile.read()
+
+        if export_format == 'json':
+            assert 'INSERT_DATA_INDEX_HERE' in raw, (f'{template_path} does not load the JSON shards, '
+                                                     f'please add the loader of vizualizations/{SHARD_LOADER_BASENAME} to it')
+            data_folder = f'{os.path.splitext(output_path)[0]}_data'
+            index_path = self.write_d3_json_shards(sub_g,
+                                                   root_title_id=self.event_type_id_to_event_type_obj[root].title_id,
+                                                   title_id_to_hover_text=title_id_to_hover_text,
+                                                   data_folder=data_folder,
+                                                   verbose=verbose)
+
+            shutil.copy(os.path.join(os.path.dirname(template_path), SHARD_LOADER_BASENAME), data_folder)
 
-        for node in nodes:
-            ev_type_uri = f'http://www.wikidata.org/entity/{node}'
-            ev_type_obj = self.event_type_id_to_event_type_obj[ev_type_uri]
-            hover_text = self.create_hover_text(ev_type_obj)
+            output_folder = os.path.dirname(os.path.abspath(output_path))
+            raw = raw.replace('INSERT_LINKS_HERE', '')
+            raw = raw.replace('INSERT_DATA_INDEX_HERE', os.path.relpath(index_path, output_folder))
+            raw = raw.replace('INSERT_DATA_FOLDER_HERE', os.path.relpath(data_folder, output_folder))
 
-            node_id = f'{node} ({ev_type_obj.label_to_show})'
-            hover_dict[node_id] = hover_text
+            with open(output_path, 'w') as outfile:
+                outfile.write(raw)
+            return
+
+        hover_dict = {}
+
+        for ev_type_obj in ev_type_objs:
+            node_id = f'{ev_type_obj.title_id} ({ev_type_obj.label_to_show})'
+            hover_dict[node_id] = title_id_to_hover_text[ev_type_obj.title_id]
 
         list_hover_dict = ['let dict={};']
 
@@ -1034,19 +1361,197 @@ class EventTypeCollection:
 
         string_links = ',\n'.join(links)
 
-        with open(template_path) as infile:
-            raw = infile.read()
-
         raw = raw.replace('INSERT_LINKS_HERE', string_links)
 
         with open(output_path, 'w') as outfile:
             outfile.write(raw)
 
+    def write_d3_json_shards(self,
+                             sub_g,
+                             root_title_id,
+                             title_id_to_hover_text,
+                             data_folder,
+                             verbose=0):
+        """
+        write the nodes, links and hover texts of a subgraph as compact JSON files,
+        one shard for the root and one for each subtree of a child of the root.
+        A node (and the links pointing to it) is part of the first shard in which it is found,
+        i.e., nodes with multiple parents are written only once.
 
+        data_folder
+            index.json: {"root": ROOT, "shards": [{"id": .., "path": .., "num_nodes": .., "num_links": ..}]}
+            ROOT.json: {"nodes": [{"id": .., "label": ..}], "links": [[source, target]], "hover": {"ID (LABEL)": hover text}}
+            CHILD.json
 
+        :param sub_g: subgraph to export, e.g., the result of get_subgraph
+        :param str root_title_id: root of sub_g, e.g., Q1656682
+        :param dict title_id_to_hover_text: see create_hover_texts
+        :param str data_folder: the folder is overwritten if it exists
 
+        :rtype: str
+        :return: path to index.json
+        """
+        if os.path.exists(data_folder):
+            shutil.rmtree(data_folder)
+        os.makedirs(data_folder)
+
+        sub_g_nodes = set(sub_g.nodes())
+        node_to_shard = {root_title_id: root_title_id}
+        shard_ids = [root_title_id]
+        for child in sorted(sub_g.successors(root_title_id)):
+            shard_ids.append(child)
+            subtree = (self.closure_index.descendants(child) | {child}) & sub_g_nodes
+            for node in subtree:
+                node_to_shard.setdefault(node, child)
+
+        shard_to_data = {shard_id: {'nodes': [], 'links': [], 'hover': {}}
+                         for shard_id in shard_ids}
+
+        for node in sub_g.nodes():
+            label = sub_g.nodes[node].get('label')
+            data = shard_to_data[node_to_shard[node]]
+            data['nodes'].append({'id': node, 'label': label})
+            data['hover'][f'{node} ({label})'] = title_id_to_hover_text[node]
+
+        for source, target in sub_g.edges():
+            shard_to_data[node_to_shard[target]]['links'].append([source, target])
+
+        index = {'root': root_title_id, 'shards': []}
+        for shard_id in shard_ids:
+            data = shard_to_data[shard_id]
+            if not data['nodes']: # child that is part of the subtree of an earlier child
+                continue
+            basename = f'{shard_id}.json'
+            with open(os.path.join(data_folder, basename), 'w') as outfile:
+                json.dump(data, outfile, separators=(',', ':'))
+            index['shards'].append({'id': shard_id,
+                                    'path': basename,
+                                    'num_nodes': len(data['nodes']),
+                                    'num_links': len(data['links'])})
+
+        index_path = os.path.join(data_folder, 'index.json')
+        with open(index_path, 'w') as outfile:
+            json.dump(index, outfile, separators=(',', ':'))
 
+        if verbose >= 1:
+            print()
+            print(f'written {len(shard_ids)} d3 shards to {data_folder}')
 
+        return index_path
+
+    def get_language_counts_per_event_type(self, ev_type_objs):
+        """
+        count the incidents per language for many EventType instances in one pass.
+        The languages of the incidents are looked up in the language rank matrix of the LabelStore
+        (see label_store.LabelStore.get_language_rank_matrix), which is computed once for all incidents.
+
+        :param list ev_type_objs: instances of class EventType
+
+        :rtype: list
+        :return: per EventType, a dict language -> number of incidents with a label in that language,
+        with the languages in order of first occurrence in the incidents of the EventType
+        """
+        import numpy as np
+
+        ev_type_objs = list(ev_type_objs)
+
+        store = getattr(self, 'label_store', None)
+        if store is None: # pickles from before the LabelStore
+            all_lang_to_num_incidents = []
+            for ev_type_obj in ev_type_objs:
+                lang_to_num_incidents = defaultdict(int)
+                for inc_obj in ev_type_obj.incidents:
+                    for lang in inc_obj.title_labels:
+                        lang_to_num_incidents[lang] += 1
+                all_lang_to_num_incidents.append(dict(lang_to_num_incidents))
+            return all_lang_to_num_incidents
+
+        inc_uris = [inc_obj.full_uri
+                    for ev_type_obj in ev_type_objs
+                    for inc_obj in ev_type_obj.incidents]
+        num_incidents = np.array([len(ev_type_obj.incidents) for ev_type_obj in ev_type_objs], dtype=np.int64)
+        starts = np.cumsum(num_incidents) - num_incidents
+        positions = np.arange(len(inc_uris), dtype=np.int64) - np.repeat(starts, num_incidents)
+
+        rank_matrix = store.get_language_rank_matrix(inc_uris).astype(np.int64)
+        num_languages = len(store.languages)
+        has_label = rank_matrix >= 0
+
+        # the incidents of an EventType are contiguous, hence segment reductions per EventType
+        counts = np.zeros((len(ev_type_objs), num_languages), dtype=np.int64)
+        first_keys = np.zeros((len(ev_type_objs), num_languages), dtype=np.int64)
+        non_empty = np.flatnonzero(num_incidents)
+        if len(non_empty) and num_languages:
+            # first occurrence of a language: (position of the incident, rank of the language in its labels)
+            keys = np.where(has_label, positions[:, None] * num_languages + rank_matrix, np.iinfo(np.int64).max)
+            counts[non_empty] = np.add.reduceat(has_label.astype(np.int64), starts[non_empty], axis=0)
+            first_keys[non_empty] = np.minimum.reduceat(keys, starts[non_empty], axis=0)
+
+        all_lang_to_num_incidents = []
+        for ev_counts, ev_first_keys in zip(counts.tolist(), first_keys.tolist()):
+            lang_indices = sorted((lang_index for lang_index, count in enumerate(ev_counts) if count),
+                                  key=ev_first_keys.__getitem__)
+            all_lang_to_num_incidents.append({store.languages[lang_index] : ev_counts[lang_index]
+                                              for lang_index in lang_indices})
+        return all_lang_to_num_incidents
+
+    def create_hover_texts(self,
+                           ev_type_objs,
+                           prop_stats='properties_aggregated',
+                           num_top_properties=10):
+        """
+        create the hover texts for many EventType instances in one pass.
+        The result is the same as calling create_hover_text for each of them.
+
+        :param list ev_type_objs: instances of class EventType
+        :param str prop_stats: properties_aggregated | cue_validities
+        :param int num_top_properties: see n in show_top_n
+
+        :rtype: dict
+        :return: mapping title_id -> the hover text
+        """
+        import pandas as pd
+
+        options = {'properties_aggregated', 'cue_validities'}
+        assert prop_stats in options, f'please choose for prop_stats from {options}'
+
+        ev_type_objs = list(ev_type_objs)
+
+        # Incident count per language, in order of first occurrence per event type
+        index_to_lang_lines = [[f'LANG: {lang}: {num_incidents} incidents'
+                                for lang, num_incidents in lang_to_num_incidents.items()]
+                               for lang_to_num_incidents in self.get_language_counts_per_event_type(ev_type_objs)]
+
+        # Properties: top n + 1 per event type (see show_top_n), ties in dict order
+        prop_df = pd.DataFrame([(index, order, prop, value)
+                                for index, ev_type_obj in enumerate(ev_type_objs)
+                                for order, (prop, value) in enumerate(getattr(ev_type_obj, prop_stats).items())],
+                               columns=['ev_index', 'order', 'prop', 'value'])
+        prop_df = prop_df.sort_values(['ev_index', 'value', 'order'],
+                                      ascending=[True, False, True],
+                                      kind='mergesort')
+        prop_df = prop_df.groupby('ev_index', sort=False).head(num_top_properties + 1)
+        index_to_prop_lines = defaultdict(list)
+        for ev_index, prop, value in zip(prop_df['ev_index'], prop_df['prop'], prop_df['value']):
+            label = self.prop_id_to_prop_obj[prop].label_to_show
+            index_to_prop_lines[ev_index].append(f'{label} - {value}')
+
+        title_id_to_hover_text = {}
+        for index, ev_type_obj in enumerate(ev_type_objs):
+            info = [f'\n### Number of incidents per language']
+            info.extend(index_to_lang_lines[index])
+
+            info.append(f'\n### Shared properties')
+            info.extend(index_to_prop_lines[index])
+
+            info.append(f'\n### Sample of Incidents')
+            inc_uris = [inc_obj.full_uri
+                        for inc_obj in ev_type_obj.incidents]
+            info.extend(get_sample(inc_uris, 5))
+
+            title_id_to_hover_text[ev_type_obj.title_id] = '\n'.join(info)
+
+        return title_id_to_hover_text
 
     def create_hover_text(self,
                           ev_type_obj,
@@ -1068,10 +1573,7 @@ class EventTypeCollection:
 
         # Incident count per language
         info.append(f'\n### Number of incidents per language')
-        lang_to_num_incidents = defaultdict(int)
-        for inc_obj in ev_type_obj.incidents:
-            for lang, title in inc_obj.title_labels.items():
-                lang_to_num_incidents[lang] += 1
+        lang_to_num_incidents = self.get_language_counts_per_event_type([ev_type_obj])[0]
 
         for lang, num_incidents in lang_to_num_incidents.items():
             info.append(f'LANG: {lang}: {num_incidents} incidents')
@@ -1112,6 +1614,7 @@ class EventTypeCollection:
                     for event_type_obj in self.event_type_id_to_event_type_obj.values()
                     for inc_obj in event_type_obj.incidents}
         stats['num_inc_uris'] = len(inc_uris)
+        stats['num_inc_uris_per_label_language'] = self.label_store.get_language_counts(inc_uris)
 
         stats['num_unique_properties'] = len(self.prop_to_freq)
 
@@ -1125,6 +1628,8 @@ class EventTypeCollection:
         """
         Serialize a collection of incidents to a .ttl file.
         """
+        from rdflib import Graph, URIRef, Literal, XSD
+        from rdflib.namespace import Namespace, RDF, RDFS
 
         wdt_pred_to_pid = {
             "sem:hasPlace": [
@@ -1379,7 +1884,7 @@ class EventTypeCollection:
             print()
             print(f'saved EventTypeCollection to {output_path}')
 
-class EventType():
+class EventType(label_store.StoredLabels):
     """
     represents a Wikidata event type, e.g.,
 
@@ -1387,18 +1892,20 @@ class EventType():
     title_id='Q40231',
     full_uri='http://www.wikidata.org/entity/Q40231',
     prefix_uri='wd:Q40231',
+    label_store=label_store.LabelStore() (optional, see label_store.StoredLabels)
     """
     def __init__(self,
                  title_labels,
                  title_id,
                  full_uri,
                  prefix_uri,
+                 label_store=None,
                  ):
-        self.title_labels = title_labels
-        self.label_to_show = self.set_label_to_show()
+        self.label_store = label_store
         self.title_id = title_id
         self.full_uri = full_uri
         self.prefix_uri = prefix_uri
+        self.title_labels = title_labels
         self.incidents = []
 
         self.cue_validities = None      # is updated by method set_cue_validities
@@ -1508,7 +2015,7 @@ class EventType():
             self.siblings.update(children_minus_this_event_full)
             self.parent_to_siblings[from_short_uri_to_full_uri(parent)] = children_minus_this_event_full
 
-class Incident:
+class Incident(label_store.StoredLabels):
     """
     represents a Wikidata Incident, e.g.,
 
@@ -1517,6 +2024,7 @@ class Incident:
     full_uri='http://www.wikidata.org/entity/Q51336711'
     prefix_uri='wd:Q51336711'
     properties=[prop_obj], # instances of class Property
+    label_store=label_store.LabelStore() (optional, see label_store.StoredLabels)
 
     """
     def __init__(self,
@@ -1525,12 +2033,13 @@ class Incident:
                  full_uri,
                  prefix_uri,
                  properties,
+                 label_store=None,
                  ):
-        self.title_labels = title_labels
-        self.label_to_show = self.set_label_to_show()
+        self.label_store = label_store
         self.title_id = title_id
         self.full_uri = full_uri
         self.prefix_uri = prefix_uri
+        self.title_labels = title_labels
         self.properties = properties
         self.unique_properties = {prop_obj.full_uri for prop_obj in self.properties}
 
@@ -1616,19 +2125,37 @@ class ReferenceText:
                 title.naf
             languagen
 
+        If the folder has a title index of a NAF store (see naf_store.py),
+        the path to the shared blob is returned instead, i.e., the path is for reading only
+        (please use get_layout_naf_path_of_reference_text to write a NAF file).
+
         :param str wiki_output: folder where the NAF files are stored,
         very likely with the name "wiki_output"
 
         :rtype: str
         :return: the path to the NAF file
         """
-        naf_path = os.path.join(unstructured_folder,
-                                self.language,
-                                f'{self.title}.naf')
+        naf_path = naf_store.resolve_naf_path(unstructured_folder,
+                                              self.language,
+                                              self.title)
 
         return naf_path
 
-class Property:
+    def get_layout_naf_path_of_reference_text(self, unstructured_folder):
+        """
+        the path of the NAF file in the folder layout of get_naf_path_of_reference_text,
+        never the path to a shared blob of a NAF store
+
+        :param str unstructured_folder: folder where the NAF files are stored
+
+        :rtype: str
+        :return: the path to write the NAF file to
+        """
+        return naf_store.get_layout_naf_path(unstructured_folder,
+                                             self.language,
+                                             self.title)
+
+class Property(label_store.StoredLabels):
     """
     represents a Wikidata property, e.g.,
 
@@ -1636,18 +2163,20 @@ class Property:
     title_id='P17'
     full_uri='http://www.wikidata.org/entity/P17'
     prefix_uri='wdt:P17'
+    label_store=label_store.LabelStore() (optional, see label_store.StoredLabels)
     """
     def __init__(self,
                  title_labels,
                  title_id,
                  full_uri,
-                 prefix_uri
+                 prefix_uri,
+                 label_store=None,
                  ):
-        self.title_labels = title_labels
-        self.label_to_show = self.set_label_to_show()
+        self.label_store = label_store
         self.title_id = title_id
         self.full_uri = full_uri
         self.prefix_uri = prefix_uri
+        self.title_labels = title_labels
 
     def __str__(self):
         info = ['Information about Property:']
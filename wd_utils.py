@@ -1,3 +1,22 @@
+"""
+Harvest of the Wikidata information (see QUERIES) that is written to wd_cache
+and used by wd_representation.py
+
+Usage:
+  wd_utils.py [--output_folder=<output_folder>] [--wdt_sparql_url=<wdt_sparql_url>]\
+ [--sparql_cache_folder=<sparql_cache_folder>] [--sparql_cache_mode=<sparql_cache_mode>] [--verbose=<verbose>]
+
+Options:
+    --output_folder=<output_folder>  folder to which the query results are written [default: wd_cache]
+    --wdt_sparql_url=<wdt_sparql_url>  the SPARQL endpoint, e.g., a local stub server (see sparql_stub_server.py) [default: https://query.wikidata.org/sparql]
+    --sparql_cache_folder=<sparql_cache_folder>  if provided, the responses are recorded to and/or replayed from this folder (see sparql_cache.py)
+    --sparql_cache_mode=<sparql_cache_mode>  record | replay | auto, replay runs the harvest offline [default: auto]
+    --verbose=<verbose>  0 nothing, 1 descriptive stats, 2 more stats [default: 2]
+
+Example:
+    python wd_utils.py --sparql_cache_folder="sparql_cache" --sparql_cache_mode="record"
+    python wd_utils.py --output_folder="wd_cache_replayed" --sparql_cache_folder="sparql_cache" --sparql_cache_mode="replay"
+"""
 import os
 from shutil import rmtree
 import time
@@ -74,6 +93,7 @@ WDT_SPARQL_URL = 'https://query.wikidata.org/sparql'
 BATCH_SIZE = 250 # at 500 the api calls do not work anymore
 DEV_LIMIT = 100000 # how many items do you want to have when you put verbose to 4 or higher
 NUM_RETRIES = 5 # after how many retries do you give up
+RETRY_WAIT = 2 # number of seconds to wait before retrying
 LOG_BATCHES = False # if True, send information about each batch to stdout
 OVERWRITE = True # if True, overwrite existing results
 
@@ -84,7 +104,7 @@ def preprocess_inc_to_props(output_folder, verbose=0):
     with all instance wd uris
 
     :rtype: list
-    :return: list of wd incident uris
+    :return: sorted list of wd incident uris (the batches of the queries are the same in each run)
     """
     input_path = f'{output_folder}/instance_of.json'
     with open(input_path) as infile:
@@ -100,7 +120,7 @@ def preprocess_inc_to_props(output_folder, verbose=0):
         print('INSIDE FUNCTION', this_function_name)
         print(f'found {len(inc_wd_uris)} wd incident uris')
 
-    return list(inc_wd_uris)
+    return sorted(inc_wd_uris)
 
 def preprocess_inc_to_labels(output_folder, verbose=0):
     """
@@ -108,7 +128,7 @@ def preprocess_inc_to_labels(output_folder, verbose=0):
     with all instance wd uris
 
     :rtype: list
-    :return: list of wd incident uris
+    :return: sorted list of wd incident uris (the batches of the queries are the same in each run)
     """
     input_path = f'{output_folder}/instance_of.json'
     with open(input_path) as infile:
@@ -124,7 +144,7 @@ def preprocess_inc_to_labels(output_folder, verbose=0):
         print('INSIDE FUNCTION', this_function_name)
         print(f'found {len(inc_wd_uris)} wd incident uris')
 
-    return list(inc_wd_uris)
+    return sorted(inc_wd_uris)
 
 
 
@@ -135,7 +155,7 @@ def preprocess_event_type_to_labels(output_folder, verbose=0):
     list of event types
 
     :rtype: list
-    :return: list
+    :return: sorted list of wd event type uris (the batches of the queries are the same in each run)
     """
     input_path = f'{output_folder}/subclass_of.json'
     with open(input_path) as infile:
@@ -152,7 +172,7 @@ def preprocess_event_type_to_labels(output_folder, verbose=0):
         print('INSIDE FUNCTION', this_function_name)
         print(f'found {len(event_type_uris)} wd event type uris')
 
-    return list(event_type_uris)
+    return sorted(event_type_uris)
 
 
 
@@ -341,35 +361,47 @@ def post_process_prop_to_labels(response, verbose=0):
     return list(set_of_relations)
 
 
-def get_results_with_retry(wdt_sparql_url, query):
+def get_results_with_retry(wdt_sparql_url, query, sparql_cache=None):
     """
     Run SPARQL query multiple times until the results are there.
 
     :param str wdt_sparql_url: the Wikidata sparql url
     :param str query: the query to execute
+    :param sparql_cache.SPARQLCache sparql_cache: if provided, responses are replayed from
+    and/or recorded to the cache (depending on its mode)
 
     :rtype: dict
     :return: response from api
     """
+    if sparql_cache is not None and sparql_cache.replays:
+        response = sparql_cache.get(query)
+        if response is not None:
+            return response
+        assert sparql_cache.records, f'query not recorded in {sparql_cache.cache_folder}: {query}'
+
     num_attempts = 0
     while True:
         try:
             r = requests.get(wdt_sparql_url,
                              params={'format': 'json', 'query': query})
+            r.raise_for_status()
             response = r.json()
             break
         except Exception as e:
             sys.stderr.write(f'{e},error, retrying\n')
             num_attempts += 1
-            time.sleep(2)
+            time.sleep(RETRY_WAIT)
         
             if num_attempts == NUM_RETRIES:
                 print(f'unable to run query: {query}')
                 response = {'results' : {'bindings' : []}}
-                break
+                return response # failed queries are never recorded
 
             continue
 
+    if sparql_cache is not None and sparql_cache.records:
+        sparql_cache.put(query, response, endpoint=wdt_sparql_url)
+
     return response
 
 
@@ -399,6 +431,8 @@ def validate(output, items, verbose=0):
 
 def call_wikidata(sparql_query,
                   query_name,
+                  wdt_sparql_url=WDT_SPARQL_URL,
+                  sparql_cache=None,
                   verbose=0):
     """
     call wikidata sparql query and optionally store results in
@@ -406,12 +440,15 @@ def call_wikidata(sparql_query,
 
     :param str sparql_query: the sparql query
     :param str query_name: name of the query
+    :param str wdt_sparql_url: the sparql endpoint, e.g., a local stub server (see sparql_stub_server.py)
+    :param sparql_cache.SPARQLCache sparql_cache: see get_results_with_retry
 
     :rtype: dict
     :return: response
     """
-    response = get_results_with_retry(wdt_sparql_url=WDT_SPARQL_URL,
-                                      query=sparql_query)
+    response = get_results_with_retry(wdt_sparql_url=wdt_sparql_url,
+                                      query=sparql_query,
+                                      sparql_cache=sparql_cache)
 
     post_process_function = globals()[f'post_process_{query_name}']
 
@@ -446,13 +483,19 @@ def remove_prop_ids_from_props(all_props, output_folder, verbose=0):
     return list(statement_props)
 
 
-def run_queries(output_folder, verbose=0):
+def run_queries(output_folder,
+                wdt_sparql_url=WDT_SPARQL_URL,
+                sparql_cache=None,
+                verbose=0):
     """
     run queries as defined in global variable QUERIES
     in this Python module
 
     :param str output_folder: store the result to
     OUTPUT_FOLDER/QUERY_NAME.json
+    :param str wdt_sparql_url: the sparql endpoint, e.g., a local stub server (see sparql_stub_server.py)
+    :param sparql_cache.SPARQLCache sparql_cache: if provided, responses are recorded and/or replayed,
+    e.g., to run the queries offline (see sparql_cache.py)
     """
     # (remove and) recreate folder
     if os.path.exists(output_folder):
@@ -485,6 +528,8 @@ def run_queries(output_folder, verbose=0):
                               'prop_to_labels'}:
                 post_processed = call_wikidata(sparql_query=sparql_query,
                                                query_name=query_name,
+                                               wdt_sparql_url=wdt_sparql_url,
+                                               sparql_cache=sparql_cache,
                                                verbose=verbose)
 
                 if query_name == 'prop_to_labels':
@@ -518,6 +563,8 @@ def run_queries(output_folder, verbose=0):
 
                     part_post_processed = call_wikidata(sparql_query=the_query,
                                                         query_name=query_name,
+                                                        wdt_sparql_url=wdt_sparql_url,
+                                                        sparql_cache=sparql_cache,
                                                         verbose=verbose_here)
 
                     post_processed.update(part_post_processed)
@@ -537,8 +584,28 @@ def run_queries(output_folder, verbose=0):
                 json.dump(post_processed, outfile)
 
 if __name__ == '__main__':
-
-    output_folder = 'wd_cache'
-    verbose = 2
-
-    run_queries(output_folder, verbose=verbose)
+    from docopt import docopt
+    import sparql_cache
+
+    arguments = docopt(__doc__)
+    print()
+    print('PROVIDED ARGUMENTS')
+    print(arguments)
+    print()
+
+    output_folder = arguments['--output_folder']
+    verbose = int(arguments['--verbose'])
+
+    the_sparql_cache = None
+    if arguments['--sparql_cache_folder']:
+        the_sparql_cache = sparql_cache.SPARQLCache(arguments['--sparql_cache_folder'],
+                                                    mode=arguments['--sparql_cache_mode'],
+                                                    verbose=verbose)
+
+    run_queries(output_folder,
+                wdt_sparql_url=arguments['--wdt_sparql_url'],
+                sparql_cache=the_sparql_cache,
+                verbose=verbose)
+
+    if the_sparql_cache is not None:
+        print(the_sparql_cache)